@@ -0,0 +1,232 @@
+# ============================================================
+#  AGREGACIÓN DE REGISTROS HIS POR ATENCIÓN AL FORMATO CONSOLIDADO
+# ============================================================
+# Uso:
+#   python agregacion_his.py REGISTROS.csv [MAS.csv ...] --salida CONSOLIDADO_NUEVO.xlsx
+#       [--personal MAESTRO_PERSONAL.xlsx] [--profesiones MAESTRO_PROFESIONES.xlsx]
+#       [--establecimientos MAESTRO_ESTABLECIMIENTOS.xlsx] [--bloque 200000] [--separador ","]
+#   python agregacion_his.py REGISTROS.csv --ingerir [--datos CONSOLIDADO.xlsx] [--reemplazar]
+#
+# Lee los registros (una fila por atención) en bloques y acumula conteos por
+# (personal, establecimiento, anio, mes, día); la memoria depende de cuántas combinaciones
+# distintas hay, no de cuántas filas tiene el archivo. Al final arma el formato ancho que
+# espera cargar_datos: '1'...'31'/'total', 'atendidos_servicios_*' y '1.1'...'31.1'/'total.1'.
+#
+# Columnas de los registros (sin distinguir mayúsculas):
+#   id_personal, id_establecimiento, fecha_atencion (o anio, mes, dia),
+#   id_condicion_establecimiento, id_condicion_servicio (N = nuevo, C = continuador, R = reingresante)
+# y, si vienen, id_profesion, profesional, nombres_profesional y nombre_establecimiento.
+
+import argparse
+import sys
+import time
+from pathlib import Path
+
+import pandas as pd
+
+from datos_his import DIMENSIONES_ID, MEDIDAS_DIARIAS, ingerir_periodo, leer_archivo_his, validar_estructura
+
+# Un paciente cuenta como atendido (en el establecimiento o en el servicio) si es nuevo o reingresante
+CONDICIONES_ATENDIDO = ["N", "R"]
+
+# Qué se cuenta de cada registro para cada medida diaria del consolidado (en el orden de sus columnas)
+CONTEO_POR_MEDIDA = {
+    "Atendidos Únicos": "atendido_establecimiento",
+    "Atendidos por Servicio": "atendido_servicio",
+    "Atenciones": "atencion",
+}
+
+CLAVES_MES = ["id_establecimiento", "id_personal", "anio", "mes"]
+CLAVES_DIA = CLAVES_MES + ["dia"]
+COLUMNAS_DESCRIPTIVAS = ["id_profesion", "profesional", "nombres_profesional", "nombre_establecimiento"]
+COLUMNAS_REQUERIDAS = ["id_personal", "id_establecimiento", "id_condicion_establecimiento", "id_condicion_servicio"]
+
+def leer_bloques(archivos, tamano_bloque=200_000, separador=","):
+    """Itera los registros de uno o más CSV en bloques, leyendo solo las columnas que se usan."""
+    usadas = set(COLUMNAS_REQUERIDAS + COLUMNAS_DESCRIPTIVAS + ["fecha_atencion", "anio", "mes", "dia"])
+    for archivo in archivos:
+        lector = pd.read_csv(
+            archivo, sep=separador, chunksize=tamano_bloque, dtype=str,
+            usecols=lambda c: c.strip().lower() in usadas,
+        )
+        for bloque in lector:
+            bloque.columns = [c.strip().lower() for c in bloque.columns]
+            yield bloque
+
+def preparar_bloque(bloque):
+    """
+    Tipa un bloque de registros y marca qué cuenta cada uno. Devuelve (bloque, filas descartadas
+    por no tener ids o una fecha válida).
+    """
+    faltantes = [c for c in COLUMNAS_REQUERIDAS if c not in bloque.columns]
+    if "fecha_atencion" not in bloque.columns and not {"anio", "mes", "dia"}.issubset(bloque.columns):
+        faltantes.append("fecha_atencion (o anio, mes, dia)")
+    if faltantes:
+        raise ValueError(f"Faltan columnas en los registros: {', '.join(faltantes)}")
+
+    if "fecha_atencion" in bloque.columns:
+        fecha = pd.to_datetime(bloque["fecha_atencion"], errors="coerce", dayfirst=True)
+    else:
+        fecha = pd.to_datetime(
+            pd.DataFrame({"year": bloque["anio"], "month": bloque["mes"], "day": bloque["dia"]}).apply(pd.to_numeric, errors="coerce"),
+            errors="coerce",
+        )
+    ids = bloque[["id_personal", "id_establecimiento"]].apply(pd.to_numeric, errors="coerce")
+    validas = fecha.notna() & ids.notna().all(axis=1)
+
+    preparado = pd.DataFrame({
+        "id_establecimiento": ids.loc[validas, "id_establecimiento"].astype("int64"),
+        "id_personal": ids.loc[validas, "id_personal"].astype("int64"),
+        "anio": fecha[validas].dt.year.astype("int64"),
+        "mes": fecha[validas].dt.month.astype("int64"),
+        "dia": fecha[validas].dt.day.astype("int64"),
+        "atencion": 1,
+        "atendido_establecimiento": bloque.loc[validas, "id_condicion_establecimiento"].str.strip().str.upper().isin(CONDICIONES_ATENDIDO).astype("int64"),
+        "atendido_servicio": bloque.loc[validas, "id_condicion_servicio"].str.strip().str.upper().isin(CONDICIONES_ATENDIDO).astype("int64"),
+    })
+    for col in COLUMNAS_DESCRIPTIVAS:
+        if col in bloque.columns:
+            valores = bloque.loc[validas, col]
+            preparado[col] = pd.to_numeric(valores, errors="coerce") if col in DIMENSIONES_ID else valores
+    return preparado, int((~validas).sum())
+
+def agregar_registros(archivos, tamano_bloque=200_000, separador=","):
+    """
+    Agrega en streaming los registros por atención al formato ancho del consolidado.
+    Cada bloque se reduce a conteos por (establecimiento, personal, anio, mes, día) y se suma
+    al acumulado, así que nunca se tiene más de un bloque de registros en memoria.
+    Devuelve (DataFrame ancho, estadísticas de la lectura).
+    """
+    conteos = list(CONTEO_POR_MEDIDA.values())
+    acumulado, descriptivas = None, None
+    stats = {"registros": 0, "descartados": 0, "bloques": 0}
+
+    for bloque in leer_bloques(archivos, tamano_bloque, separador):
+        preparado, descartados = preparar_bloque(bloque)
+        stats["registros"] += len(bloque)
+        stats["descartados"] += descartados
+        stats["bloques"] += 1
+
+        parcial = preparado.groupby(CLAVES_DIA, sort=False)[conteos].sum()
+        acumulado = parcial if acumulado is None else pd.concat([acumulado, parcial]).groupby(level=CLAVES_DIA, sort=False).sum()
+
+        # Datos descriptivos: el primer valor visto por profesional, establecimiento y mes
+        cols_desc = [c for c in COLUMNAS_DESCRIPTIVAS if c in preparado.columns]
+        if cols_desc:
+            nuevas = preparado[CLAVES_MES + cols_desc].drop_duplicates(CLAVES_MES)
+            descriptivas = nuevas if descriptivas is None else pd.concat([descriptivas, nuevas]).drop_duplicates(CLAVES_MES)
+
+    if acumulado is None:
+        return pd.DataFrame(), stats
+
+    largo = acumulado.reset_index()
+    partes = []
+    for nombre, conteo in CONTEO_POR_MEDIDA.items():
+        cfg = MEDIDAS_DIARIAS[nombre]
+        tabla = (
+            largo.pivot_table(index=CLAVES_MES, columns="dia", values=conteo, aggfunc="sum", fill_value=0)
+            .reindex(columns=range(1, 32), fill_value=0)
+        )
+        tabla.columns = [cfg["dia"].format(d=d) for d in range(1, 32)]
+        tabla[cfg["total"]] = tabla.sum(axis=1)
+        partes.append(tabla)
+
+    ancho = pd.concat(partes, axis=1).astype("int64").reset_index()
+    if descriptivas is not None:
+        ancho = ancho.merge(descriptivas, on=CLAVES_MES, how="left")
+    ancho = ancho.rename(columns={"id_establecimiento": "id_establecimiento_x"})
+    return ancho.sort_values(["anio", "mes", "id_establecimiento_x", "id_personal"]).reset_index(drop=True), stats
+
+def completar_con_maestros(ancho, personal=None, profesiones=None, establecimientos=None):
+    """
+    Completa los datos del profesional y los nombres desde los maestros HIS, como en el consolidado:
+    el maestro de personal aporta su establecimiento como 'id_establecimiento_y'.
+    """
+    if personal is not None:
+        personal = personal.rename(columns={"id_establecimiento": "id_establecimiento_y"})
+        nuevas = [c for c in personal.columns if c == "id_personal" or c not in ancho.columns]
+        ancho = ancho.merge(personal[nuevas].drop_duplicates("id_personal"), on="id_personal", how="left")
+        partes_nombre = ["apellido_paterno_personal", "apellido_materno_personal", "nombres_personal"]
+        if "nombres_profesional" not in ancho.columns and set(partes_nombre).issubset(ancho.columns):
+            ancho["nombres_profesional"] = ancho[partes_nombre].fillna("").agg(" ".join, axis=1).str.strip()
+    if profesiones is not None and "id_profesion" in ancho.columns and "profesional" not in ancho.columns:
+        ancho = ancho.merge(profesiones[["id_profesion", "profesional"]].drop_duplicates("id_profesion"), on="id_profesion", how="left")
+    if establecimientos is not None and "nombre_establecimiento" not in ancho.columns:
+        maestro = establecimientos.rename(columns={"id_establecimiento": "id_establecimiento_x"})
+        ancho = ancho.merge(
+            maestro[["id_establecimiento_x", "nombre_establecimiento"]].drop_duplicates("id_establecimiento_x"),
+            on="id_establecimiento_x", how="left",
+        )
+    return ancho
+
+def leer_maestro(path):
+    if path is None:
+        return None
+    maestro = leer_archivo_his(path)
+    maestro.columns = [c.lower() for c in maestro.columns]
+    return maestro
+
+def escribir_archivo_his(df, path):
+    """Escribe el consolidado en el formato que indica la extensión (.xlsx, .csv o .parquet)."""
+    sufijo = Path(path).suffix.lower()
+    if sufijo == ".csv":
+        df.to_csv(path, index=False)
+    elif sufijo == ".parquet":
+        df.to_parquet(path, index=False)
+    else:
+        df.to_excel(path, index=False, engine="openpyxl")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Agrega registros HIS por atención al formato consolidado.")
+    parser.add_argument("registros", nargs="+", help="Archivos CSV de registros (una fila por atención)")
+    parser.add_argument("--salida", help="Archivo consolidado a generar (.xlsx, .csv o .parquet)")
+    parser.add_argument("--ingerir", action="store_true", help="Ingiere cada período resultante en el almacenamiento del tablero")
+    parser.add_argument("--datos", default="CONSOLIDADO.xlsx", help="Archivo de datos del tablero (para --ingerir)")
+    parser.add_argument("--reemplazar", action="store_true", help="Con --ingerir, reemplaza los períodos existentes")
+    parser.add_argument("--personal", help="Maestro de personal (id_personal, apellidos, nombres, id_profesion, ...)")
+    parser.add_argument("--profesiones", help="Maestro de profesiones (id_profesion, profesional)")
+    parser.add_argument("--establecimientos", help="Maestro de establecimientos (id_establecimiento, nombre_establecimiento)")
+    parser.add_argument("--bloque", type=int, default=200_000, help="Registros por bloque de lectura (por defecto: 200000)")
+    parser.add_argument("--separador", default=",", help="Separador de los CSV (por defecto: ',')")
+    args = parser.parse_args(argv)
+    if not args.salida and not args.ingerir:
+        parser.error("Indique --salida, --ingerir o ambos.")
+
+    inicio = time.perf_counter()
+    try:
+        ancho, stats = agregar_registros(args.registros, args.bloque, args.separador)
+    except (FileNotFoundError, ValueError) as e:
+        print(f"ERROR: {e}", file=sys.stderr)
+        return 1
+    ancho = completar_con_maestros(
+        ancho, leer_maestro(args.personal), leer_maestro(args.profesiones), leer_maestro(args.establecimientos)
+    )
+    print(
+        f"{stats['registros']:,} registros en {stats['bloques']} bloque(s) "
+        f"({stats['descartados']:,} descartados sin ids o fecha válida) -> {len(ancho):,} filas."
+    )
+
+    if args.salida:
+        escribir_archivo_his(ancho, args.salida)
+        print(f"Consolidado escrito en {args.salida}")
+
+    if args.ingerir:
+        for (anio, mes), periodo in ancho.groupby(["anio", "mes"], sort=True):
+            errores = validar_estructura(periodo)
+            if errores:
+                print(f"ERROR {anio}-{mes:02d}: {'; '.join(errores)}", file=sys.stderr)
+                return 1
+            try:
+                ingerir_periodo(periodo, args.datos, origen=", ".join(args.registros), reemplazar=args.reemplazar)
+            except ValueError as e:
+                print(f"ERROR: {e}", file=sys.stderr)
+                return 1
+            print(f"Período {anio}-{mes:02d} ingerido: {len(periodo)} filas.")
+
+    print(f"Listo en {time.perf_counter() - inicio:.1f} s.")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
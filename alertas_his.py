@@ -0,0 +1,102 @@
+# ============================================================
+#  DETECCIÓN DE ANOMALÍAS EN LAS SERIES DIARIAS
+# ============================================================
+# Marca días sospechosos en todas las series diarias a la vez (filas × medidas × días del cubo de
+# medidas), con estadísticas móviles vectorizadas a partir de sumas acumuladas. Sin dependencias de
+# Streamlit: el tablero (app.py) cachea el resultado por versión de datos y años cargados.
+#
+# La mayoría de los profesionales trabaja solo algunos días del mes, así que un cero o un día alto
+# aislado es lo normal. Solo se evalúa un día si la línea base (los VENTANA_BASE días previos) tiene
+# al menos MIN_DIAS_BASE días con producción, y el desvío de la línea base tiene un piso absoluto
+# y otro relativo a su promedio, para que una serie casi constante no marque picos pequeños.
+
+import numpy as np
+import pandas as pd
+
+# Códigos de alerta (bits) sobre cada celda fila × medida × día del cubo
+ALERTA_CERO = 1
+ALERTA_PICO = 2
+ALERTA_FUERA_MES = 4
+TIPOS_ALERTA = {
+    ALERTA_CERO: "Cero súbito",
+    ALERTA_PICO: "Pico inusual",
+    ALERTA_FUERA_MES: "Día fuera del mes",
+}
+
+VENTANA_BASE = 7             # Días previos usados como línea base de cada profesional
+MIN_DIAS_BASE = 6            # Días con producción en la línea base para evaluar un día
+K_DESVIOS_PICO = 3           # Desviaciones estándar sobre la línea base para marcar un pico
+PISO_DESVIO = 1.0            # Desvío mínimo de la línea base (en unidades de la medida)
+PISO_DESVIO_RELATIVO = 0.5   # Desvío mínimo como fracción del promedio de la línea base
+MIN_PICO = 5                 # Producción mínima para considerar un pico
+MIN_BASE_CERO = 5            # Promedio previo mínimo para que un cero resulte sospechoso
+MIN_ACTIVOS_SIGUIENTES = 2   # Días con producción entre los 3 siguientes (descarta fin de contrato o de serie)
+
+def marcar_anomalias(cubo, anios=None, meses=None):
+    """
+    Códigos de alerta (uint8, misma forma que el cubo) y DataFrame con una fila por alerta
+    (fila, medida, Día, Tipo, Valor, Línea Base). 'anios' y 'meses' dan el período de cada fila, para
+    el largo del mes y los días hábiles; sin ellos se asumen meses de 31 días que empiezan en lunes.
+    """
+    n_filas, n_medidas, n_dias = cubo.shape
+    x = cubo.astype(np.float32)
+
+    # Largo del mes y día de la semana del día 1 para cada fila (si no hay fecha, se asume 31 días)
+    if anios is not None and meses is not None:
+        inicio_mes = pd.to_datetime(
+            pd.DataFrame({"year": np.asarray(anios), "month": np.asarray(meses), "day": 1}), errors="coerce"
+        )
+        dias_mes = inicio_mes.dt.days_in_month.fillna(n_dias).to_numpy(dtype=np.int16)
+        dow_inicio = inicio_mes.dt.dayofweek.fillna(0).to_numpy(dtype=np.int16)
+    else:
+        dias_mes = np.full(n_filas, n_dias, dtype=np.int16)
+        dow_inicio = np.zeros(n_filas, dtype=np.int16)
+
+    idx = np.arange(n_dias)
+    dentro_mes = (idx[None, :] < dias_mes[:, None])[:, None, :]
+    dia_habil = (((dow_inicio[:, None] + idx[None, :]) % 7) < 5)[:, None, :]
+
+    # Sumas acumuladas con un cero inicial: c[..., k] = suma de x[..., :k]
+    ceros = np.zeros((n_filas, n_medidas, 1), dtype=np.float64)
+    c1 = np.concatenate([ceros, np.cumsum(x, axis=2, dtype=np.float64)], axis=2)
+    c2 = np.concatenate([ceros, np.cumsum(np.square(x, dtype=np.float64), axis=2)], axis=2)
+    ca = np.concatenate([ceros, np.cumsum(x > 0, axis=2, dtype=np.float64)], axis=2)
+
+    # Ventana previa [j - VENTANA_BASE, j) de cada día j
+    desde = np.maximum(idx - VENTANA_BASE, 0)
+    n_prev = (idx - desde).astype(np.float64)
+    with np.errstate(invalid="ignore", divide="ignore"):
+        media = (c1[..., idx] - c1[..., desde]) / n_prev
+        varianza = (c2[..., idx] - c2[..., desde]) / n_prev - np.square(media)
+    desvio = np.sqrt(np.clip(np.nan_to_num(varianza), 0, None))
+    media = np.nan_to_num(media)
+    activos_prev = ca[..., idx] - ca[..., desde]
+    hasta = np.minimum(idx + 4, n_dias)
+    activos_sig = ca[..., hasta] - ca[..., idx + 1]
+
+    con_base = activos_prev >= MIN_DIAS_BASE
+    desvio_base = np.maximum(np.maximum(desvio, PISO_DESVIO), PISO_DESVIO_RELATIVO * media)
+    pico = con_base & (x >= MIN_PICO) & (x > media + K_DESVIOS_PICO * desvio_base)
+    cero = (
+        con_base & dentro_mes & dia_habil & (x == 0)
+        & (media >= MIN_BASE_CERO) & (activos_sig >= MIN_ACTIVOS_SIGUIENTES)
+    )
+    fuera_mes = ~dentro_mes & (x > 0)
+
+    alertas = (
+        cero * np.uint8(ALERTA_CERO) | pico * np.uint8(ALERTA_PICO) | fuera_mes * np.uint8(ALERTA_FUERA_MES)
+    ).astype(np.uint8)
+
+    # Lista de alertas (una fila por celda y tipo) para el panel
+    partes = []
+    for codigo, tipo in TIPOS_ALERTA.items():
+        fila, medida, dia = np.nonzero(alertas & codigo)
+        partes.append(pd.DataFrame({
+            "fila": fila,
+            "medida": medida,
+            "Día": dia + 1,
+            "Tipo": tipo,
+            "Valor": cubo[fila, medida, dia],
+            "Línea Base": np.round(media[fila, medida, dia], 1),
+        }))
+    return alertas, pd.concat(partes, ignore_index=True)
@@ -1,27 +1,55 @@
 import streamlit as st
 import pandas as pd
-import altair as alt
+import numpy as np
 import re
+import calendar
+import unicodedata
+from bisect import bisect_left
+from functools import partial
 import base64
+from io import BytesIO
 from pathlib import Path
 from datetime import datetime
 from zoneinfo import ZoneInfo
 import os 
-import streamlit.components.v1 as components 
-from io import BytesIO 
-from reportlab.lib.pagesizes import A4, landscape 
-from reportlab.lib.units import inch 
-from reportlab.platypus import SimpleDocTemplate, Table, TableStyle, Paragraph, Spacer, Image 
-from reportlab.lib import colors 
-from reportlab.lib.styles import getSampleStyleSheet 
+from datos_his import (
+    CLAVES_REGISTRO, DIMENSIONES_ID, MEDIDAS_DIARIAS, MESES_ESPANOL, calcular_version_datos, cargar_rollups,
+    columnas_exportables, datos_ejemplo, fecha_ultima_ingesta, proyectar_rollup, sincronizar_origen,
+    validar_calidad
+)
+from alertas_his import K_DESVIOS_PICO, MIN_DIAS_BASE, TIPOS_ALERTA, VENTANA_BASE, marcar_anomalias
+from consultas_his import (
+    DIMENSIONES_FILTRO, ETIQUETAS_RESUMEN, MOTORES_CONSULTA, agregar_nombres, alcance_anios, calcular_resumen,
+    calcular_tendencia, cargar_datos, columna_orden, columnas_dias_resumen, construir_cubo_medidas,
+    construir_dimensiones, construir_indices_filtros, rankear_resumen, resolver_filtros
+)
+from servicio_api import consultar_servicio
+# reporte_pdf, reporte_excel y exportacion_datos importan ReportLab, openpyxl y PyArrow solo al generar
+# una descarga; Altair y streamlit.components se importan en las secciones que dibujan el gráfico y la
+# tabla. Así la página pinta el encabezado y los filtros sin esperar esas bibliotecas
+# (ver perfil_arranque.py para medir el arranque).
+from reporte_pdf import crear_pdf_profesional, etiqueta_seleccion, leer_logo, nombre_archivo_pdf, preparar_tabla_pdf
+from reporte_excel import MIME_EXCEL, crear_excel_resumen
+from exportacion_datos import FORMATOS_EXPORTACION, exportar_filas
 
 
 # ============================================================
 #  CONFIGURACIÓN GENERAL Y CARGA DE LOGO
 # ============================================================
 
-def load_logo_base64(file_path):
-    """Convierte el archivo de imagen a string Base64."""
+# Tamaños (px) del logo para la página: se envían miniaturas y no el PNG original (~577 KB)
+LADO_LOGO_ENCABEZADO = 200  # Se muestra a 100 px; el doble para pantallas de alta densidad
+LADO_LOGO_ICONO = 64
+
+# Placeholder de emergencia si el archivo de logo no se encuentra
+LOGO_EMERGENCIA = "data:image/png;base64,iVBORw0KGgoAAAANSUhEUgAAABgAAAAYCAYAAADgdz34AAAAAXNSR0IArs4c6QAAAXRJREFUeJzt3LFOwzAUBeFvE4kFioK3oV24cAE8A4P0JcQf4AQ8AW8gY2CgICAgICAgICAgICAg+K1c/70lSZIe3D5/l9f/FwAAAACA1V9n39X607Pfb9/Nn5e3b97b1+f7fUe630z9A4H5f+gDAvP/UC+Yn7c/k5e3v0D2H0j9A4H5f6iFm3y7O/t7/R/c4D/vF/v7jVdD/g/1vF/i9p8H4v+hF25x9+Xl7b+w0lP89o3v9/uOdv9z9e4/vF/s73cO/w+7cIu7vy/n1/f3n6Tif/D5eXn/m/9n7d1/tC4tF078Hl8vL+/8XzG4y92Xl7f/gZ/t2r93/jV19uL29vs3n/f7jnb9L4/G/2f9H7duf7w/f79/b9/e77P9G/f2f9+8BBAAAAICrF16Y66yTfG/vAAAAAElFTkSuQmCC"
+
+@st.cache_resource(show_spinner=False)
+def load_logo_base64(file_path, lado=None):
+    """
+    Convierte el archivo de imagen a string Base64, reducido a 'lado' px (como máximo) si se indica.
+    Se calcula una vez por proceso y no en cada recarga de la página.
+    """
     try:
         base_path = Path(__file__).parent
     except NameError:
@@ -33,39 +61,53 @@ def load_logo_base64(file_path):
     try:
         with open(logo_path, "rb") as f:
             data = f.read()
+        if lado:
+            from PIL import Image  # Pillow ya viene con Streamlit
+
+            imagen = Image.open(BytesIO(data))
+            imagen.thumbnail((lado, lado))
+            salida = BytesIO()
+            imagen.save(salida, format="PNG", optimize=True)
+            data = salida.getvalue()
         return base64.b64encode(data).decode()
     except FileNotFoundError:
         return None
     except Exception as e:
         return None
 
-# Intenta cargar el logo. Si falla, usa un string base64 de emergencia.
-logo_b64 = load_logo_base64("logo_sanpablo.png") 
-
-if logo_b64:
-    logo_src = f"data:image/png;base64,{logo_b64}"
-else:
-    # Placeholder de emergencia si el archivo de logo no se encuentra
-    logo_src = "data:image/png;base64,iVBORw0KGgoAAAANSUhEUgAAABgAAAAYCAYAAADgdz34AAAAAXNSR0IArs4c6QAAAXRJREFUeJzt3LFOwzAUBeFvE4kFioK3oV24cAE8A4P0JcQf4AQ8AW8gY2CgICAgICAgICAgICAg+K1c/70lSZIe3D5/l9f/FwAAAACA1V9n39X607Pfb9/Nn5e3b97b1+f7fUe630z9A4H5f+gDAvP/UC+Yn7c/k5e3v0D2H0j9A4H5f6iFm3y7O/t7/R/c4D/vF/v7jVdD/g/1vF/i9p8H4v+hF25x9+Xl7b+w0lP89o3v9/uOdv9z9e4/vF/s73cO/w+7cIu7vy/n1/f3n6Tif/D5eXn/m/9n7d1/tC4tF078Hl8vL+/8XzG4y92Xl7f/gZ/t2r93/jV19uL29vs3n/f7jnb9L4/G/2f9H7duf7w/f79/b9/e77P9G/f2f9+8BBAAAAICrF16Y66yTfG/vAAAAAElFTkSuQmCC" 
+def logo_data_uri(lado):
+    """Logo como data URI para HTML e ícono de la página; si falla, el placeholder de emergencia."""
+    logo_b64 = load_logo_base64("logo_sanpablo.png", lado)
+    return f"data:image/png;base64,{logo_b64}" if logo_b64 else LOGO_EMERGENCIA
 
 # Configuración de la página
 st.set_page_config(
     page_title="Red San Pablo - Producción HIS", 
-    page_icon=logo_src,  
+    page_icon=logo_data_uri(LADO_LOGO_ICONO),  
     layout="wide"
 )
 
 # Mapeo manual para asegurar los meses en español (usado en la función de fecha)
-meses_espanol = {
-    1: "Enero", 2: "Febrero", 3: "Marzo", 4: "Abril", 5: "Mayo", 6: "Junio",
-    7: "Julio", 8: "Agosto", 9: "Septiembre", 10: "Octubre", 11: "Noviembre", 12: "Diciembre"
-}
+meses_espanol = MESES_ESPANOL
+numero_mes = {v: k for k, v in meses_espanol.items()}
+
+def obtener_version_datos(path="CONSOLIDADO.xlsx"):
+    """
+    Identificador de versión de los datos (fecha de modificación en ns y tamaño del archivo, más la
+    generación de la ingesta mensual). Se pasa a las funciones cacheadas para que se recalculen
+    solo cuando el archivo cambia o se ingiere un período.
+    """
+    return calcular_version_datos(path) or "ejemplo"
 
 @st.cache_data
-def obtener_fecha_modificacion(path="CONSOLIDADO.xlsx"):
+def obtener_fecha_modificacion(path="CONSOLIDADO.xlsx", version=None):
     """Obtiene la fecha y hora de la última modificación del archivo de datos con meses en español."""
     try:
-        timestamp = os.path.getmtime(path)
+        marcas = [t for t in (os.path.getmtime(path) if os.path.exists(path) else None, fecha_ultima_ingesta(path)) if t]
+        if not marcas:
+            raise FileNotFoundError(path)
+        # La fecha más reciente entre el archivo y la última ingesta mensual
+        timestamp = max(marcas)
         # Interpretar timestamp como UTC y convertir a hora de Perú (America/Lima)
         dt_object = datetime.fromtimestamp(timestamp, tz=ZoneInfo("UTC")).astimezone(ZoneInfo("America/Lima"))
         
@@ -84,59 +126,212 @@ def obtener_fecha_modificacion(path="CONSOLIDADO.xlsx"):
 
 
 @st.cache_data
-def cargar_datos(path="CONSOLIDADO.xlsx"):
-    """Carga los datos del archivo Excel o usa datos de ejemplo (con más de 100 filas)."""
-    #  Nota: Reemplace "CONSOLIDADO.xlsx" con la ruta correcta a su archivo.
-    try:
-        df = pd.read_excel(path, engine="openpyxl")
-        df.columns = df.columns.map(lambda c: str(c).strip())
-        df = df.loc[:, ~df.columns.str.contains("^Unnamed")]
-        return df
-    except FileNotFoundError:
-        st.warning(f" **Advertencia:** Archivo de datos no encontrado. Usando datos de ejemplo (120 filas).")
-        # Datos de ejemplo base
-        data = {
-            "anio": [2024, 2024, 2024, 2024, 2024, 2024, 2024, 2024, 2024, 2024],
-            "mes": [10, 10, 10, 10, 10, 10, 10, 10, 11, 11],
-            "nombre_establecimiento": ["IPRESS A", "IPRESS B", "IPRESS A", "IPRESS C", "IPRESS B", "IPRESS A", "IPRESS B", "IPRESS C", "IPRESS A", "IPRESS B"],
-            "profesional": ["Cardiología", "Medicina General", "Cardiología", "Ginecología", "Pediatría", "Medicina Interna", "Oftalmología", "Cirugía", "Cardiología", "Medicina General"],
-            "nombres_profesional": ["Dr. Perez", "Lic. García", "Dr. Perez", "Dra. Lopez", "Dr. Soto", "Dra. Rojas", "Lic. Vidal", "Dr. Castro", "Dr. Perez", "Lic. García"],
-            "total.1": [150, 220, 180, 90, 300, 110, 250, 140, 160, 230], # Usando total.1 como columna de atenciones
-            "atendidos_servicios_total": [120, 180, 140, 70, 250, 90, 200, 100, 130, 190],
-        }
-        
-        # Inicializar columnas de días (1.1 a 31.1)
-        for i in range(1, 32):
-            data[f"{i}.1"] = [max(1, (10 + j * 2) - abs(i - 15)) for j in range(10)] # Valores base ficticios
-             
-        # Crear filas adicionales para simular más de 100 profesionales
-        num_initial_rows = len(data["anio"])
-        rows_to_add = 110 - num_initial_rows if 110 > num_initial_rows else 0
-        
-        for i in range(rows_to_add):
-            idx = i + num_initial_rows
-            
-            data["anio"].append(2024)
-            data["mes"].append(11)
-            data["nombre_establecimiento"].append(f"IPRESS {chr(65 + (idx % 3))}")
-            data["profesional"].append(f"Especialidad {idx % 5}")
-            data["nombres_profesional"].append(f"Dr(a). Ficticio {idx}")
-            data["total.1"].append(100 + idx * 5) # Usando total.1
-            data["atendidos_servicios_total"].append(90 + idx * 4)
-            
-            for j in range(1, 32):
-                data[f"{j}.1"].append(max(0, 5 + (idx % 10) + (j % 5)))
-
-        # Se usa dict comprehension para combinar listas.
-        combined_data = {key: data[key] for key in data}
-        
-        return pd.DataFrame(combined_data)
+def construir_rollup_mensual(path="CONSOLIDADO.xlsx", version=None):
+    """
+    Resumen mensual por (anio, mes, establecimiento, profesión, profesional), con las dimensiones
+    como ids enteros. Las comparaciones entre períodos se sirven desde aquí, sin volver a agrupar
+    el DataFrame crudo. Con almacenamiento particionado se leen los rollups de cada período,
+    que la ingesta actualiza solo para el período que agrega; no se cargan las filas.
+    """
+    if version == "ejemplo":
+        return proyectar_rollup(datos_ejemplo())
+    return cargar_rollups(sincronizar_origen(path))
+
+def periodo_referencia(anio, mes, modo):
+    """Devuelve el (anio, mes) contra el que se compara el período seleccionado."""
+    if modo == "Mes anterior":
+        return (anio - 1, 12) if mes == 1 else (anio, mes - 1)
+    if modo == "Mismo mes del año anterior":
+        return anio - 1, mes
+    return None
+
+def periodo_en_rollup(rollup, anio, mes):
+    """True si el rollup mensual tiene datos del período (en cualquier establecimiento o profesión)."""
+    return bool(((rollup["anio"] == anio) & (rollup["mes"] == mes)).any())
+
+def filtrar_rollup(rollup, anio, mes, filtros_dim):
+    """
+    Selecciona un período del rollup mensual aplicando los filtros de establecimiento, profesión y profesional.
+    Cada filtro es una lista de valores (lista vacía = todos).
+    """
+    mascara = (rollup["anio"] == anio) & (rollup["mes"] == mes)
+    for col, valores in filtros_dim.items():
+        if valores and col in rollup.columns:
+            mascara &= rollup[col].isin(valores)
+    return rollup[mascara]
+
+def comparar_periodos(rollup, actual, referencia, filtros_dim, dims):
+    """
+    Une el período actual y el de referencia del rollup mensual por las dimensiones indicadas
+    y calcula las diferencias (Δ) de atenciones, atendidos y producción diaria.
+    """
+    medidas = ["Atenciones", "Atendidos", "TOTAL"]
+    df_act = filtrar_rollup(rollup, *actual, filtros_dim).groupby(dims, as_index=False)[medidas].sum()
+    df_ref = filtrar_rollup(rollup, *referencia, filtros_dim).groupby(dims, as_index=False)[medidas].sum()
+
+    comparacion = df_act.merge(df_ref, on=dims, how="outer", suffixes=("", "_ref")).fillna(0)
+    for m in medidas:
+        comparacion[f"Δ {m}"] = comparacion[m] - comparacion[f"{m}_ref"]
+    return comparacion.sort_values(by="Atenciones", ascending=False).reset_index(drop=True)
+
+def formato_delta(val):
+    """Formatea una diferencia con signo y separador de miles (+1,234 / -56)."""
+    if pd.isna(val):
+        return ""
+    return f"{int(val):+,}"
+
+INDICADORES_PRODUCTIVIDAD = ["Atenc./Atendido", "Días Activos", "Prom./Día Activo"]
+
+@st.cache_data
+def calcular_indicadores_productividad(anio=None, meses=None, path="CONSOLIDADO.xlsx", version=None):
+    """
+    Calcula por profesional (en toda la red) atenciones por atendido, días activos y promedio de
+    atenciones por día activo, junto con su percentil dentro de la misma profesión.
+    Todo se calcula de forma vectorizada sobre el cubo de medidas y se cachea por versión de datos y período.
+    """
+    anios = () if anio is None else (anio,)
+    df_base = cargar_datos(path, version, anios)
+    cubo, totales, _ = construir_cubo_medidas(path, version, anios)
+    dims = [c for c in ["id_profesion", "id_personal"] if c in df_base.columns]
+    if len(dims) < 2:
+        return pd.DataFrame()
+
+    mascara = np.ones(len(df_base), dtype=bool)
+    if anio is not None and "anio" in df_base.columns:
+        mascara &= df_base["anio"].to_numpy() == anio
+    if meses and "mes" in df_base.columns:
+        mascara &= np.isin(df_base["mes"].to_numpy(), meses)
+
+    i_atenciones = list(MEDIDAS_DIARIAS).index("Atenciones")
+    i_atendidos = list(MEDIDAS_DIARIAS).index("Atendidos por Servicio")
+    valores = pd.DataFrame({
+        "atenciones": totales[mascara, i_atenciones],
+        "atendidos": totales[mascara, i_atendidos],
+        # Días activos a nivel de fila (profesional-mes) para que al sumar meses no se pierdan días
+        "dias_activos": (cubo[mascara, i_atenciones, :] > 0).sum(axis=1),
+    })
+    claves = df_base.loc[mascara, dims].reset_index(drop=True)
+    ind = valores.groupby([claves[c] for c in dims]).sum().reset_index()
+
+    atenciones = ind["atenciones"].to_numpy(dtype=np.float64)
+    atendidos = ind["atendidos"].to_numpy(dtype=np.float64)
+    dias = ind["dias_activos"].to_numpy(dtype=np.float64)
+    ind["Atenc./Atendido"] = np.divide(atenciones, atendidos, out=np.full_like(atenciones, np.nan), where=atendidos > 0)
+    ind["Días Activos"] = ind["dias_activos"]
+    ind["Prom./Día Activo"] = np.divide(atenciones, dias, out=np.full_like(atenciones, np.nan), where=dias > 0)
+
+    # Percentil dentro de la profesión (rank vectorizado por grupo, O(n log n))
+    por_profesion = ind.groupby("id_profesion", sort=False)
+    for col in INDICADORES_PRODUCTIVIDAD:
+        ind[f"P {col}"] = por_profesion[col].rank(pct=True, method="average") * 100
+
+    return ind.drop(columns=["atenciones", "atendidos", "dias_activos"])
+
+def formato_indicador(valor, percentil, decimales=2):
+    """Formatea un indicador con su percentil dentro de la profesión, p. ej. '2.35 · P87'."""
+    if pd.isna(valor):
+        return ""
+    return f"{valor:,.{decimales}f} · P{percentil:.0f}"
+
+# ============================================================
+#  VALIDACIÓN DE CALIDAD DE DATOS (AL CARGAR)
+# ============================================================
+
+@st.cache_data
+def obtener_reporte_calidad(path="CONSOLIDADO.xlsx", version=None, anios=()):
+    """Ejecuta la validación una vez por versión de datos y años cargados, justo después de la carga."""
+    return validar_calidad(cargar_datos(path, version, anios))
 
-def detectar_dias_columnas(columns):
-    """Detecta columnas de días en formato '1.1', '2.1', ..., '31.1'"""
-    # Patrón para detectar números del 1 al 31 seguidos de .1
-    return sorted([str(c) for c in columns if re.fullmatch(r"(0?[1-9]|[12][0-9]|3[01])\.1", str(c))], 
-                  key=lambda x: int(x.split('.')[0]))
+def normalizar_texto(texto):
+    """Pasa a mayúsculas y quita tildes para comparar nombres ('Núñez' -> 'NUNEZ')."""
+    texto = unicodedata.normalize("NFKD", str(texto).upper())
+    return "".join(ch for ch in texto if not unicodedata.combining(ch))
+
+@st.cache_resource
+def construir_indice_profesionales(path="CONSOLIDADO.xlsx", version=None):
+    """
+    Índice de prefijos por token (apellidos y nombres) construido una vez por versión de datos a partir
+    del índice de dimensiones. Devuelve (nombres ordenados, tokens ordenados, id del nombre de cada token)
+    para buscar con bisect.
+    """
+    nombres_dim = construir_dimensiones(path, version)[0]
+    if "id_personal" not in nombres_dim:
+        return [], [], np.array([], dtype=np.int32)
+    nombres = sorted(nombres_dim["id_personal"].dropna().unique().tolist())
+    pares = sorted(
+        (token, i) for i, nombre in enumerate(nombres) for token in set(normalizar_texto(nombre).split())
+    )
+    tokens = [t for t, _ in pares]
+    ids = np.fromiter((i for _, i in pares), dtype=np.int32, count=len(pares))
+    return nombres, tokens, ids
+
+def buscar_profesionales(indice, consulta, limite=50, permitidos=None):
+    """
+    Devuelve los nombres cuyos tokens empiezan por cada término de la consulta (en cualquier orden),
+    usando búsqueda binaria sobre los tokens ordenados e intersección de los ids encontrados.
+    Si se indica 'permitidos', solo se devuelven nombres de ese conjunto (filtros en cascada).
+    """
+    nombres, tokens, ids = indice
+    terminos = normalizar_texto(consulta).split()
+    if not terminos:
+        return []
+    resultado = None
+    for termino in terminos:
+        desde = bisect_left(tokens, termino)
+        hasta = bisect_left(tokens, termino + "\uffff")
+        encontrados = set(ids[desde:hasta].tolist())
+        resultado = encontrados if resultado is None else resultado & encontrados
+        if not resultado:
+            return []
+    # Los ids siguen el orden alfabético de los nombres
+    encontrados = (nombres[i] for i in sorted(resultado))
+    if permitidos is not None:
+        encontrados = (n for n in encontrados if n in permitidos)
+    return [n for _, n in zip(range(limite), encontrados)]
+
+@st.cache_resource
+def construir_jerarquia_dimensiones(path="CONSOLIDADO.xlsx", version=None):
+    """
+    Árbol de ids año -> mes -> IPRESS -> profesión -> profesional armado una vez por versión
+    de datos a partir de las combinaciones del rollup mensual (los filtros no necesitan cargar las filas).
+    Devuelve (niveles, árbol de diccionarios anidados).
+    """
+    rollup = construir_rollup_mensual(path, version)
+    niveles = [c for c in DIMENSIONES_FILTRO if c in rollup.columns]
+    combinaciones = rollup[niveles].dropna().drop_duplicates()
+    arbol = {}
+    for fila in zip(*(combinaciones[c].tolist() for c in niveles)):
+        nodo = arbol
+        for valor in fila:
+            nodo = nodo.setdefault(valor, {})
+    return niveles, arbol
+
+@st.cache_data
+def opciones_filtro(columna, selecciones_previas, path="CONSOLIDADO.xlsx", version=None):
+    """
+    Opciones válidas de 'columna' dadas las selecciones de los niveles anteriores de la jerarquía
+    (tupla de (columna, valores); valores vacíos = todos). Se memoriza por combinación de filtros.
+    """
+    niveles, arbol = construir_jerarquia_dimensiones(path, version)
+    if columna not in niveles:
+        return []
+    previas = dict(selecciones_previas)
+
+    nodos = [arbol]
+    for nivel in niveles[:niveles.index(columna)]:
+        valores = previas.get(nivel)
+        siguientes = []
+        for nodo in nodos:
+            if valores:
+                siguientes.extend(nodo[v] for v in valores if v in nodo)
+            else:
+                siguientes.extend(nodo.values())
+        nodos = siguientes
+
+    opciones = set()
+    for nodo in nodos:
+        opciones.update(nodo.keys())
+    return sorted(opciones)
 
 def renombrar_columnas_dias(df):
     """Renombra las columnas de días de formato '1.1' a solo '1' para mostrar en la tabla"""
@@ -149,260 +344,184 @@ def renombrar_columnas_dias(df):
     return df.rename(columns=rename_dict)
 
 # ============================================================
-#  FUNCIÓN DE GENERACIÓN DE PDF (CORREGIDA)
+#  MATRIZ COMPACTA DE DÍAS (MAPA DE CALOR)
 # ============================================================
 
-def crear_pdf_profesional(df_tabla, filtros, logo_data):
+# Límite de filas que se envían al gráfico; por encima se agrupan profesionales en bloques
+MAX_FILAS_HEATMAP = 60
+dias_semana_abrev = ["Lun", "Mar", "Mié", "Jue", "Vie", "Sáb", "Dom"]
+
+def matriz_dias(df, day_cols):
     """
-    Genera un reporte PDF profesional de la tabla de producción usando ReportLab.
-    
-    CORRECCIÓN: Se ajustan los anchos de columna dinámicamente, forzando un ancho 
-    mínimo para las columnas de días para que la tabla no se descuadre en A4 horizontal.
+    Convierte las columnas de días ('1.1' a '31.1') en una sola matriz NumPy contigua uint16
+    (filas = profesionales, columnas = días), en lugar de 31 columnas sueltas del DataFrame.
     """
-    buffer = BytesIO()
-    # Usar A4 en orientación horizontal para tablas grandes
-    doc = SimpleDocTemplate(buffer, pagesize=landscape(A4),
-                            leftMargin=0.5*inch, rightMargin=0.5*inch,
-                            topMargin=0.5*inch, bottomMargin=0.5*inch)
-    
-    styles = getSampleStyleSheet()
-    story = []
+    cols = [c for c in day_cols if c in df.columns]
+    if not cols:
+        return np.zeros((len(df), 0), dtype=np.uint16)
+    valores = df[cols].to_numpy(dtype=np.float64, na_value=0)
+    # Recortar al rango de uint16 antes de convertir para evitar desbordes
+    np.clip(valores, 0, np.iinfo(np.uint16).max, out=valores)
+    return np.ascontiguousarray(valores, dtype=np.uint16)
+
+def agrupar_filas_matriz(matriz, etiquetas, max_filas=MAX_FILAS_HEATMAP):
+    """
+    Reduce la matriz a como máximo 'max_filas' filas promediando bloques consecutivos
+    del ranking. Así el payload de Vega queda acotado aunque el Top N sea muy grande.
+    """
+    n_filas = matriz.shape[0]
+    if n_filas <= max_filas:
+        return matriz.astype(np.float32), list(etiquetas)
+
+    tam_bloque = -(-n_filas // max_filas)  # División entera hacia arriba
+    n_bloques = -(-n_filas // tam_bloque)
+    relleno = n_bloques * tam_bloque - n_filas
+
+    # Rellenar con ceros para poder hacer reshape a (bloques, tamaño, días)
+    matriz_pad = np.pad(matriz.astype(np.float32), ((0, relleno), (0, 0)))
+    sumas = matriz_pad.reshape(n_bloques, tam_bloque, -1).sum(axis=1)
+    # El último bloque puede estar incompleto: dividir por su tamaño real
+    conteos = np.full(n_bloques, tam_bloque, dtype=np.float32)
+    conteos[-1] -= relleno
+    promedios = sumas / conteos[:, None]
+
+    etiquetas_bloque = [
+        f"Puestos {i * tam_bloque + 1}–{min((i + 1) * tam_bloque, n_filas)}"
+        for i in range(n_bloques)
+    ]
+    return promedios, etiquetas_bloque
+
+def datos_heatmap(matriz, etiquetas, dias, anio=None, mes=None, max_filas=MAX_FILAS_HEATMAP):
+    """
+    Genera el DataFrame largo (profesional × día) para el mapa de calor a partir de la matriz compacta.
+    Marca fines de semana (si hay un año y mes concretos) y días de sobrecarga (percentil 95 de los días con producción).
+    """
+    valores, filas = agrupar_filas_matriz(matriz, etiquetas, max_filas)
+    n_filas, n_dias = valores.shape
+    if n_filas == 0 or n_dias == 0:
+        return pd.DataFrame()
 
-    # --- TÍTULO PRINCIPAL Y LOGO ---
-    
-    # 1. Logo (si está disponible)
-    img = None
-    if logo_data:
-        # Reposicionar el puntero del BytesIO si se va a usar
-        logo_data.seek(0)
-        try:
-            # Crear Image desde BytesIO
-            img = Image(logo_data, width=0.75*inch, height=0.75*inch)
-        except Exception:
-            img = None
-    
-    # 2. Título basado en filtros
-    filtro_mes = filtros.get("Mes", "Todos")
-    filtro_ipress = filtros.get("Establecimiento", "Todas las IPRESS")
-    
-    titulo_texto = f"REPORTE GENERAL DE PRODUCCIÓN HIS"
-    subtitulo_texto = f"PERÍODO: {filtro_mes} | ESTABLECIMIENTO: {filtro_ipress} | AÑO: {filtros.get('Año', 'Todos')}"
-    
-    
-    # Estilos de títulos
-    style_h1 = styles['h1']
-    style_h1.alignment = 1 # Centro
-    style_h1.textColor = colors.HexColor('#003c8f') # Azul oscuro
-    style_h1.fontName = 'Helvetica-Bold'
-    style_h1.fontSize = 18
-    
-    style_sub = styles['h3']
-    style_sub.alignment = 1 # Centro
-    style_sub.textColor = colors.HexColor('#555555') 
-    style_sub.fontName = 'Helvetica'
-    style_sub.fontSize = 12
-
-    # Construir el encabezado con logo y texto (usando una tabla de 2 columnas)
-    titulo_main = Paragraph(titulo_texto, style_h1)
-    titulo_sub = Paragraph(subtitulo_texto, style_sub)
-    
-    # Crea una tabla para alinear el logo y el texto
-    ancho_pagina = landscape(A4)[0]
-    ancho_disponible = ancho_pagina - 1.0 * inch # Márgenes de 0.5" a cada lado
-
-    if img:
-        # Usamos una estructura de 2x2 para alinear el logo y el texto en el centro
-        header_data = [[img, titulo_main], ['', titulo_sub]]
-        # Ancho total: ~10.0 pulgadas. Logo: 1 pulgada, Texto: 9.0 pulgadas.
-        col_widths_header = [1.0 * inch, ancho_disponible - 1.0 * inch] 
+    dias = np.asarray(dias, dtype=np.int16)
+    activos = valores[valores > 0]
+    umbral = float(np.percentile(activos, 95)) if activos.size else 0.0
+
+    datos = pd.DataFrame({
+        "Profesional": np.repeat(np.asarray(filas, dtype=object), n_dias),
+        "Día": np.tile(dias, n_filas),
+        "Atenciones": valores.ravel(),
+    })
+    datos["Sobrecarga"] = (datos["Atenciones"] >= umbral) & (datos["Atenciones"] > 0)
+
+    if anio is not None and mes is not None:
+        # Días de la semana del mes filtrado (0 = lunes); los días que no existen en el mes quedan vacíos
+        dias_mes = calendar.monthrange(anio, mes)[1]
+        semana = np.array([calendar.weekday(anio, mes, d) if d <= dias_mes else -1 for d in dias])
+        etiqueta_dia = [f"{dias_semana_abrev[w]} {d}" if w >= 0 else str(d) for d, w in zip(dias, semana)]
+        datos["Día Semana"] = np.tile(np.asarray(etiqueta_dia, dtype=object), n_filas)
+        datos["Fin de Semana"] = np.tile(semana >= 5, n_filas)
     else:
-        header_data = [[titulo_main], [titulo_sub]]
-        col_widths_header = [ancho_disponible]
+        datos["Día Semana"] = datos["Día"].astype(str)
+        datos["Fin de Semana"] = False
 
-    header_table = Table(header_data, colWidths=col_widths_header)
-    
-    header_table.setStyle(TableStyle([
-        ('ALIGN', (0, 0), (-1, -1), 'CENTER'),
-        ('VALIGN', (0, 0), (-1, -1), 'MIDDLE'),
-        ('LEFTPADDING', (0, 0), (-1, -1), 0),
-        ('RIGHTPADDING', (0, 0), (-1, -1), 0),
-        ('TOPPADDING', (0, 0), (-1, -1), 0),
-        ('BOTTOMPADDING', (0, 0), (-1, -1), 0),
-    ]))
-    
-    story.append(header_table)
-    story.append(Spacer(1, 0.25*inch))
-    
-    # --- TABLA DE DATOS ---
-    
-    # Preparar datos para ReportLab
-    # df_tabla debe tener las columnas que se quieren mostrar
-    
-    # 1. Renombrar columnas de días en el DataFrame para el PDF
-    df_temp = df_tabla.copy()
-    
-    # Renombrar columnas de días de formato '1.1' a '1' para el PDF
-    for col in df_temp.columns:
-        if re.fullmatch(r"(0?[1-9]|[12][0-9]|3[01])\.1", str(col)):
-            nuevo_nombre = col.split('.')[0]
-            df_temp = df_temp.rename(columns={col: nuevo_nombre})
-    
-    # 2. Añadir columna ITEM (Index + 1)
-    df_temp = df_temp.reset_index().rename(columns={'index': 'ITEM'}).copy()
-    df_temp['ITEM'] = df_temp.index + 1
-    
-    # Reordenar para que ITEM sea la primera columna
-    cols_order = ['ITEM'] + [col for col in df_temp.columns if col != 'ITEM']
-    df_temp = df_temp[cols_order]
+    return datos
 
-    # Convertir a lista de listas para ReportLab
-    data = [df_temp.columns.tolist()] + df_temp.values.tolist()
-    
-    # 3. Convertir números a strings con formato de miles
-    for i in range(1, len(data)):
-        for j in range(len(data[i])):
-            val = data[i][j]
-            try:
-                # Asumiendo que las columnas numéricas relevantes son enteros (días, atendidos, atenciones)
-                if isinstance(val, (int, float)) and not pd.isna(val): 
-                    data[i][j] = f"{int(val):,}"
-                elif pd.isna(val):
-                    data[i][j] = ""
-            except:
-                pass
-
-    # Crear objeto Table
-    # Ancho total disponible (usando el mismo que para el encabezado)
-    table_width = ancho_disponible 
-
-    # Número total de columnas
-    num_cols = len(data[0]) 
-    
-    # Crear lista de anchos de columna dinámicamente
-    col_widths = []
-    
-    # Definir el número de columnas fijas de identificación (ITEM, Prof, Profesion, Estab, Atendidos, Atenciones)
-    NUM_FIXED_COLS = 6
-    
-    if num_cols >= NUM_FIXED_COLS:
-        # Anchos fijos optimizados para A4 paisaje (suman 5.7 pulgadas)
-        col_widths_fixed = [
-            0.3 * inch,  # ITEM
-            1.7 * inch,  # Profesional (REDUCIDO)
-            1.2 * inch,  # Profesión 
-            1.2 * inch,  # Establecimiento
-            0.7 * inch,  # Atendidos
-            0.6 * inch   # Atenciones
-        ]
-        col_widths.extend(col_widths_fixed)
-        
-        # Calcular ancho restante
-        remaining_width = table_width - sum(col_widths)
-        num_day_cols = num_cols - NUM_FIXED_COLS - 1  # Restar 1 para la columna TOTAL
-        
-        if num_day_cols > 0:
-            # Ancho mínimo para columnas de días (0.15 pulgadas = 10.8 puntos)
-            day_width_min = 0.15 * inch 
-            
-            # Usar el ancho mínimo si el espacio lo permite, sino dividir el espacio restante.
-            if num_day_cols * day_width_min > remaining_width:
-                 # Caso extremo: dividir el espacio restante entre las columnas de días
-                 day_width_final = remaining_width / num_day_cols
-            else:
-                 # Caso normal: usar el ancho mínimo para que las columnas de día sean estrechas
-                 day_width_final = day_width_min
+# ============================================================
+#  DETECCIÓN DE ANOMALÍAS EN LAS SERIES DIARIAS
+# ============================================================
+
+@st.cache_resource
+def detectar_anomalias(path="CONSOLIDADO.xlsx", version=None, anios=()):
+    """
+    Códigos de alerta de cada celda fila × medida × día del cubo y DataFrame con una fila por alerta
+    (ver marcar_anomalias en alertas_his.py). Se recalcula solo por versión de datos y años cargados.
+    """
+    df_base = cargar_datos(path, version, anios)
+    cubo, _, _ = construir_cubo_medidas(path, version, anios)
+    periodo = {"anios": df_base["anio"], "meses": df_base["mes"]} if {"anio", "mes"} <= set(df_base.columns) else {}
+    alertas, lista = marcar_anomalias(cubo, **periodo)
+    alertas.flags.writeable = False
+    return alertas, lista
+
+# ============================================================
+#  RESUMEN Y TENDENCIA (MOTOR REMOTO OPCIONAL: SERVICIO DE AGREGACIÓN)
+# ============================================================
 
-            # Asegurar que el ancho de la columna de día no sea negativo (si remaining_width fuera negativo)
-            if day_width_final < 0:
-                 day_width_final = 0.1 * inch
+# Motor del resumen (ver consultas_his.py); se elige con la variable de entorno TABLERO_MOTOR.
+MOTOR_CONSULTA = os.environ.get("TABLERO_MOTOR", "pandas").strip().lower()
+if MOTOR_CONSULTA not in MOTORES_CONSULTA:
+    MOTOR_CONSULTA = "pandas"
 
-            col_widths.extend([day_width_final] * num_day_cols)
-            
-        # Agregar ancho para la columna TOTAL (más ancha que las columnas de días)
-        col_widths.append(0.5 * inch)  # Columna TOTAL más ancha
+# Con TABLERO_API_URL el ranking y la tendencia los calcula el servicio HTTP (servicio_api.py); si
+# no responde, se calculan en este proceso. Es solo un motor remoto del resumen: la página sigue
+# cargando aquí las filas del año elegido para los filtros, las alertas, la comparación, los
+# indicadores, el reporte de calidad y las descargas.
+URL_SERVICIO = os.environ.get("TABLERO_API_URL", "").strip()
 
-    # Crear la tabla
-    if not col_widths: 
-        return None
-        
-    # El ancho de la tabla será la suma de los anchos de columna calculados
-    pdf_table = Table(data, colWidths=col_widths)
-
-    # Definir estilos de tabla
-    style = TableStyle([
-        # Headers
-        ('BACKGROUND', (0, 0), (-2, 0), colors.HexColor('#003c8f')), # Azul oscuro para todas excepto TOTAL
-        ('TEXTCOLOR', (0, 0), (-2, 0), colors.white),
-        ('ALIGN', (0, 0), (-1, 0), 'CENTER'),
-        ('VALIGN', (0, 0), (-1, 0), 'MIDDLE'),
-        ('FONTNAME', (0, 0), (-1, 0), 'Helvetica-Bold'),
-        ('FONTSIZE', (0, 0), (-2, 0), 6), # Reducir tamaño de fuente en headers
-        ('FONTSIZE', (-1, 0), (-1, 0), 7), # Tamaño de fuente más grande para TOTAL header
-        ('BOTTOMPADDING', (0, 0), (-1, 0), 4),
-        ('GRID', (0, 0), (-1, -1), 0.5, colors.HexColor('#CCCCCC')),
-        ('LEFTPADDING', (0, 0), (-1, -1), 1),
-        ('RIGHTPADDING', (0, 0), (-1, -1), 1),
-        
-        # Body
-        ('FONTNAME', (0, 1), (-1, -1), 'Helvetica'),
-        ('FONTSIZE', (0, 1), (-2, -1), 5), # AÚN MÁS REDUCIDO: 5 puntos para las filas de datos
-        ('FONTSIZE', (-1, 1), (-1, -1), 6), # Tamaño de fuente más grande para datos de TOTAL
-        ('ALIGN', (0, 1), (0, -1), 'CENTER'), # ITEM (Index)
-        ('ALIGN', (1, 1), (1, -1), 'LEFT'), # PROFESIONAL
-        ('ALIGN', (2, 1), (-1, -1), 'CENTER'), # El resto
-        ('VALIGN', (0, 1), (-1, -1), 'MIDDLE'),
-        
-        # Columna de totales (ATENDIDOS y ATENCIONES) - Índices 4 y 5
-        ('BACKGROUND', (4, 1), (5, -1), colors.HexColor('#d4edda')), # Verde claro
-        ('TEXTCOLOR', (4, 1), (5, -1), colors.HexColor('#155724')), # Verde oscuro
-        ('FONTNAME', (4, 1), (5, -1), 'Helvetica-Bold'),
-        
-        # Columna TOTAL - aplicar un estilo especial
-        ('BACKGROUND', (-1, 0), (-1, 0), colors.HexColor('#ffc107')), # Amarillo para header de TOTAL
-        ('TEXTCOLOR', (-1, 0), (-1, 0), colors.HexColor('#856404')), # Marrón oscuro para texto
-        ('FONTNAME', (-1, 0), (-1, 0), 'Helvetica-Bold'),
-        ('BACKGROUND', (-1, 1), (-1, -1), colors.HexColor('#fff3cd')), # Amarillo claro para datos de TOTAL
-        ('TEXTCOLOR', (-1, 1), (-1, -1), colors.HexColor('#856404')), # Marrón oscuro para texto
-        ('FONTNAME', (-1, 1), (-1, -1), 'Helvetica-Bold'),
-    ])
-    
-    # --- FILAS RAYADAS ---
-    for i in range(1, len(data)):
-        if i % 2 == 0:
-            style.add('BACKGROUND', (0, i), (-2, i), colors.HexColor('#eef6ff')) # Excluir columna TOTAL
+@st.cache_data
+def obtener_ranking(selecciones, filtro_medida, motor="pandas", path="CONSOLIDADO.xlsx", version=None):
+    """Ranking por profesional de las filas filtradas (ver rankear_resumen); se cachea por filtros, medida y versión."""
+    if URL_SERVICIO:
+        try:
+            return consultar_servicio(URL_SERVICIO, "resumen", selecciones, filtro_medida, motor)
+        except OSError:
+            pass
+    _, _, dias_presentes = construir_cubo_medidas(path, version, alcance_anios(selecciones))
+    resumen = calcular_resumen(selecciones, filtro_medida, motor, path, version)
+    return rankear_resumen(resumen, filtro_medida, columnas_dias_resumen(filtro_medida, dias_presentes))
 
-    pdf_table.setStyle(style)
-    story.append(pdf_table)
-    
-    # --- FOOTER ---
-    story.append(Spacer(1, 0.25*inch))
-    fecha_reporte = datetime.now(ZoneInfo("America/Lima")).strftime("%d/%m/%Y %H:%M:%S")
-    footer_text = f"Generado el: {fecha_reporte} (Perú). | Fuente de Datos: HISMINSA. | Este reporte incluye {len(df_tabla)} profesionales."
-    
-    style_footer = styles['Normal']
-    style_footer.alignment = 1 # Centro
-    style_footer.textColor = colors.HexColor('#6c757d')
-    style_footer.fontSize = 8
-    
-    story.append(Paragraph(footer_text, style_footer))
-    
-    # --- CONSTRUIR DOCUMENTO ---
-    try:
-        doc.build(story)
-        buffer.seek(0)
-        return buffer
-    except Exception as e:
-        st.error(f"Error al generar el PDF: {e}")
-        return None
+@st.cache_data
+def obtener_tendencia(selecciones, filtro_medida, path="CONSOLIDADO.xlsx", version=None):
+    """Serie diaria de la medida elegida para las filas filtradas."""
+    if URL_SERVICIO:
+        try:
+            return consultar_servicio(URL_SERVICIO, "tendencia", selecciones, filtro_medida)
+        except OSError:
+            pass
+    return calcular_tendencia(selecciones, filtro_medida, path, version)
+
+@st.cache_data(max_entries=20)
+def exportar_excel(selecciones, filtro_medida, filtros, motor="pandas", path="CONSOLIDADO.xlsx", version=None):
+    """
+    Excel del resumen completo (mismas columnas que el PDF, más ITEM). Se genera recién cuando se
+    pide la descarga y queda cacheado por filtros, medida y versión de datos.
+    """
+    _, _, dias_presentes = construir_cubo_medidas(path, version, alcance_anios(selecciones))
+    ranking = agregar_nombres(obtener_ranking(selecciones, filtro_medida, motor, path, version), construir_dimensiones(path, version)[0])
+    tabla = preparar_tabla_pdf(ranking.rename(columns=ETIQUETAS_RESUMEN), columnas_dias_resumen(filtro_medida, dias_presentes))
+    return crear_excel_resumen(tabla, filtros)
 
+@st.cache_data(max_entries=20)
+def exportar_pdf(selecciones, filtro_medida, filtros, motor="pandas", path="CONSOLIDADO.xlsx", version=None):
+    """
+    PDF del resumen completo (ver crear_pdf_profesional). Igual que el Excel, se genera recién
+    cuando se pide la descarga (ReportLab no se importa antes) y queda cacheado por filtros.
+    """
+    _, _, dias_presentes = construir_cubo_medidas(path, version, alcance_anios(selecciones))
+    ranking = agregar_nombres(obtener_ranking(selecciones, filtro_medida, motor, path, version), construir_dimensiones(path, version)[0])
+    tabla = preparar_tabla_pdf(ranking.rename(columns=ETIQUETAS_RESUMEN), columnas_dias_resumen(filtro_medida, dias_presentes))
+    return crear_pdf_profesional(tabla, filtros, leer_logo(Path(__file__).parent / "logo_sanpablo.png")).getvalue()
 
-df = cargar_datos()
-day_cols = detectar_dias_columnas(df.columns)
-fecha_actualizacion = obtener_fecha_modificacion()
+def generar_descarga(errores, nombre, funcion, *args, **kwargs):
+    """
+    Genera el archivo de un botón de descarga diferida. Streamlit la ejecuta fuera de la ejecución
+    de la página y ante un error solo avisa que falló la descarga, así que el error se anota en
+    'errores' (un diccionario de la sesión) y la página lo muestra junto al botón al volver a ejecutarse.
+    """
+    try:
+        datos = funcion(*args, **kwargs)
+    except Exception as e:
+        errores[nombre] = str(e)
+        raise
+    errores.pop(nombre, None)
+    return datos
+
+# Las filas se cargan recién después de los filtros y solo las del año elegido (ver APLICAR FILTROS);
+# los filtros se arman con el rollup mensual y el índice de dimensiones, que son chicos.
+version_datos = obtener_version_datos()
+if version_datos == "ejemplo":
+    st.warning(f" **Advertencia:** Archivo de datos no encontrado. Usando datos de ejemplo (120 filas).")
+fecha_actualizacion = obtener_fecha_modificacion(version=version_datos)
 orden_meses = list(meses_espanol.values())
-if "mes" in df.columns:
-    df["mes_nombre"] = df["mes"].map(meses_espanol)
-    df["mes_nombre"] = pd.Categorical(df["mes_nombre"], categories=orden_meses, ordered=True)
 
 
 # ============================================================
@@ -657,7 +776,7 @@ st.markdown(f"""
     color:white;
     margin-bottom:0px; 
 ">
-    <img src="{logo_src}" style="
+    <img src="{logo_data_uri(LADO_LOGO_ENCABEZADO)}" style="
         width:100px;
         height:100px; 
         border-radius:50%; 
@@ -687,7 +806,7 @@ st.markdown(f"""
 # ============================================================
 #  FECHA DE ACTUALIZACIÓN DEL ARCHIVO Y FUENTE
 # ============================================================
-fecha_actualizacion = obtener_fecha_modificacion()
+fecha_actualizacion = obtener_fecha_modificacion(version=version_datos)
 
 #  Contenedor de Fecha y Fuente
 st.markdown(f"""
@@ -713,84 +832,275 @@ st.markdown(f"""
 unsafe_allow_html=True)
 
 # ============================================================
-#  FILTROS (EXPANDER FIJO CON HOVER)
+#  REPORTE DE CALIDAD DE DATOS
 # ============================================================
-with st.expander(" **FILTROS DE BÚSQUEDA**", expanded=True):
-    # Streamlit se encarga de apilar estas columnas en móvil
-    filtro_col1, filtro_col2, filtro_col3, filtro_col4, filtro_col5 = st.columns(5)
+# Se valida lo que se cargó (los años elegidos), así que el reporte se completa después de los
+# filtros; el contenedor lo mantiene en este lugar de la página.
+contenedor_calidad = st.container()
+
+def mostrar_reporte_calidad(df, anios):
+    """Consolidación de duplicados y reglas de calidad con observaciones de las filas cargadas."""
+    resumen_calidad, detalle_calidad = obtener_reporte_calidad(version=version_datos, anios=anios)
+    reglas_observadas = resumen_calidad[resumen_calidad["Filas Observadas"] > 0]
+
+    # Filas del archivo que cargar_datos fusionó por tener la misma clave de registro
+    consolidadas = df[df["filas_origen"] > 1] if "filas_origen" in df.columns else df.iloc[0:0]
+    if not consolidadas.empty:
+        with st.expander(
+            f" **Consolidación: {int(consolidadas['filas_origen'].sum()):,} filas duplicadas fusionadas en {len(consolidadas):,}**"
+        ):
+            cols_consolidadas = [c for c in CLAVES_REGISTRO + ["nombres_profesional", "nombre_establecimiento", "filas_origen", "total.1"] if c in df.columns]
+            st.dataframe(consolidadas[cols_consolidadas], hide_index=True, width="stretch")
+
+    if reglas_observadas.empty:
+        st.caption(f" Validación de calidad: {len(resumen_calidad)} reglas verificadas sin observaciones.")
+    else:
+        with st.expander(f" **Calidad de Datos: {len(reglas_observadas)} regla(s) con observaciones**"):
+            st.dataframe(resumen_calidad, hide_index=True, width="stretch")
+            filas_observadas = detalle_calidad.any(axis=1)
+            cols_id = [c for c in ["id_personal", "nombres_profesional", "nombre_establecimiento", "anio", "mes"] if c in df.columns]
+            observadas = df.loc[filas_observadas, cols_id].copy()
+            observadas["Reglas"] = [
+                "; ".join(detalle_calidad.columns[fila]) for fila in detalle_calidad[filas_observadas].to_numpy()
+            ]
+            st.dataframe(observadas, hide_index=True, width="stretch")
 
-    with filtro_col1:
-        anios_data = sorted(df["anio"].dropna().unique().tolist()) if "anio" in df.columns else []
-        anios = ["Todos"] + anios_data
+# ============================================================
+#  FILTROS (EXPANDER FIJO CON HOVER)
+# ============================================================
+# Los filtros son un fragmento: pasar a selección múltiple o escribir en el buscador solo vuelve a
+# ejecutar esta sección. Todo lo demás depende de las selecciones, así que cuando estas cambian se
+# recarga la página completa.
+# Cada filtro está enlazado a un parámetro de la URL (bind="query-params", la clave del widget es el
+# nombre del parámetro), así que el enlace de la página reproduce el reporte al compartirlo o
+# recargarlo, p. ej. ?anio=2025&mes=Octubre&establecimiento=CALLANCAS. Los valores que no son
+# opciones válidas se descartan.
+nombres_dim, ids_por_nombre_dim = construir_dimensiones(version=version_datos)
+
+@st.fragment(key="filtros")
+def fragmento_filtros(columnas, nombres_dim, ids_por_nombre_dim, version_datos):
+    """Dibuja los filtros y devuelve (selecciones por dimensión, filtros para títulos y archivos, comparación)."""
+    with st.expander(" **FILTROS DE BÚSQUEDA**", expanded=True):
+        col_modo1, col_modo2 = st.columns(2)
+        with col_modo1:
+            # Permite elegir varios meses, establecimientos o profesiones a la vez
+            seleccion_multiple = st.checkbox(
+                " **Selección múltiple** (Mes, Establecimiento, Profesión)", value=False,
+                key="multiple", bind="query-params"
+            )
+        with col_modo2:
+            con_boton = st.toggle(" **Aplicar con botón**", value=True, key="filtros_con_boton")
+
+        # Con "Aplicar con botón" los cambios se acumulan en un formulario y se aplican juntos (una sola
+        # recarga de la página); sin él, cada filtro se aplica apenas cambia. En ambos modos las
+        # opciones de cada filtro dependen de los valores ya aplicados de los anteriores.
+        contenedor = st.form("form_filtros", border=False) if con_boton else st.container()
+        with contenedor:
+            # Streamlit se encarga de apilar estas columnas en móvil
+            filtro_col1, filtro_col2, filtro_col3, filtro_col4, filtro_col5 = st.columns(5)
+
+            # Las opciones de cada filtro dependen de los anteriores (año -> mes -> IPRESS -> profesión -> profesional)
+            # y se sirven desde la jerarquía de dimensiones cacheada.
+            with filtro_col1:
+                anios_data = opciones_filtro("anio", (), version=version_datos)
+                anios = ["Todos"] + anios_data
         
-        default_year = "Todos"
-        # Lógica para establecer un año por defecto
-        if 2025 not in anios_data:
-            if 2025 not in anios:
-                 anios.append(2025)
-                 anios = sorted(anios, key=lambda x: x if x != "Todos" else 0)
+                default_year = "Todos"
+                # Lógica para establecer un año por defecto
+                if 2025 not in anios_data:
+                    if 2025 not in anios:
+                         anios.append(2025)
+                         anios = sorted(anios, key=lambda x: x if x != "Todos" else 0)
         
-        if 2025 in anios:
-            default_year = 2025
-        elif len(anios_data) == 1:
-            default_year = anios_data[0]
+                if 2025 in anios:
+                    default_year = 2025
+                elif len(anios_data) == 1:
+                    default_year = anios_data[0]
 
-        default_index = anios.index(default_year) if default_year in anios else 0
+                default_index = anios.index(default_year) if default_year in anios else 0
         
-        filtro_anio = st.selectbox(
-            " **Año**", 
-            anios, 
-            index=default_index
-        )
+                filtro_anio = st.selectbox(
+                    " **Año**", 
+                    anios, 
+                    index=default_index,
+                    key="anio", bind="query-params"
+                )
+
+            # En modo múltiple cada filtro es una lista (vacía = "Todos"); en modo simple, una lista de 0 o 1 valor
+            previas = [("anio", () if filtro_anio == "Todos" else (int(filtro_anio),))]
+            with filtro_col2:
+                meses_validos = set(opciones_filtro("mes", tuple(previas), version=version_datos))
+                meses_opciones = [m for m in orden_meses if numero_mes[m] in meses_validos] if "mes" in columnas else orden_meses
+                if seleccion_multiple:
+                    sel_meses = st.multiselect(" **Mes**", meses_opciones, placeholder="Todos", key="meses", bind="query-params")
+                else:
+                    mes_elegido = st.selectbox(" **Mes**", ["Todos"] + meses_opciones, key="mes", bind="query-params")
+                    sel_meses = [] if mes_elegido == "Todos" else [mes_elegido]
+
+            previas.append(("mes", tuple(numero_mes[m] for m in sel_meses)))
+            # Los filtros trabajan con ids; los nombres solo se usan para mostrar las opciones
+            with filtro_col3:
+                nombres_ipress = nombres_dim.get("id_establecimiento_x", pd.Series(dtype=object))
+                ipress = sorted(
+                    opciones_filtro("id_establecimiento_x", tuple(previas), version=version_datos),
+                    key=lambda i: str(nombres_ipress.get(i, i))
+                )
+                mostrar_ipress = lambda i: i if i == "Todos" else nombres_ipress.get(i, i)
+                if seleccion_multiple:
+                    sel_ipress = st.multiselect(
+                        " **Establecimiento**", ipress, format_func=mostrar_ipress, placeholder="Todos",
+                        key="establecimientos", bind="query-params"
+                    )
+                else:
+                    ipress_elegida = st.selectbox(
+                        " **Establecimiento**", ["Todos"] + ipress, format_func=mostrar_ipress,
+                        key="establecimiento", bind="query-params"
+                    )
+                    sel_ipress = [] if ipress_elegida == "Todos" else [ipress_elegida]
+
+            previas.append(("id_establecimiento_x", tuple(sel_ipress)))
+            with filtro_col4:
+                # Varias claves id_profesion comparten el mismo nombre: se ofrece el nombre y se filtra por sus ids
+                nombres_profesion = nombres_dim.get("id_profesion", pd.Series(dtype=object))
+                ids_profesion = opciones_filtro("id_profesion", tuple(previas), version=version_datos)
+                especialidades = sorted(set(nombres_profesion.reindex(ids_profesion).dropna()))
+                # El título del filtro ahora es "Profesión/Especialidad"
+                if seleccion_multiple:
+                    sel_especialidades = st.multiselect(
+                        " **Profesión/Especialidad**", especialidades, placeholder="Todos",
+                        key="profesiones", bind="query-params"
+                    )
+                else:
+                    especialidad_elegida = st.selectbox(
+                        " **Profesión/Especialidad**", ["Todos"] + especialidades, key="profesion", bind="query-params"
+                    )
+                    sel_especialidades = [] if especialidad_elegida == "Todos" else [especialidad_elegida]
+                sel_ids_profesion = [i for nombre in sel_especialidades for i in ids_por_nombre_dim["id_profesion"][nombre]]
+
+            filtro_mes = etiqueta_seleccion(sel_meses)
+            filtro_ipress = etiqueta_seleccion([nombres_ipress.get(i, i) for i in sel_ipress])
+
+            previas.append(("id_profesion", tuple(sel_ids_profesion)))
+            with filtro_col5:
+                # Búsqueda por prefijo de apellidos o nombres sobre el índice cacheado (no se envía la lista completa)
+                indice_profesionales = construir_indice_profesionales(version=version_datos)
+                consulta_profesional = st.text_input(
+                    " **Profesional**", placeholder="Buscar por apellido o nombre", key="buscar", bind="query-params"
+                )
+                filtro_profesional = "Todos"
+                if consulta_profesional.strip():
+                    # Solo profesionales que existen bajo los filtros anteriores
+                    ids_permitidos = opciones_filtro("id_personal", tuple(previas), version=version_datos)
+                    permitidos = set(nombres_dim["id_personal"].reindex(ids_permitidos).dropna())
+                    coincidencias = buscar_profesionales(indice_profesionales, consulta_profesional, permitidos=permitidos)
+                    if coincidencias:
+                        filtro_profesional = st.selectbox(
+                            " **Coincidencias**",
+                            ["Todos"] + coincidencias,
+                            index=1 if len(coincidencias) == 1 else 0,
+                            label_visibility="collapsed",
+                            key="profesional", bind="query-params"
+                        )
+                    else:
+                        st.caption("Sin coincidencias.")
+
+            # Modo de comparación de períodos (requiere un año y un mes concretos)
+            filtro_comparacion = st.radio(
+                " **Comparar con**",
+                ["Sin comparación", "Mes anterior", "Mismo mes del año anterior"],
+                horizontal=True,
+                key="comparar", bind="query-params"
+            )
+
+            if con_boton:
+                st.form_submit_button("Aplicar", type="primary")
+
+    selecciones = {
+        "anio": [] if filtro_anio == "Todos" else [int(filtro_anio)],
+        "mes": [numero_mes[m] for m in sel_meses],
+        "id_establecimiento_x": sel_ipress,
+        "id_profesion": sel_ids_profesion,
+        # Un mismo nombre puede tener varios id_personal (uno por establecimiento)
+        "id_personal": [] if filtro_profesional == "Todos" else ids_por_nombre_dim["id_personal"][filtro_profesional],
+    }
+    filtros_aplicados = {"Mes": filtro_mes, "Establecimiento": filtro_ipress, "Año": filtro_anio}
 
-    with filtro_col2:
-        filtro_mes = st.selectbox(" **Mes**", ["Todos"] + orden_meses)
+    # En una ejecución solo del fragmento, un cambio de selecciones recarga toda la página
+    firma = (repr(selecciones), filtro_comparacion)
+    firma_anterior = st.session_state.get("firma_filtros")
+    st.session_state["firma_filtros"] = firma
+    if firma_anterior is not None and firma_anterior != firma:
+        st.rerun()
+    return selecciones, filtros_aplicados, filtro_comparacion
 
-    with filtro_col3:
-        ipress = ["Todos"] + sorted(df["nombre_establecimiento"].dropna().unique().tolist()) if "nombre_establecimiento" in df.columns else ["Todos"]
-        filtro_ipress = st.selectbox(" **Establecimiento**", ipress)
+niveles_filtro = construir_jerarquia_dimensiones(version=version_datos)[0]
+selecciones, filtros_aplicados, filtro_comparacion = fragmento_filtros(niveles_filtro, nombres_dim, ids_por_nombre_dim, version_datos)
+filtro_anio, filtro_mes, filtro_ipress = filtros_aplicados["Año"], filtros_aplicados["Mes"], filtros_aplicados["Establecimiento"]
 
-    with filtro_col4:
-        especialidades = ["Todos"] + sorted(df["profesional"].dropna().unique().tolist()) if "profesional" in df.columns else ["Todos"]
-        # El título del filtro ahora es "Profesión/Especialidad"
-        filtro_especialidad = st.selectbox(" **Profesión/Especialidad**", especialidades) 
+# ============================================================
+#  CARGA DE LAS FILAS DEL AÑO ELEGIDO
+# ============================================================
+# Solo se leen las particiones del año seleccionado ("Todos" = todo el historial). Las posiciones de
+# fila de los índices de filtros, el cubo y las alertas son relativas a estas filas.
+anios_datos = alcance_anios(selecciones)
+# Es el recurso compartido de solo lectura (sin copia por ejecución): no se le agregan columnas; lo que
+# se derive de todas las filas se calcula una vez en un recurso cacheado, como el cubo de medidas.
+df = cargar_datos(version=version_datos, anios=anios_datos)
 
-    with filtro_col5:
-        profesionales = ["Todos"] + sorted(df["nombres_profesional"].dropna().unique().tolist()) if "nombres_profesional" in df.columns else ["Todos"]
-        filtro_profesional = st.selectbox(" **Profesional**", profesionales)
+with contenedor_calidad:
+    mostrar_reporte_calidad(df, anios_datos)
 
 # ============================================================
 #  PARÁMETROS 
 # ============================================================
 st.markdown("---") 
 
+# Controles de la vista de resultados: cada uno vuelve a ejecutar solo los fragmentos que usan su
+# valor (leído de st.session_state), no el script completo. La medida cambia todos los cálculos,
+# así que recarga la página.
+FRAGMENTOS_TOP_N = ["tabla", "grafico", "mapa_calor"]
+FRAGMENTOS_DIAS = ["tabla", "metricas"]
+FRAGMENTOS_INDICADORES = ["tabla"]
+
+def recargar_fragmentos(claves):
+    """
+    Callback de los controles de resultados. Si la última ejecución completa no llegó a dibujar los
+    fragmentos (filtros sin datos), no hay a quién recargar y sigue la recarga completa de siempre.
+    """
+    if st.session_state.get("fragmentos_dibujados"):
+        st.rerun(claves)
+
+st.session_state["fragmentos_dibujados"] = False
+
 # Se apilan en móvil
 col_params_izq, col_params_der = st.columns([1, 1])
 
 with col_params_izq:
     # Ajuste de slider si tienes muchos profesionales (máx 100)
-    max_prof_count = len(df["nombres_profesional"].dropna().unique()) if "nombres_profesional" in df.columns else 100 
+    max_prof_count = len(construir_indice_profesionales(version=version_datos)[0]) or 100
     top_n_default = min(20, max_prof_count)
-    top_n = st.slider(" **Ranking de Atenciones por Profesional**", 5, max(50, max_prof_count), top_n_default)
+    st.slider(
+        " **Ranking de Atenciones por Profesional**", 5, max(50, max_prof_count), top_n_default,
+        key="top_n", on_change=recargar_fragmentos, args=(FRAGMENTOS_TOP_N,)
+    )
+
+with col_params_der:
+    cubo_medidas, totales_medidas, dias_por_medida = construir_cubo_medidas(version=version_datos, anios=anios_datos)
+    # Solo se ofrecen las medidas que tienen columnas diarias en el archivo
+    medidas_disponibles = [m for m in MEDIDAS_DIARIAS if dias_por_medida[m]] or ["Atenciones"]
+    filtro_medida = st.selectbox(" **Medida diaria**", medidas_disponibles)
+
+idx_medida = list(MEDIDAS_DIARIAS).index(filtro_medida)
+# Las columnas de días de la medida seleccionada se nombran '1.1' a '31.1' para el resto del flujo
+day_cols = columnas_dias_resumen(filtro_medida, dias_por_medida)
     
 # ============================================================
 #  APLICAR FILTROS
 # ============================================================
-df_filtrado = df.copy()
-if filtro_anio != "Todos":
-    try:
-        df_filtrado = df_filtrado[df_filtrado["anio"] == int(filtro_anio)]
-    except ValueError:
-        pass 
-
-if filtro_mes != "Todos":
-    df_filtrado = df_filtrado[df_filtrado["mes_nombre"] == filtro_mes]
-if filtro_ipress != "Todos":
-    df_filtrado = df_filtrado[df_filtrado["nombre_establecimiento"] == filtro_ipress]
-if filtro_especialidad != "Todos":
-    df_filtrado = df_filtrado[df_filtrado["profesional"] == filtro_especialidad]
-if filtro_profesional != "Todos":
-    df_filtrado = df_filtrado[df_filtrado["nombres_profesional"] == filtro_profesional]
+# Cada valor elegido aporta su conjunto de filas (índice cacheado); se unen dentro de cada
+# dimensión y se intersectan entre dimensiones, sin máscaras sobre el DataFrame completo.
+indices_filtros = construir_indices_filtros(version=version_datos, anios=anios_datos)
+df_filtrado = df.iloc[resolver_filtros(indices_filtros, selecciones, len(df))]
 
 if df_filtrado.empty:
     st.warning(" No hay datos para los filtros seleccionados.")
@@ -799,174 +1109,175 @@ if df_filtrado.empty:
 # ============================================================
 #  AGRUPACIÓN Y RESÚMENES
 # ============================================================
-# <-- CAMBIO IMPORTANTE: AHORA USAMOS 'total.1' COMO FUENTE DE ATENCIONES -->
-att_col = "total.1" if "total.1" in df_filtrado.columns else None 
-att_serv_total_col = "atendidos_servicios_total" if "atendidos_servicios_total" in df_filtrado.columns else None
-
-group_cols = [c for c in ["nombre_establecimiento", "profesional", "nombres_profesional"] if c in df_filtrado.columns]
-agg_dict = {d: "sum" for d in day_cols if d in df_filtrado.columns}
-if att_serv_total_col:
-    agg_dict[att_serv_total_col] = "sum"
-if att_col:
-    agg_dict[att_col] = "sum"
-
-if not group_cols:
-    resumen = df_filtrado.agg(agg_dict).to_frame().T
-else:
-    resumen = df_filtrado.groupby(group_cols, as_index=False).agg(agg_dict)
-
-# Ajuste: asegurar suma correcta de "total.1" por profesional si existe
-if "total.1" in df_filtrado.columns and group_cols:
-    # Calcula la suma real por grupo
-    suma_att = (
-        df_filtrado.groupby(group_cols, as_index=False)["total.1"]
-        .sum()
-        .rename(columns={"total.1":"Total_Atenciones_sum"}) 
-    )
-    # Merge para asegurar que el resumen tenga la suma por grupo (evita problemas de filas múltiples)
-    resumen = resumen.merge(suma_att, on=group_cols, how="left")
-    resumen["total.1"] = resumen["Total_Atenciones_sum"] 
-    resumen = resumen.drop(columns=["Total_Atenciones_sum"])
-
-# Aplicación del cambio: "profesional" ahora se etiqueta como "Profesión"
-rename_map = {
-    "nombre_establecimiento": "Establecimiento",
-    "profesional": "Profesión",     
-    "nombres_profesional": "Profesional",
-    "atendidos_servicios_total": "Atendidos",
-    # <-- CAMBIO: ahora mapeamos la columna 'total.1' a "Atenciones" -->
-    "total.1": "Atenciones" 
-}
-resumen = resumen.rename(columns=rename_map)
-
-sort_col = "Atenciones"
-if "Atenciones" not in resumen.columns:
-    resumen["Suma_Dias"] = resumen[[c for c in day_cols if c in resumen.columns]].sum(axis=1)
-    sort_col = "Suma_Dias"
-
-# AGREGAR COLUMNA TOTAL DESPUÉS DE LOS DÍAS
-# Primero, asegurarnos de que las columnas de días estén al final
-column_order = []
-for col in resumen.columns:
-    if col not in day_cols:
-        column_order.append(col)
-        
-# Agregar las columnas de días
-for col in day_cols:
-    if col in resumen.columns:
-        column_order.append(col)
+# Se agrupa por ids enteros (más rápido y no mezcla a dos personas con el mismo nombre);
+# los nombres se agregan recién para mostrar el Top N y el PDF.
+group_cols = [c for c in DIMENSIONES_ID if c in df_filtrado.columns]
+pos_filtrado = df_filtrado.index.to_numpy()
 
-# Reordenar el DataFrame
-resumen = resumen[column_order]
+# El ranking (resumen por profesional, con las columnas de días seguidas de su TOTAL y ordenado por
+# el total de la medida elegida) lo produce el motor configurado, aquí o en el servicio de agregación
+resumen = obtener_ranking(selecciones, filtro_medida, MOTOR_CONSULTA, version=version_datos)
+sort_col = columna_orden(resumen, filtro_medida)
 
-# AGREGAR LA COLUMNA TOTAL QUE SUMA TODAS LAS COLUMNAS DE DÍAS
-# Obtener solo las columnas numéricas de días
-dias_numericos = [col for col in day_cols if col in resumen.columns]
-if dias_numericos:
-    resumen['TOTAL'] = resumen[dias_numericos].sum(axis=1)
+# Aplicación del cambio: "profesional" ahora se etiqueta como "Profesión" (ver ETIQUETAS_RESUMEN)
+rename_map = ETIQUETAS_RESUMEN
 
-resumen = resumen.sort_values(by=sort_col, ascending=False).reset_index(drop=True)
 
-# Aquí limitamos el ranking al Top N, aunque el resumen completo tiene >100
-resumen_top = resumen.head(top_n).copy() 
+# ============================================================
+#  COMPARACIÓN DE PERÍODOS (DESDE EL ROLLUP MENSUAL)
+# ============================================================
+df_comparacion = None
+delta_comparacion = None  # Δ Atenciones por profesional, para la tabla del ranking
+etiqueta_referencia = ""
+if filtro_comparacion != "Sin comparación":
+    if filtro_anio == "Todos" or len(selecciones["mes"]) != 1:
+        st.info(" La comparación de períodos requiere seleccionar un Año y un único Mes.")
+    else:
+        mes_actual = selecciones["mes"][0]
+        periodo_actual = (int(filtro_anio), mes_actual)
+        periodo_ref = periodo_referencia(*periodo_actual, filtro_comparacion)
+        etiqueta_referencia = f"{meses_espanol[periodo_ref[1]]} {periodo_ref[0]}"
+
+        rollup_mensual = construir_rollup_mensual(version=version_datos)
+        filtros_dim = {col: selecciones[col] for col in DIMENSIONES_ID}
+        dims_comparacion = [c for c in DIMENSIONES_ID if c in rollup_mensual.columns]
+        if not periodo_en_rollup(rollup_mensual, *periodo_ref):
+            # Sin el período de referencia las diferencias serían los totales actuales: no se muestran
+            st.info(f" Sin datos del período de referencia ({etiqueta_referencia}): no se muestran diferencias.")
+        elif dims_comparacion:
+            df_comparacion = comparar_periodos(rollup_mensual, periodo_actual, periodo_ref, filtros_dim, dims_comparacion)
+
+            # Diferencia de atenciones por profesional, que se incorpora a la tabla del ranking
+            delta_comparacion = df_comparacion[dims_comparacion + ["Δ Atenciones"]]
+            df_comparacion = agregar_nombres(df_comparacion, nombres_dim).rename(columns=rename_map)
 
 # ============================================================
-#  INICIO DE LÓGICA DE PDF Y TABLA PRINCIPAL
+#  INDICADORES DE PRODUCTIVIDAD (PERCENTILES EN LA RED)
 # ============================================================
+meses_indicadores = tuple(selecciones["mes"]) or None
+anio_indicadores = int(filtro_anio) if filtro_anio != "Todos" else None
+df_indicadores = calcular_indicadores_productividad(anio_indicadores, meses_indicadores, version=version_datos)
 
-st.header("Resultados por Profesional y Establecimiento")
+# ============================================================
+#  ALERTAS (ANOMALÍAS DE LAS FILAS FILTRADAS)
+# ============================================================
+alertas_cubo, lista_alertas = detectar_anomalias(version=version_datos, anios=anios_datos)
+alertas_medida = alertas_cubo[pos_filtrado, idx_medida, :]
 
-# ------------------------------------------------------------
-# 1. LÓGICA DE GENERACIÓN DE PDF (Movida al inicio de la tabla)
-# ------------------------------------------------------------
+# Días con alguna alerta por profesional (claves + una columna por día); la tabla los resalta
+marcas_alerta = None
+filas_con_alerta = alertas_medida.any(axis=1)
+if filas_con_alerta.any() and group_cols:
+    marcas_alerta = pd.DataFrame(alertas_medida[filas_con_alerta] > 0)
+    claves_alerta = df_filtrado.loc[filas_con_alerta, group_cols].reset_index(drop=True)
+    marcas_alerta = marcas_alerta.groupby([claves_alerta[c] for c in group_cols]).any().reset_index()
 
-# Obtener el logo binario para el PDF (si está disponible)
-logo_file_path = "logo_sanpablo.png"
-logo_data = None
-try:
-    base_path = Path(__file__).parent
-    logo_path = base_path / logo_file_path
-    with open(logo_path, "rb") as f:
-        logo_data = BytesIO(f.read())
-except Exception:
-    pass
-
-# Prepara el DataFrame final para el PDF (usa el resumen completo)
-df_for_pdf = resumen.copy() # 'resumen' tiene todos los datos filtrados, ordenados
-
-# Renombrar columnas de días en el DataFrame para el PDF (de 1.1 a 1, etc.)
-df_for_pdf_pdf = df_for_pdf.copy()
-for col in df_for_pdf_pdf.columns:
-    if re.fullmatch(r"(0?[1-9]|[12][0-9]|3[01])\.1", str(col)):
-        nuevo_nombre = col.split('.')[0]
-        df_for_pdf_pdf = df_for_pdf_pdf.rename(columns={col: nuevo_nombre})
-
-# Columnas a incluir en el PDF: principales, días
-pdf_cols_base = ["Profesional", "Profesión", "Establecimiento", "Atendidos", "Atenciones"]
-# Usar el nombre interno correcto para "Atenciones" si fue re-etiquetada
-if "Suma_Dias" in df_for_pdf_pdf.columns and "Atenciones" not in df_for_pdf_pdf.columns:
-     pdf_cols_base[-1] = "Suma_Dias"
-
-# Obtener columnas de días renombradas (sin .1)
-dias_renombrados_pdf = []
-for col in day_cols:
-    if col in df_for_pdf_pdf.columns:
-        dias_renombrados_pdf.append(col.split('.')[0])
-    elif col.split('.')[0] in df_for_pdf_pdf.columns:
-        dias_renombrados_pdf.append(col.split('.')[0])
-
-pdf_cols = [c for c in pdf_cols_base if c in df_for_pdf_pdf.columns] + [c for c in dias_renombrados_pdf if c in df_for_pdf_pdf.columns]
-# Agregar la columna TOTAL al final
-if 'TOTAL' in df_for_pdf_pdf.columns:
-    pdf_cols.append('TOTAL')
-
-df_pdf_final = df_for_pdf_pdf[pdf_cols]
-
-# Renombrar 'Suma_Dias' de vuelta a 'Atenciones' si fue usado
-if 'Suma_Dias' in df_pdf_final.columns:
-    df_pdf_final = df_pdf_final.rename(columns={'Suma_Dias': 'Atenciones'})
-
-# Filtros aplicados para el nombre del archivo
-filtros_aplicados = {
-    "Mes": filtro_mes,
-    "Establecimiento": filtro_ipress,
-    "Año": filtro_anio
-}
+# ============================================================
+#  RANKING TOP N (COMPARTIDO POR TABLA, GRÁFICO Y MAPA DE CALOR)
+# ============================================================
+# Los fragmentos de resultados reciben sus datos como argumentos (fijados en la última ejecución
+# completa) y leen de st.session_state solo los controles propios: el Top N y las casillas.
+
+def armar_resumen_top(resumen, nombres_dim, delta_comparacion, df_indicadores, top_n):
+    """
+    Top N del ranking con nombres, Δ de la comparación e indicadores de productividad. Los nombres
+    (desde las tablas de dimensión) se agregan solo a las filas que se muestran.
+    """
+    resumen_top = agregar_nombres(resumen.head(top_n), nombres_dim).rename(columns=ETIQUETAS_RESUMEN)
+    if delta_comparacion is not None:
+        dims = [c for c in delta_comparacion.columns if c != "Δ Atenciones"]
+        resumen_top = resumen_top.merge(delta_comparacion, on=dims, how="left")
+    if not df_indicadores.empty and {"id_profesion", "id_personal"}.issubset(resumen_top.columns):
+        resumen_top = resumen_top.merge(df_indicadores, on=["id_profesion", "id_personal"], how="left")
+    return resumen_top
+
+def resaltar_alertas(resumen_top, marcas_alerta, group_cols):
+    """Matriz booleana (filas del Top N × días) de días con alerta, o None si no hay alertas."""
+    if marcas_alerta is None:
+        return None
+    return (
+        resumen_top[group_cols].merge(marcas_alerta, on=group_cols, how="left")
+        .drop(columns=group_cols).fillna(False).astype(bool)
+    )
 
-# Llamar a la función que genera el PDF (con el DataFrame completo y la data del logo)
-pdf_buffer = crear_pdf_profesional(df_pdf_final, filtros_aplicados, logo_data)
+armar_top = partial(armar_resumen_top, resumen, nombres_dim, delta_comparacion, df_indicadores)
+
+# ============================================================
+#  INICIO DE LÓGICA DE PDF Y TABLA PRINCIPAL
+# ============================================================
 
+st.header("Resultados por Profesional y Establecimiento")
 
 # ------------------------------------------------------------
-# 2. CHECKBOX Y BOTÓN DE DESCARGA (Lado a lado)
+# CHECKBOX Y BOTÓN DE DESCARGA (Lado a lado)
 # ------------------------------------------------------------
 
 # Crear columnas para alinear el checkbox y el botón
 col_check, col_button, col_spacer = st.columns([0.45, 0.35, 0.2])
 
 with col_check:
-    # Checkbox para mostrar/ocultar las columnas de días
-    show_days_table = st.checkbox(" **Mostrar columnas de producción diaria**", value=False)
+    # Checkbox para mostrar/ocultar las columnas de días (solo recargan la tabla y las métricas)
+    st.checkbox(
+        " **Mostrar columnas de producción diaria**", value=False,
+        key="mostrar_dias", on_change=recargar_fragmentos, args=(FRAGMENTOS_DIAS,)
+    )
+    st.checkbox(
+        " **Mostrar indicadores de productividad (percentil en su profesión)**", value=False,
+        key="mostrar_indicadores", on_change=recargar_fragmentos, args=(FRAGMENTOS_INDICADORES,)
+    )
     
 with col_button:
-    # Botón de descarga de PDF
-    if pdf_buffer:
-        # Nombre del archivo basado en los filtros aplicados (incluyendo la corrección del año)
-        mes_pdf = filtros_aplicados["Mes"].replace(" ", "_")
-        ipress_pdf = filtros_aplicados["Establecimiento"].replace(" ", "_")
-        anio_pdf = str(filtros_aplicados["Año"])
-        filename = f"Reporte_Produccion_{ipress_pdf}_{mes_pdf}_{anio_pdf}.pdf"
-        
-        # El st.download_button ahora se renderiza aquí
+    # Errores de la última generación de cada descarga (los anota generar_descarga)
+    errores_descarga = st.session_state.setdefault("errores_descarga", {})
+
+    # Botón de descarga de PDF: se arma al hacer clic (en segundo plano) y se cachea por filtros
+    st.download_button(
+        label=" ⬇️ Descargar PDF Completo",
+        data=partial(
+            generar_descarga, errores_descarga, "PDF",
+            exportar_pdf, selecciones, filtro_medida, filtros_aplicados, MOTOR_CONSULTA, version=version_datos
+        ),
+        file_name=nombre_archivo_pdf(filtros_aplicados),
+        mime="application/pdf",
+        type="primary",
+        on_click="ignore"  # Descargar no cambia nada de la página: no hay que volver a ejecutarla
+    )
+
+    # Excel del resumen completo: se arma al hacer clic (en segundo plano) y se cachea por filtros
+    st.download_button(
+        label=" ⬇️ Descargar Excel",
+        data=partial(
+            generar_descarga, errores_descarga, "Excel",
+            exportar_excel, selecciones, filtro_medida, filtros_aplicados, MOTOR_CONSULTA, version=version_datos
+        ),
+        file_name=nombre_archivo_pdf(filtros_aplicados, extension="xlsx"),
+        mime=MIME_EXCEL,
+        on_click="ignore"
+    )
+
+    for nombre_descarga, error in errores_descarga.items():
+        st.error(f"Error al generar el {nombre_descarga}: {error}")
+
+# Filas filtradas (solo columnas no personales) para análisis propio: se escriben por bloques al hacer clic.
+# Es un fragmento: cambiar el formato solo vuelve a dibujar esta sección.
+@st.fragment(key="exportacion")
+def fragmento_exportacion(pos_filtrado, columnas, filtros_aplicados, version_datos, anios_datos):
+    with st.expander(" **Descargar datos filtrados (CSV / Parquet)**"):
+        formato_descarga = st.radio("Formato", list(FORMATOS_EXPORTACION), horizontal=True)
+        extension_descarga, mime_descarga = FORMATOS_EXPORTACION[formato_descarga]
         st.download_button(
-            label=" ⬇️ Descargar PDF Completo",
-            data=pdf_buffer,
-            file_name=filename,
-            mime="application/pdf",
-            type="primary"
+            label=f" ⬇️ Descargar {len(pos_filtrado):,} filas ({formato_descarga})",
+            data=partial(
+                exportar_filas, cargar_datos(version=version_datos, anios=anios_datos), pos_filtrado,
+                columnas_exportables(columnas), formato_descarga
+            ),
+            file_name=nombre_archivo_pdf(filtros_aplicados, extension=extension_descarga, prefijo="Datos_Filtrados"),
+            mime=mime_descarga,
+            on_click="ignore"
         )
-    else:
-        st.error("No se pudo generar el PDF.")
+        st.caption("Incluye período, establecimiento, profesión y las medidas diarias; no incluye datos personales.")
+
+fragmento_exportacion(pos_filtrado, df.columns, filtros_aplicados, version_datos, anios_datos)
 
 display_styled_divider()
 
@@ -987,15 +1298,26 @@ def format_numbers(val):
 # ============================================================
 #  TABLA DE PRODUCCIÓN (INYECCIÓN HTML) - CON CABECERA FIJA
 # ============================================================
-with col_izq:
-    
+import streamlit.components.v1 as components  # Importación diferida (ver el inicio del archivo)
+@st.fragment(key="tabla")
+def fragmento_tabla(armar_top, sort_col, day_cols, marcas_alerta, group_cols):
+    """Tabla del Top N; se vuelve a ejecutar sola al mover el Top N o marcar las casillas de la tabla."""
+    resumen_top = armar_top(st.session_state["top_n"])
+    show_days_table = st.session_state["mostrar_dias"]
+    show_indicadores = st.session_state["mostrar_indicadores"]
+    resaltado_alertas = resaltar_alertas(resumen_top, marcas_alerta, group_cols)
+
     #  SUBTÍTULO CON MARGENES REDUCIDOS PARA ALINEACIÓN VERTICAL
     st.markdown('<h3 style="margin-top: 5px; margin-bottom: 5px;"> Tabla de Producción</h3>', unsafe_allow_html=True)
     
     display_att_col = "Atenciones" if "Atenciones" in resumen_top.columns else "Suma_Dias"
 
     # Ahora 'Profesión' es parte de base_cols
-    base_cols = ["Profesional", "Profesión", "Establecimiento", "Atendidos", display_att_col]
+    base_cols = ["Profesional", "Profesión", "Establecimiento", "Atendidos", display_att_col, "Δ Atenciones"]
+    if sort_col not in base_cols and sort_col != "Suma_Dias":
+        base_cols.append(sort_col)
+    if show_indicadores:
+        base_cols += INDICADORES_PRODUCTIVIDAD
     display_cols = [c for c in base_cols if c in resumen_top.columns]
 
     if show_days_table:
@@ -1026,6 +1348,18 @@ with col_izq:
         tabla_final = tabla_final.rename(columns={"SUMA_DIAS": "ATENCIONES"})
         display_att_col = "ATENCIONES" 
 
+    # Cada indicador se muestra con el percentil del profesional dentro de su profesión
+    for col in INDICADORES_PRODUCTIVIDAD:
+        if col.upper() in tabla_final.columns:
+            decimales = 0 if col == "Días Activos" else 2
+            tabla_final[col.upper()] = [
+                formato_indicador(v, p, decimales)
+                for v, p in zip(resumen_top_renombrado[col], resumen_top_renombrado[f"P {col}"])
+            ]
+
+    if "Δ ATENCIONES" in tabla_final.columns:
+        tabla_final["Δ ATENCIONES"] = tabla_final["Δ ATENCIONES"].map(formato_delta)
+
     tabla_final = tabla_final.dropna(how='all') 
     tabla_final.index = range(1, len(tabla_final) + 1)
     tabla_final.index.name = "ITEM" # Establecer el nombre del índice
@@ -1162,10 +1496,17 @@ with col_izq:
     </style>
     """
     
-    # 2. Aplicar formato y generar el HTML
+    # 2. Aplicar formato, resaltar días con alerta y generar el HTML
+    estilo_tabla = tabla_final.style.format(format_numbers)
+    if show_days_table and resaltado_alertas is not None:
+        dias_tabla = [c for c in tabla_final.columns if c.isdigit()]
+        css_alertas = pd.DataFrame("", index=tabla_final.index, columns=tabla_final.columns)
+        marcas = resaltado_alertas.to_numpy()[:, [int(d) - 1 for d in dias_tabla]]
+        css_alertas[dias_tabla] = np.where(marcas, "background-color: #f8d7da; color: #721c24; font-weight: bold;", "")
+        estilo_tabla = estilo_tabla.apply(lambda _: css_alertas, axis=None)
+
     html_table = (
-        tabla_final.style
-        .format(format_numbers)
+        estilo_tabla
         .set_table_attributes('class="dataframe"')
         .to_html(escape=False, index=True, header=True, index_names=False) 
     )
@@ -1188,16 +1529,23 @@ with col_izq:
     
     st.caption("")
 
+with col_izq:
+    fragmento_tabla(armar_top, sort_col, day_cols, marcas_alerta, group_cols)
+
 # ============================================================
 #  GRÁFICO (CON LÍNEA CONECTANDO BARRAS)
 # ============================================================
-with col_der:
-    
+import altair as alt  # Importación diferida: el encabezado, los filtros y la tabla ya se enviaron
+@st.fragment(key="grafico")
+def fragmento_grafico(armar_top, sort_col, filtro_medida):
+    """Gráfico del ranking; se vuelve a ejecutar solo al mover el Top N."""
+    resumen_top = armar_top(st.session_state["top_n"])
+
     #  SUBTÍTULO CON MARGENES REDUCIDOS PARA ALINEACIÓN VERTICAL
     st.markdown('<h3 style="margin-top: 5px; margin-bottom: 5px;"> Producción de Atenciones</h3>', unsafe_allow_html=True)
 
     # Usamos la columna en minúsculas/título para el gráfico, ya que Altair lo maneja mejor
-    att_column_name_chart = "Atenciones" if "Atenciones" in resumen_top.columns else "Suma_Dias"
+    att_column_name_chart = sort_col
 
     if att_column_name_chart in resumen_top.columns:
         
@@ -1205,10 +1553,10 @@ with col_der:
             alt.Chart(resumen_top)
             .mark_bar(cornerRadiusTopLeft=5, cornerRadiusTopRight=5)
             .encode(
-                x=alt.X(f"{att_column_name_chart}:Q", title="Total de Atenciones"),
+                x=alt.X(f"{att_column_name_chart}:Q", title=f"Total de {filtro_medida}"),
                 y=alt.Y("Profesional:N", sort="-x", title=""), # Reducir título en móvil
                 color=alt.Color("Establecimiento:N", legend=alt.Legend(title="Establecimiento")),
-                tooltip=["Establecimiento", "Profesión", "Profesional", "Atendidos", alt.Tooltip(att_column_name_chart, title="Atenciones", format=',.0f')]
+                tooltip=["Establecimiento", "Profesión", "Profesional", "Atendidos", alt.Tooltip(att_column_name_chart, title=filtro_medida, format=',.0f')]
             )
         )
         
@@ -1219,7 +1567,7 @@ with col_der:
                 x=alt.X(f"{att_column_name_chart}:Q"),
                 y=alt.Y("Profesional:N", sort="-x"),
                 order=alt.Order(f"{att_column_name_chart}", sort="descending"), 
-                tooltip=["Establecimiento", "Profesión", "Profesional", alt.Tooltip(att_column_name_chart, title="Atenciones", format=',.0f')]
+                tooltip=["Establecimiento", "Profesión", "Profesional", alt.Tooltip(att_column_name_chart, title=filtro_medida, format=',.0f')]
             )
         )
 
@@ -1230,17 +1578,89 @@ with col_der:
                 x=alt.X(f"{att_column_name_chart}:Q"),
                 y=alt.Y("Profesional:N", sort="-x"),
                 order=alt.Order(f"{att_column_name_chart}", sort="descending"),
-                tooltip=["Establecimiento", "Profesión", "Profesional", alt.Tooltip(att_column_name_chart, title="Atenciones", format=',.0f')]
+                tooltip=["Establecimiento", "Profesión", "Profesional", alt.Tooltip(att_column_name_chart, title=filtro_medida, format=',.0f')]
             )
         )
         
         #  ALTURA AJUSTADA PARA ALINEACIÓN VERTICAL
         final_chart = (bars + trend_line + points).properties(height=560) 
         
-        st.altair_chart(final_chart, use_container_width=True)
+        st.altair_chart(final_chart, width="stretch")
     else:
         st.info("No se encontró la columna 'Atenciones' para generar el gráfico principal.")
 
+with col_der:
+    fragmento_grafico(armar_top, sort_col, filtro_medida)
+
+# ============================================================
+#  MAPA DE CALOR: PROFESIONAL × DÍA
+# ============================================================
+st.markdown("---")
+st.header("Mapa de Calor de Producción Diaria por Profesional")
+
+@st.fragment(key="mapa_calor")
+def fragmento_mapa_calor(armar_top, day_cols, selecciones):
+    """Mapa de calor del Top N; se vuelve a ejecutar solo al mover el Top N."""
+    resumen_top = armar_top(st.session_state["top_n"])
+    dias_heatmap = [c for c in day_cols if c in resumen_top.columns]
+    matriz_top = matriz_dias(resumen_top, dias_heatmap)
+
+    if matriz_top.size and "Profesional" in resumen_top.columns:
+        # Solo se puede ubicar el día de la semana si hay un año y un mes concretos
+        anio_heatmap = selecciones["anio"][0] if len(selecciones["anio"]) == 1 else None
+        mes_num_heatmap = selecciones["mes"][0] if len(selecciones["mes"]) == 1 else None
+
+        df_heatmap = datos_heatmap(
+            matriz_top,
+            resumen_top["Profesional"].tolist(),
+            [int(c.split('.')[0]) for c in dias_heatmap],
+            anio=anio_heatmap,
+            mes=mes_num_heatmap if anio_heatmap else None,
+        )
+        orden_filas = df_heatmap["Profesional"].drop_duplicates().tolist()
+
+        celdas = (
+            alt.Chart(df_heatmap)
+            .mark_rect(stroke="white", strokeWidth=0.5)
+            .encode(
+                x=alt.X("Día:O", title="Días del Mes", axis=alt.Axis(labelAngle=0)),
+                y=alt.Y("Profesional:N", sort=orden_filas, title=""),
+                color=alt.Color("Atenciones:Q", scale=alt.Scale(scheme="blues"), legend=alt.Legend(title="Atenciones")),
+                tooltip=[
+                    "Profesional",
+                    alt.Tooltip("Día Semana", title="Día"),
+                    alt.Tooltip("Atenciones:Q", title="Atenciones", format=',.0f'),
+                    alt.Tooltip("Fin de Semana:N", title="Fin de semana"),
+                    alt.Tooltip("Sobrecarga:N", title="Sobrecarga"),
+                ]
+            )
+        )
+
+        # Capa de resaltado: borde rosado en días de sobrecarga y punto en turnos de fin de semana
+        sobrecarga = (
+            alt.Chart(df_heatmap)
+            .transform_filter("datum['Sobrecarga']")
+            .mark_rect(fill=None, stroke='#E83E8C', strokeWidth=2)
+            .encode(x="Día:O", y=alt.Y("Profesional:N", sort=orden_filas))
+        )
+        fin_semana = (
+            alt.Chart(df_heatmap)
+            .transform_filter("datum['Fin de Semana'] && datum['Atenciones'] > 0")
+            .mark_point(shape="circle", size=12, filled=True, color='#FFD700')
+            .encode(x="Día:O", y=alt.Y("Profesional:N", sort=orden_filas))
+        )
+
+        alto_heatmap = max(200, min(18 * len(orden_filas), 900))
+        st.altair_chart((celdas + sobrecarga + fin_semana).properties(height=alto_heatmap), width="stretch")
+
+        if len(orden_filas) < len(resumen_top):
+            st.caption(f"El ranking tiene {len(resumen_top)} profesionales: se muestran promedios por bloques de puestos para mantener el gráfico liviano.")
+        st.caption("Borde rosado: días de sobrecarga (percentil 95). Punto amarillo: producción en fin de semana. Celdas claras: días sin producción.")
+    else:
+        st.info("No hay columnas de producción diaria (1.1 a 31.1) para generar el mapa de calor.")
+
+fragmento_mapa_calor(armar_top, day_cols, selecciones)
+
 # ============================================================
 #  GRÁFICO DE TENDENCIA DIARIA
 # ============================================================
@@ -1248,106 +1668,150 @@ with col_der:
 st.markdown("---") 
 st.header("Tendencia Diaria de Producción General")
 
-@st.cache_data
-def get_daily_trend_data(df, day_cols):
-    """
-    Transforma el DataFrame filtrado para obtener una suma de atenciones por día.
-    """
-    if not day_cols:
-        return pd.DataFrame()
+# Fragmento sin controles propios: depende solo de los filtros y la medida (ejecución completa)
+@st.fragment(key="tendencia")
+def fragmento_tendencia(selecciones, filtro_medida, version_datos):
+    df_tendencia = obtener_tendencia(selecciones, filtro_medida, version=version_datos)
 
-    id_vars = [c for c in ["anio", "mes_nombre", "nombre_establecimiento", "profesional", "nombres_profesional"] if c in df.columns]
-    
-    df_melted = df.melt(
-        id_vars=id_vars,
-        value_vars=day_cols,
-        var_name="Día",
-        value_name="Atenciones_Diarias"
-    )
-    
-    # Extraer solo el número del día (antes del punto)
-    df_melted["Día"] = pd.to_numeric(df_melted["Día"].str.split('.').str[0], errors='coerce').dropna().astype(int)
+    if not df_tendencia.empty:
     
-    df_daily_trend = df_melted.groupby("Día", as_index=False)["Atenciones_Diarias"].sum()
-    
-    df_daily_trend = df_daily_trend.dropna(subset=["Atenciones_Diarias"])
-    df_daily_trend = df_daily_trend.sort_values(by="Día")
-    
-    return df_daily_trend
+        COLOR_AMARILLO_FUERTE = '#FFD700'
+        COLOR_TEXTO_OSCURO = '#555555' 
 
-df_tendencia = get_daily_trend_data(df_filtrado, day_cols)
-
-if not df_tendencia.empty:
-    
-    COLOR_AMARILLO_FUERTE = '#FFD700'
-    COLOR_TEXTO_OSCURO = '#555555' 
-
-    chart_tendencia = (
-        alt.Chart(df_tendencia)
-        .mark_line(point=True, color=COLOR_AMARILLO_FUERTE, strokeWidth=4)
-        .encode(
-            x=alt.X("Día:O", title="Días del Mes", axis=alt.Axis(labelAngle=0)),
-            y=alt.Y("Atenciones_Diarias:Q", title="Total de Atenciones"),
-            tooltip=[
-                alt.Tooltip("Día", title="Días del Mes"),
-                alt.Tooltip("Atenciones_Diarias", title="Atenciones", format=',.0f')
-            ]
-        ).properties(
-            title=""
-        ).interactive()
-    )
+        chart_tendencia = (
+            alt.Chart(df_tendencia)
+            .mark_line(point=True, color=COLOR_AMARILLO_FUERTE, strokeWidth=4)
+            .encode(
+                x=alt.X("Día:O", title="Días del Mes", axis=alt.Axis(labelAngle=0)),
+                y=alt.Y("Atenciones_Diarias:Q", title=f"Total de {filtro_medida}"),
+                tooltip=[
+                    alt.Tooltip("Día", title="Días del Mes"),
+                    alt.Tooltip("Atenciones_Diarias", title=filtro_medida, format=',.0f')
+                ]
+            ).properties(
+                title=""
+            ).interactive()
+        )
     
-    text = chart_tendencia.mark_text(
-        align='center',
-        baseline='bottom',
-        dy=-8 
-    ).encode(
-        text=alt.Text("Atenciones_Diarias:Q", format=',.0f'),
-        color=alt.value(COLOR_TEXTO_OSCURO) 
-    )
+        text = chart_tendencia.mark_text(
+            align='center',
+            baseline='bottom',
+            dy=-8 
+        ).encode(
+            text=alt.Text("Atenciones_Diarias:Q", format=',.0f'),
+            color=alt.value(COLOR_TEXTO_OSCURO) 
+        )
 
-    st.altair_chart(chart_tendencia + text, use_container_width=True)
+        st.altair_chart(chart_tendencia + text, width="stretch")
     
-    st.caption("Gráfico de barras de Atenciones Diarias")
-    chart_barras = (
-        alt.Chart(df_tendencia)
-        .mark_bar(cornerRadiusTopLeft=3, cornerRadiusTopRight=3, color=COLOR_AMARILLO_FUERTE)
-        .encode(
-            x=alt.X("Día:O", title="Días del Mes", axis=alt.Axis(labelAngle=0)),
-            y=alt.Y("Atenciones_Diarias:Q", title="Total de Atenciones"),
-            tooltip=[
-                alt.Tooltip("Día", title="Días del Mes"),
-                alt.Tooltip("Atenciones_Diarias", title="Atenciones", format=',.0f')
-            ]
-        ).properties(height=200)
-    )
-    st.altair_chart(chart_barras, use_container_width=True)
+        st.caption(f"Gráfico de barras de {filtro_medida} por día")
+        chart_barras = (
+            alt.Chart(df_tendencia)
+            .mark_bar(cornerRadiusTopLeft=3, cornerRadiusTopRight=3, color=COLOR_AMARILLO_FUERTE)
+            .encode(
+                x=alt.X("Día:O", title="Días del Mes", axis=alt.Axis(labelAngle=0)),
+                y=alt.Y("Atenciones_Diarias:Q", title=f"Total de {filtro_medida}"),
+                tooltip=[
+                    alt.Tooltip("Día", title="Días del Mes"),
+                    alt.Tooltip("Atenciones_Diarias", title=filtro_medida, format=',.0f')
+                ]
+            ).properties(height=200)
+        )
+        st.altair_chart(chart_barras, width="stretch")
+
+    else:
+        st.info("No hay suficientes datos de producción diaria (columnas '1.1' a '31.1') para generar el gráfico de tendencia.")
+
+fragmento_tendencia(selecciones, filtro_medida, version_datos)
 
-else:
-    st.info("No hay suficientes datos de producción diaria (columnas '1.1' a '31.1') para generar el gráfico de tendencia.")
-    
 # ============================================================
-#  MÉTRICAS FINALES
+#  PANEL DE ALERTAS
 # ============================================================
 st.markdown("---")
+st.header("Alertas de Producción Diaria")
 
-total_atendidos = resumen["Atendidos"].sum() if "Atendidos" in resumen.columns else 0
-sort_col_name = "Atenciones" if "Atenciones" in resumen.columns else "Suma_Dias"
-total_atenciones = resumen[sort_col_name].sum() if sort_col_name in resumen.columns else 0
+alertas_filtradas = lista_alertas[
+    np.isin(lista_alertas["fila"].to_numpy(), pos_filtrado) & (lista_alertas["medida"] == idx_medida)
+]
 
-# Calcular total de la columna TOTAL si existe
-if 'TOTAL' in resumen.columns:
-    total_diario = resumen['TOTAL'].sum()
+if alertas_filtradas.empty:
+    st.success(f" No se detectaron días sospechosos de {filtro_medida} para los filtros seleccionados.")
 else:
-    total_diario = 0
+    conteo_tipos = alertas_filtradas["Tipo"].value_counts()
+    cols_alerta = st.columns(len(TIPOS_ALERTA))
+    for col_st, tipo in zip(cols_alerta, TIPOS_ALERTA.values()):
+        col_st.metric(f" {tipo}", f"{conteo_tipos.get(tipo, 0):,}")
+
+    dims_alerta = [c for c in ["nombres_profesional", "profesional", "nombre_establecimiento", "anio", "mes"] if c in df.columns]
+    tabla_alertas = df.loc[alertas_filtradas["fila"], dims_alerta].reset_index(drop=True)
+    if "mes" in tabla_alertas.columns:
+        # Nombre del mes solo para las filas mostradas: categoría ordenada de enero a diciembre
+        codigos_mes = tabla_alertas["mes"].to_numpy(dtype=np.int64) - 1
+        tabla_alertas["mes"] = pd.Categorical.from_codes(
+            np.where((codigos_mes >= 0) & (codigos_mes < 12), codigos_mes, -1), categories=orden_meses, ordered=True
+        )
+    tabla_alertas = tabla_alertas.rename(columns={**rename_map, "anio": "Año", "mes": "Mes"})
+    tabla_alertas = pd.concat(
+        [tabla_alertas, alertas_filtradas[["Día", "Tipo", "Valor", "Línea Base"]].reset_index(drop=True)], axis=1
+    )
+    with st.expander(f" **Detalle de {len(tabla_alertas):,} alertas**"):
+        st.dataframe(tabla_alertas, hide_index=True, width="stretch")
+    st.caption(
+        f"Se evalúan los días con producción en al menos {MIN_DIAS_BASE} de los {VENTANA_BASE} días previos. "
+        f"Pico: más de {K_DESVIOS_PICO} desviaciones sobre el promedio de esos {VENTANA_BASE} días. "
+        "Cero súbito: día hábil sin producción en medio de días activos. Solo se cuentan las alertas de la medida elegida. "
+        "Con la producción diaria visible, los días con alerta se resaltan en rojo en la tabla."
+    )
 
+# ============================================================
+#  MÉTRICAS FINALES
+# ============================================================
+st.markdown("---")
 
-# Se apilan en móvil
-m1, m2, m3 = st.columns(3)
-m1.metric(" Total Atendidos", f"{total_atendidos:,.0f}") 
-m2.metric(" Total Atenciones Registradas", f"{total_atenciones:,.0f}")
-if show_days_table:
-    m3.metric(" Total Producción Diaria", f"{total_diario:,.0f}")
+@st.fragment(key="metricas")
+def fragmento_metricas(resumen, df_comparacion, etiqueta_referencia):
+    """Totales del resumen completo; se vuelve a ejecutar solo al marcar la producción diaria."""
+    total_atendidos = resumen["Atendidos"].sum() if "Atendidos" in resumen.columns else 0
+    sort_col_name = "Atenciones" if "Atenciones" in resumen.columns else "Suma_Dias"
+    total_atenciones = resumen[sort_col_name].sum() if sort_col_name in resumen.columns else 0
+
+    # Calcular total de la columna TOTAL si existe
+    if 'TOTAL' in resumen.columns:
+        total_diario = resumen['TOTAL'].sum()
+    else:
+        total_diario = 0
+
+
+    # Diferencias contra el período de referencia (si hay comparación activa)
+    delta_atendidos = delta_atenciones = delta_diario = None
+    if df_comparacion is not None:
+        delta_atendidos = formato_delta(df_comparacion["Δ Atendidos"].sum())
+        delta_atenciones = formato_delta(df_comparacion["Δ Atenciones"].sum())
+        delta_diario = formato_delta(df_comparacion["Δ TOTAL"].sum())
+
+    # Se apilan en móvil
+    m1, m2, m3 = st.columns(3)
+    m1.metric(" Total Atendidos", f"{total_atendidos:,.0f}", delta=delta_atendidos) 
+    m2.metric(" Total Atenciones Registradas", f"{total_atenciones:,.0f}", delta=delta_atenciones)
+    if st.session_state["mostrar_dias"]:
+        m3.metric(" Total Producción Diaria", f"{total_diario:,.0f}", delta=delta_diario)
+
+    if df_comparacion is not None:
+        st.caption(f"Diferencias respecto a {etiqueta_referencia}.")
+        with st.expander(f" **Comparación por Profesión y Establecimiento vs {etiqueta_referencia}**"):
+            comp_col1, comp_col2 = st.columns(2)
+            columnas_comp = ["Atenciones", "Atenciones_ref", "Δ Atenciones", "Atendidos", "Δ Atendidos"]
+            for col_st, dim in [(comp_col1, "Profesión"), (comp_col2, "Establecimiento")]:
+                if dim in df_comparacion.columns:
+                    por_dim = (
+                        df_comparacion.groupby(dim, as_index=False)[columnas_comp].sum()
+                        .sort_values(by="Atenciones", ascending=False)
+                        .rename(columns={"Atenciones_ref": f"Atenciones {etiqueta_referencia}"})
+                    )
+                    col_st.dataframe(por_dim, hide_index=True, width="stretch")
+
+fragmento_metricas(resumen, df_comparacion, etiqueta_referencia)
+st.session_state["fragmentos_dibujados"] = True
 
 # ============================================================
 #  FOOTER / COPYRIGHT
@@ -0,0 +1,548 @@
+# ============================================================
+#  CONSULTAS DEL TABLERO: FILTROS, RESUMEN, RANKING Y TENDENCIA
+# ============================================================
+# Lógica de consulta sin dependencias de Streamlit: la usan el tablero (app.py, que cachea los
+# resultados por sesión) y el servicio HTTP de agregación (servicio_api.py). Los recursos que se
+# arman una vez por versión de datos (cubo de medidas, índices de filtros, base SQL) se memorizan
+# con @recurso, el equivalente de st.cache_resource: uno por proceso, compartido entre hilos.
+
+import inspect
+import os
+import threading
+from functools import lru_cache, wraps
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+from datos_his import (
+    DIMENSIONES_ID, MEDIDAS_DIARIAS, cargar_compartido, datos_ejemplo, leer_dimensiones, listar_particiones,
+    raiz_particiones, sincronizar_origen, tabla_dimensiones
+)
+
+
+def recurso(funcion):
+    """
+    Memoriza el resultado por argumentos (normalizados, así f(v) y f(version=v) comparten entrada)
+    y lo arma una sola vez aunque lo pidan varios hilos a la vez.
+    """
+    firma = inspect.signature(funcion)
+    memorizada = lru_cache(maxsize=4)(funcion)
+    candado = threading.RLock()
+
+    @wraps(funcion)
+    def envoltura(*args, **kwargs):
+        argumentos = firma.bind(*args, **kwargs)
+        argumentos.apply_defaults()
+        with candado:
+            return memorizada(*argumentos.args)
+
+    envoltura.cache_clear = memorizada.cache_clear
+    return envoltura
+
+# ============================================================
+#  DATOS Y RECURSOS POR VERSIÓN Y AÑOS
+# ============================================================
+# Las filas se cargan por alcance de años (tupla ordenada, vacía = todos): solo se leen las
+# particiones de esos años, y el cubo y los índices de filtros se arman sobre esas filas.
+# Las posiciones de fila son relativas al alcance, así que todo lo que se combine con ellas
+# (datos, cubo, índices, alertas) debe pedirse con el mismo alcance.
+
+def alcance_anios(selecciones):
+    """Años cuyas particiones necesita una selección, como tupla ordenada (vacía = todos)."""
+    return tuple(sorted(int(a) for a in selecciones.get("anio") or ()))
+
+@recurso
+def cargar_datos(path="CONSOLIDADO.xlsx", version=None, anios=()):
+    """
+    Carga los datos consolidados de los años pedidos (archivo Excel más los períodos ingeridos,
+    desde el almacenamiento particionado) o usa datos de ejemplo (con más de 100 filas).
+    Es un recurso compartido de solo lectura: todas las sesiones e hilos (y, vía el archivo Arrow
+    mapeado, todos los procesos) usan la misma copia, así que no se debe modificar en el lugar.
+    """
+    #  Nota: Reemplace "CONSOLIDADO.xlsx" con la ruta correcta a su archivo.
+    if version != "ejemplo":
+        try:
+            # Una fila por (id_personal, anio, mes, id_establecimiento_x): los duplicados se fusionan al volcar
+            return cargar_compartido(path, version, anios)
+        except FileNotFoundError:
+            pass  # La advertencia la muestra quien llama (el tablero, con la versión "ejemplo")
+    df_ejemplo = datos_ejemplo()
+    if anios:
+        df_ejemplo = df_ejemplo[df_ejemplo["anio"].isin(anios)].reset_index(drop=True)
+    return df_ejemplo
+
+@recurso
+def construir_dimensiones(path="CONSOLIDADO.xlsx", version=None):
+    """
+    Tablas de dimensión id -> nombre (establecimientos, profesiones y personal) y, para los filtros,
+    nombre -> ids (un mismo nombre de profesión o de persona puede corresponder a varios ids).
+    """
+    if version == "ejemplo":
+        dimensiones = tabla_dimensiones(datos_ejemplo())
+    else:
+        # Índice de dimensiones del almacenamiento (se actualiza en cada ingesta): no se cargan filas
+        dimensiones = leer_dimensiones(sincronizar_origen(path))
+    nombres, ids_por_nombre = {}, {}
+    for col_id, pares in dimensiones.groupby("dimension", sort=False):
+        nombres[col_id] = pd.Series(pares["nombre"].to_numpy(), index=pares["id"].to_numpy())
+        ids_por_nombre[col_id] = pares.groupby("nombre")["id"].apply(list).to_dict()
+    return nombres, ids_por_nombre
+
+def agregar_nombres(frame, nombres):
+    """Agrega las columnas de nombre a partir de los ids; se usa solo sobre lo que se va a mostrar."""
+    frame = frame.copy()
+    for col_id, col_nombre in DIMENSIONES_ID.items():
+        if col_id in frame.columns and col_id in nombres:
+            frame[col_nombre] = frame[col_id].map(nombres[col_id])
+    return frame
+
+@recurso
+def construir_cubo_medidas(path="CONSOLIDADO.xlsx", version=None, anios=()):
+    """
+    Arma al cargar los datos un único arreglo NumPy filas × medida × día (1 a 31) con las tres
+    medidas diarias, más sus totales por fila. Cambiar de medida es solo un cambio de índice.
+    Devuelve (cubo, totales, dias_presentes) donde dias_presentes indica qué días existen por medida.
+    """
+    df_base = cargar_datos(path, version, anios)
+    n_filas = len(df_base)
+    cubo = np.zeros((n_filas, len(MEDIDAS_DIARIAS), 31), dtype=np.int32)
+    totales = np.zeros((n_filas, len(MEDIDAS_DIARIAS)), dtype=np.int64)
+    dias_presentes = {}
+
+    for m, (nombre, cfg) in enumerate(MEDIDAS_DIARIAS.items()):
+        presentes = [d for d in range(1, 32) if cfg["dia"].format(d=d) in df_base.columns]
+        dias_presentes[nombre] = presentes
+        if presentes:
+            cols = [cfg["dia"].format(d=d) for d in presentes]
+            cubo[:, m, np.array(presentes) - 1] = df_base[cols].to_numpy(dtype=np.float64, na_value=0)
+        if cfg["total"] in df_base.columns:
+            totales[:, m] = df_base[cfg["total"]].to_numpy(dtype=np.float64, na_value=0)
+        else:
+            totales[:, m] = cubo[:, m, :].sum(axis=1)
+
+    # Arreglos compartidos entre sesiones: se marcan como solo lectura
+    cubo.flags.writeable = False
+    totales.flags.writeable = False
+    return cubo, totales, dias_presentes
+
+# Dimensiones que se filtran por índice de filas (valor -> posiciones)
+DIMENSIONES_FILTRO = ["anio", "mes", "id_establecimiento_x", "id_profesion", "id_personal"]
+
+@recurso
+def construir_indices_filtros(path="CONSOLIDADO.xlsx", version=None, anios=()):
+    """
+    Para cada dimensión de filtro arma un diccionario valor -> arreglo ordenado de posiciones de fila.
+    Se construye una vez por versión de datos y alcance de años.
+    """
+    df_base = cargar_datos(path, version, anios)
+    indices = {}
+    for col in DIMENSIONES_FILTRO:
+        if col in df_base.columns:
+            indices[col] = {
+                valor: np.asarray(pos, dtype=np.int64)
+                for valor, pos in df_base.groupby(col, sort=False).indices.items()
+            }
+    return indices
+
+def resolver_filtros(indices, selecciones, n_filas):
+    """
+    Resuelve los filtros sin recorrer el DataFrame: une las posiciones de los valores elegidos
+    en cada dimensión y luego intersecta entre dimensiones (de la más chica a la más grande).
+    'selecciones' es {columna: [valores]}; una lista vacía significa "Todos".
+    """
+    uniones = []
+    for col, valores in selecciones.items():
+        if not valores or col not in indices:
+            continue
+        partes = [indices[col][v] for v in valores if v in indices[col]]
+        # Los valores de una misma dimensión no se solapan: basta concatenar y ordenar
+        uniones.append(np.sort(np.concatenate(partes)) if partes else np.array([], dtype=np.int64))
+
+    if not uniones:
+        return np.arange(n_filas)
+    uniones.sort(key=len)
+    posiciones = uniones[0]
+    for union in uniones[1:]:
+        if posiciones.size == 0:
+            break
+        posiciones = np.intersect1d(posiciones, union, assume_unique=True)
+    return posiciones
+
+# ============================================================
+#  MOTORES DE CONSULTA DEL RESUMEN (PANDAS / SQL / POLARS)
+# ============================================================
+
+# Motor que calcula el resumen por profesional: "pandas" (en memoria), "sql" (base embebida
+# DuckDB, o SQLite si DuckDB no está instalado) o "polars" (plan diferido sobre la caché Parquet).
+MOTORES_CONSULTA = ["pandas", "sql", "polars"]
+
+def columna_sql_dia(m, d):
+    """Nombre de la columna del día d (1 a 31) de la medida m en la base SQL."""
+    return f"m{m}_d{d:02d}"
+
+def columnas_dias_resumen(filtro_medida, dias_presentes):
+    """Columnas de días del resumen: siempre '1.1' a '31.1', sea cual sea la medida elegida."""
+    return [f"{d}.1" for d in dias_presentes[filtro_medida]]
+
+def columnas_consulta(columnas_origen):
+    """
+    Columnas de la tabla plana que carga el motor SQL, según las columnas del origen. Devuelve
+    (claves, medidas): ids y período se copian; cada medida {columna: columnas de origen que se suman}
+    tiene los totales (t0, t1, t2: la columna de total, o sus días si no existe) y los días de las tres
+    medidas que existen en el origen (m0_d01 ... m2_d31).
+    """
+    claves = [c for c in ["anio", "mes", *DIMENSIONES_ID] if c in columnas_origen]
+    medidas = {}
+    for m, cfg in enumerate(MEDIDAS_DIARIAS.values()):
+        dias = {d: cfg["dia"].format(d=d) for d in range(1, 32) if cfg["dia"].format(d=d) in columnas_origen}
+        medidas[f"t{m}"] = [cfg["total"]] if cfg["total"] in columnas_origen else list(dias.values())
+        medidas.update({columna_sql_dia(m, d): [col] for d, col in dias.items()})
+    return claves, medidas
+
+def tabla_consulta(df, columnas_origen=None):
+    """
+    Tabla plana de las filas df para el motor SQL (ver columnas_consulta), con conteos enteros y sin
+    nulos como en el cubo de medidas. columnas_origen (por defecto, las de df) fija las columnas, así
+    todas las partes de una misma carga coinciden aunque a alguna le falte un día.
+    """
+    claves, medidas = columnas_consulta(df.columns if columnas_origen is None else columnas_origen)
+    ceros = np.zeros(len(df), dtype=np.int64)
+    conteo = lambda col: df[col].to_numpy(dtype=np.float64, na_value=0).astype(np.int64) if col in df.columns else ceros
+    carga = {c: df[c].to_numpy() for c in claves}
+    carga.update({col: sum((conteo(c) for c in origen), ceros) for col, origen in medidas.items()})
+    return pd.DataFrame(carga)
+
+def conteo_sql(origen):
+    """Expresión SQL de una medida de la tabla plana: suma de sus columnas de origen, nulos en 0 y truncada a entero."""
+    sumandos = [f'CAST(TRUNC(COALESCE(CAST("{c}" AS DOUBLE), 0)) AS BIGINT)' for c in origen]
+    return " + ".join(sumandos) if sumandos else "CAST(0 AS BIGINT)"
+
+def columnas_particiones(archivos):
+    """Unión de las columnas de los archivos Parquet, leyendo solo sus esquemas."""
+    import pyarrow.parquet as pq
+
+    columnas = {}
+    for archivo in archivos:
+        columnas.update(dict.fromkeys(pq.read_schema(archivo).names))
+    return list(columnas)
+
+def completar_resumen(resumen, columnas_origen):
+    """
+    Deja el resumen de cualquier motor con la misma forma: ids, totales de las medidas con su
+    nombre original (solo las que existen en el archivo) y columnas de días.
+    """
+    for m, cfg in enumerate(MEDIDAS_DIARIAS.values()):
+        if cfg["total"] in columnas_origen:
+            resumen = resumen.rename(columns={f"t{m}": cfg["total"]})
+    return resumen.drop(columns=[f"t{m}" for m in range(len(MEDIDAS_DIARIAS)) if f"t{m}" in resumen.columns])
+
+def resumen_pandas(selecciones, filtro_medida, path="CONSOLIDADO.xlsx", version=None):
+    """Resumen en memoria: filas resueltas con los índices de filtros y una agregación sobre el cubo de medidas."""
+    anios = alcance_anios(selecciones)
+    df_base = cargar_datos(path, version, anios)
+    cubo, totales, dias_presentes = construir_cubo_medidas(path, version, anios)
+    pos = resolver_filtros(construir_indices_filtros(path, version, anios), selecciones, len(df_base))
+    group_cols = [c for c in DIMENSIONES_ID if c in df_base.columns]
+
+    # Una sola agregación sobre el cubo (días + totales de las tres medidas);
+    # la medida seleccionada se toma después como un índice del cubo agregado.
+    n_medidas, n_dias_cubo = cubo.shape[1:]
+    # Forma explícita: con 0 filas filtradas reshape no puede inferir el -1
+    bloque_medidas = np.concatenate([cubo[pos].reshape(len(pos), n_medidas * n_dias_cubo), totales[pos]], axis=1)
+
+    if not group_cols:
+        resumen = pd.DataFrame(index=[0])
+        cubo_agrupado = bloque_medidas.sum(axis=0, keepdims=True)
+    else:
+        claves = df_base[group_cols].iloc[pos].reset_index(drop=True)
+        agrupado = pd.DataFrame(bloque_medidas).groupby([claves[c] for c in group_cols]).sum()
+        resumen = agrupado.index.to_frame(index=False)
+        cubo_agrupado = agrupado.to_numpy()
+
+    dias_agrupados = cubo_agrupado[:, :n_medidas * n_dias_cubo].reshape(-1, n_medidas, n_dias_cubo)
+    for m in range(n_medidas):
+        resumen[f"t{m}"] = cubo_agrupado[:, n_medidas * n_dias_cubo + m]
+
+    idx_medida = list(MEDIDAS_DIARIAS).index(filtro_medida)
+    idx_dias = [d - 1 for d in dias_presentes[filtro_medida]]
+    day_cols = columnas_dias_resumen(filtro_medida, dias_presentes)
+    resumen = pd.concat(
+        [resumen, pd.DataFrame(dias_agrupados[:, idx_medida, idx_dias], columns=day_cols)], axis=1
+    )
+    return completar_resumen(resumen, df_base.columns)
+
+def abrir_base_sql(ruta, motor, solo_lectura=True):
+    """
+    Conexión a la base embebida (solo lectura salvo al armarla). Si otro proceso la tiene bloqueada,
+    lanza OSError para que quien consulta use el motor pandas en su lugar.
+    """
+    if motor == "duckdb":
+        import duckdb
+
+        try:
+            return duckdb.connect(str(ruta), read_only=solo_lectura)
+        except duckdb.Error as e:
+            raise OSError(f"No se pudo abrir la base {ruta}: {e}") from e
+
+    import sqlite3
+
+    try:
+        if solo_lectura:
+            return sqlite3.connect(f"file:{Path(ruta).as_posix()}?mode=ro", uri=True, check_same_thread=False)
+        return sqlite3.connect(str(ruta), check_same_thread=False)
+    except sqlite3.Error as e:
+        raise OSError(f"No se pudo abrir la base {ruta}: {e}") from e
+
+def version_base_sql(ruta, motor):
+    """Versión de datos con la que se armó la base embebida, o None si no existe o está incompleta."""
+    if not Path(ruta).exists():
+        return None
+    con = abrir_base_sql(ruta, motor)
+    try:
+        fila = con.execute("SELECT version FROM version_datos").fetchone()
+    except Exception:
+        return None
+    finally:
+        con.close()
+    return fila[0] if fila else None
+
+def cargar_base_sql(con, motor, path, version):
+    """
+    Carga la tabla consolidado desde las particiones con una fila por registro: ids, período,
+    totales y días de las tres medidas. Las filas no se cargan en el DataFrame del proceso.
+    """
+    # Se carga desde las particiones del almacenamiento, no desde los datos en memoria del proceso
+    archivos = [] if version == "ejemplo" else listar_particiones(sincronizar_origen(path))
+    columnas_origen = columnas_particiones(archivos) if archivos else cargar_datos(path, version).columns
+    claves, medidas = columnas_consulta(columnas_origen)
+    if motor == "duckdb" and archivos:
+        # DuckDB lee los Parquet directamente; union_by_name deja en nulo las columnas que le faltan a una partición
+        seleccion = [f'"{c}"' for c in claves] + [f"{conteo_sql(origen)} AS {col}" for col, origen in medidas.items()]
+        con.execute(
+            f"CREATE TABLE consolidado AS SELECT {', '.join(seleccion)} FROM read_parquet(?, union_by_name = true)",
+            [[str(a) for a in archivos]]
+        )
+    else:
+        # SQLite no lee Parquet: las particiones se insertan de a una (en memoria hay solo una a la vez)
+        partes = (pd.read_parquet(a) for a in archivos) if archivos else [cargar_datos(path, version)]
+        for parte in partes:
+            carga = tabla_consulta(parte, columnas_origen)
+            if motor == "duckdb":
+                con.register("carga", carga)
+                con.execute("CREATE TABLE consolidado AS SELECT * FROM carga")
+                con.unregister("carga")
+            else:
+                carga.to_sql("consolidado", con, index=False, if_exists="append")
+        if motor == "sqlite":
+            # Índices para que los filtros de período y establecimiento no recorran toda la tabla
+            for col in ["anio", "mes", "id_establecimiento_x"]:
+                if col in claves:
+                    con.execute(f"CREATE INDEX idx_{col} ON consolidado ({col})")
+    con.execute("CREATE TABLE version_datos (version VARCHAR)")
+    con.execute("INSERT INTO version_datos VALUES (?)", [version])
+    con.commit()
+
+@recurso
+def conectar_base_sql(path="CONSOLIDADO.xlsx", version=None):
+    """
+    Abre la base analítica embebida junto al archivo de datos (CONSOLIDADO.duckdb o .sqlite).
+    Si no existe o es de otra versión de datos, se arma una vez en un temporal que luego se
+    renombra (como escribir_parquet); después se abre en solo lectura, porque DuckDB bloquea en
+    exclusiva un archivo abierto para escritura y la consultan varios procesos (workers del
+    tablero, servicio_api.py, generar_reportes.py). Lanza OSError si la base está bloqueada.
+    Devuelve (conexión, motor, candado); el candado serializa las consultas entre sesiones.
+    """
+    try:
+        import duckdb
+        motor = "duckdb"
+    except ImportError:
+        import sqlite3
+        motor = "sqlite"
+
+    if version == "ejemplo":
+        con = duckdb.connect(":memory:") if motor == "duckdb" else sqlite3.connect(":memory:", check_same_thread=False)
+        cargar_base_sql(con, motor, path, version)
+        return con, motor, threading.Lock()
+
+    destino = Path(path).with_suffix(f".{motor}")
+    if version_base_sql(destino, motor) != version:
+        temporal = destino.with_name(f"{destino.name}.{os.getpid()}.tmp")
+        temporal.unlink(missing_ok=True)
+        con = abrir_base_sql(temporal, motor, solo_lectura=False)
+        try:
+            cargar_base_sql(con, motor, path, version)
+        finally:
+            con.close()
+        os.replace(temporal, destino)
+    return abrir_base_sql(destino, motor), motor, threading.Lock()
+
+def resumen_sql(selecciones, filtro_medida, path="CONSOLIDADO.xlsx", version=None):
+    """
+    Resumen calculado por la base embebida con una consulta parametrizada: los filtros van en el
+    WHERE (predicados empujados al motor) y solo se leen las columnas de la medida elegida.
+    Si la base está bloqueada por otro proceso se usa el motor pandas.
+    """
+    try:
+        con, motor, candado = conectar_base_sql(path, version)
+    except OSError:
+        # Base bloqueada por otro proceso: se calcula en memoria
+        return resumen_pandas(selecciones, filtro_medida, path, version)
+    anios = alcance_anios(selecciones)
+    _, _, dias_presentes = construir_cubo_medidas(path, version, anios)
+    columnas_origen = cargar_datos(path, version, anios).columns
+    columnas = [c for c in ["anio", "mes", *DIMENSIONES_ID] if c in columnas_origen]
+    group_cols = [c for c in DIMENSIONES_ID if c in columnas]
+
+    condiciones, parametros = [], []
+    for col, valores in selecciones.items():
+        if valores and col in columnas:
+            condiciones.append(f"{col} IN ({', '.join('?' * len(valores))})")
+            parametros.extend(int(v) for v in valores)
+
+    idx_medida = list(MEDIDAS_DIARIAS).index(filtro_medida)
+    day_cols = columnas_dias_resumen(filtro_medida, dias_presentes)
+    sumas = [f"CAST(SUM(t{m}) AS BIGINT) AS t{m}" for m in range(len(MEDIDAS_DIARIAS))] + [
+        f'CAST(SUM({columna_sql_dia(idx_medida, d)}) AS BIGINT) AS "{col}"'
+        for d, col in zip(dias_presentes[filtro_medida], day_cols)
+    ]
+    consulta = f"SELECT {', '.join(group_cols + sumas)} FROM consolidado"
+    if condiciones:
+        consulta += " WHERE " + " AND ".join(condiciones)
+    if group_cols:
+        consulta += f" GROUP BY {', '.join(group_cols)} ORDER BY {', '.join(group_cols)}"
+
+    with candado:
+        if motor == "duckdb":
+            resumen = con.cursor().execute(consulta, parametros).df()
+        else:
+            resumen = pd.read_sql_query(consulta, con, params=parametros)
+    return completar_resumen(resumen, columnas_origen)
+
+def resumen_polars(selecciones, filtro_medida, path="CONSOLIDADO.xlsx", version=None):
+    """
+    Resumen como un único plan diferido de Polars: se escanean solo las particiones del año y mes
+    elegidos, se leen solo las columnas necesarias, los demás filtros se empujan al escaneo y la
+    agregación por ids es multihilo. Sin Polars instalado se usa el motor pandas.
+    """
+    try:
+        import polars as pl
+    except ImportError:
+        return resumen_pandas(selecciones, filtro_medida, path, version)
+
+    anios = alcance_anios(selecciones)
+    df_base = cargar_datos(path, version, anios)
+    _, _, dias_presentes = construir_cubo_medidas(path, version, anios)
+    # cargar_datos ya volcó el archivo de origen al almacenamiento particionado
+    raiz = None if version == "ejemplo" else raiz_particiones(path)
+    if raiz is None:
+        tabla = pl.from_pandas(df_base).lazy()
+    else:
+        archivos = listar_particiones(raiz, selecciones.get("anio"), selecciones.get("mes"))
+        if not archivos:
+            return resumen_pandas(selecciones, filtro_medida, path, version)
+        # Las particiones ingeridas en distintos momentos pueden no tener exactamente las mismas columnas
+        tabla = pl.concat([pl.scan_parquet(a) for a in archivos], how="diagonal_relaxed")
+    columnas = tabla.collect_schema().names()
+    group_cols = [c for c in DIMENSIONES_ID if c in columnas]
+
+    for col, valores in selecciones.items():
+        if valores and col in columnas:
+            tabla = tabla.filter(pl.col(col).is_in([int(v) for v in valores]))
+
+    # Mismo tratamiento que el cubo de medidas: nulos en 0 y conteos enteros. Las columnas que existen
+    # en los años cargados pero no en las particiones escaneadas (p. ej. el día 31) valen 0.
+    conteo = lambda col: (
+        pl.col(col).cast(pl.Float64).fill_nan(0).fill_null(0).cast(pl.Int64) if col in columnas
+        else pl.lit(0, dtype=pl.Int64)
+    )
+    sumas = []
+    for m, (nombre, cfg) in enumerate(MEDIDAS_DIARIAS.items()):
+        dias = [cfg["dia"].format(d=d) for d in dias_presentes[nombre]]
+        if cfg["total"] in df_base.columns:
+            total = conteo(cfg["total"])
+        elif dias:
+            total = pl.sum_horizontal([conteo(c) for c in dias])
+        else:
+            total = pl.lit(0, dtype=pl.Int64)
+        sumas.append(total.sum().cast(pl.Int64).alias(f"t{m}"))
+
+    plantilla = MEDIDAS_DIARIAS[filtro_medida]["dia"]
+    day_cols = columnas_dias_resumen(filtro_medida, dias_presentes)
+    sumas += [
+        conteo(plantilla.format(d=d)).sum().cast(pl.Int64).alias(col)
+        for d, col in zip(dias_presentes[filtro_medida], day_cols)
+    ]
+    if group_cols:
+        tabla = tabla.group_by(group_cols).agg(sumas).sort(group_cols)
+    else:
+        tabla = tabla.select(sumas)
+    return completar_resumen(tabla.collect().to_pandas(), df_base.columns)
+
+def calcular_resumen(selecciones, filtro_medida, motor="pandas", path="CONSOLIDADO.xlsx", version=None):
+    """
+    Resumen por establecimiento, profesión y profesional (ids) de las filas que cumplen los filtros:
+    totales de las medidas y los días de la medida elegida como '1.1' a '31.1'.
+    Todos los motores devuelven el mismo DataFrame.
+    """
+    if motor == "sql":
+        return resumen_sql(selecciones, filtro_medida, path, version)
+    if motor == "polars":
+        return resumen_polars(selecciones, filtro_medida, path, version)
+    return resumen_pandas(selecciones, filtro_medida, path, version)
+
+# ============================================================
+#  RANKING Y TENDENCIA DIARIA
+# ============================================================
+
+# Etiquetas de las columnas del resumen para mostrar ("profesional" es la profesión)
+ETIQUETAS_RESUMEN = {
+    "nombre_establecimiento": "Establecimiento",
+    "profesional": "Profesión",
+    "nombres_profesional": "Profesional",
+    "atendidos_servicios_total": "Atendidos",
+    "total": "Atendidos Únicos",
+    "total.1": "Atenciones",
+}
+
+def columna_orden(resumen, filtro_medida):
+    """Columna por la que se ordena el ranking: el total de la medida elegida (o la suma de sus días)."""
+    columna = MEDIDAS_DIARIAS[filtro_medida]["columna"]
+    return columna if columna in resumen.columns else "Suma_Dias"
+
+def rankear_resumen(resumen, filtro_medida, day_cols):
+    """
+    Ranking a partir del resumen de calcular_resumen: columnas con sus etiquetas, días al final
+    seguidos de su TOTAL y filas ordenadas por el total de la medida elegida (de mayor a menor).
+    """
+    resumen = resumen.rename(columns=ETIQUETAS_RESUMEN)
+    sort_col = columna_orden(resumen, filtro_medida)
+    if sort_col not in resumen.columns:
+        resumen["Suma_Dias"] = resumen[[c for c in day_cols if c in resumen.columns]].sum(axis=1)
+
+    dias_numericos = [col for col in day_cols if col in resumen.columns]
+    resumen = resumen[[c for c in resumen.columns if c not in day_cols] + dias_numericos]
+    if dias_numericos:
+        resumen = resumen.assign(TOTAL=resumen[dias_numericos].sum(axis=1))
+    return resumen.sort_values(by=sort_col, ascending=False).reset_index(drop=True)
+
+def get_daily_trend_data(matriz, dias):
+    """
+    Suma por día la matriz (filas filtradas × días) de la medida seleccionada.
+    """
+    if not dias:
+        return pd.DataFrame()
+
+    dias = np.asarray(dias)
+    return pd.DataFrame({
+        "Día": dias,
+        "Atenciones_Diarias": matriz[:, dias - 1].sum(axis=0),
+    })
+
+def calcular_tendencia(selecciones, filtro_medida, path="CONSOLIDADO.xlsx", version=None):
+    """Serie diaria de la medida elegida para las filas que cumplen los filtros."""
+    anios = alcance_anios(selecciones)
+    cubo, _, dias_presentes = construir_cubo_medidas(path, version, anios)
+    pos = resolver_filtros(construir_indices_filtros(path, version, anios), selecciones, cubo.shape[0])
+    idx_medida = list(MEDIDAS_DIARIAS).index(filtro_medida)
+    return get_daily_trend_data(cubo[pos, idx_medida, :], dias_presentes[filtro_medida])
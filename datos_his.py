@@ -0,0 +1,552 @@
+# ============================================================
+#  DATOS HIS: CARGA, CONSOLIDACIÓN, VALIDACIÓN Y ALMACENAMIENTO
+# ============================================================
+# Lógica de datos sin dependencias de Streamlit: la usan el tablero (app.py, que la envuelve
+# en funciones cacheadas) y los comandos de línea como la ingesta mensual (ingesta.py).
+
+import json
+import os
+import re
+import zipfile
+import xml.etree.ElementTree as ET
+from datetime import datetime, timezone
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+from xlsx_paralelo import leer_libro_paralelo
+
+# Clave de registro del consolidado: una fila por profesional, período y establecimiento
+CLAVES_REGISTRO = ["id_personal", "anio", "mes", "id_establecimiento_x"]
+
+# Claves enteras de cada dimensión y la columna con su nombre para mostrar
+DIMENSIONES_ID = {
+    "id_establecimiento_x": "nombre_establecimiento",
+    "id_profesion": "profesional",
+    "id_personal": "nombres_profesional",
+}
+
+# Nombres de los meses en español (títulos, filtros y nombres de archivo)
+MESES_ESPANOL = {
+    1: "Enero", 2: "Febrero", 3: "Marzo", 4: "Abril", 5: "Mayo", 6: "Junio",
+    7: "Julio", 8: "Agosto", 9: "Septiembre", 10: "Octubre", 11: "Noviembre", 12: "Diciembre"
+}
+
+# Medidas diarias presentes en CONSOLIDADO.xlsx: plantilla de columna por día y columna de total
+MEDIDAS_DIARIAS = {
+    "Atenciones": {"dia": "{d}.1", "total": "total.1", "columna": "Atenciones"},
+    "Atendidos por Servicio": {"dia": "atendidos_servicios_{d}", "total": "atendidos_servicios_total", "columna": "Atendidos"},
+    "Atendidos Únicos": {"dia": "{d}", "total": "total", "columna": "Atendidos Únicos"},
+}
+
+# Columnas no personales que se pueden descargar como datos filtrados: período, establecimiento y
+# profesión, más las medidas (ver columnas_exportables). Quedan fuera nombres, documentos, fechas de
+# nacimiento, colegiatura e id_personal (que contiene el número de documento).
+COLUMNAS_EXPORTABLES = ["anio", "mes", "id_establecimiento_x", "nombre_establecimiento", "id_profesion", "profesional"]
+
+# ============================================================
+#  LECTURA Y NORMALIZACIÓN
+# ============================================================
+
+def leer_archivo_his(path):
+    """
+    Lee un consolidado o un extracto mensual en formato ancho (Excel, CSV o Parquet)
+    y normaliza los nombres de columna.
+    """
+    sufijo = Path(path).suffix.lower()
+    if sufijo == ".csv":
+        df = pd.read_csv(path)
+    elif sufijo == ".parquet":
+        df = pd.read_parquet(path)
+    elif sufijo in (".xlsx", ".xlsm"):
+        df = leer_excel_his(path)
+    else:
+        df = pd.read_excel(path, engine="openpyxl")
+    df.columns = df.columns.map(lambda c: str(c).strip())
+    return df.loc[:, ~df.columns.str.contains("^Unnamed")].copy()
+
+def leer_excel_his(path):
+    """
+    Lee un libro .xlsx con el lector paralelo (xlsx_paralelo.py). Si el libro tiene varias hojas
+    con anio y mes (por ejemplo, una por período) se concatenan; si no, se toma la primera hoja,
+    como pandas.read_excel. Si el libro no se puede analizar así, se lee con openpyxl.
+    """
+    try:
+        hojas = list(leer_libro_paralelo(path).values())
+    except (ET.ParseError, zipfile.BadZipFile, KeyError, ValueError):
+        return pd.read_excel(path, engine="openpyxl")
+    if not hojas:
+        return pd.read_excel(path, engine="openpyxl")
+    con_periodo = [h for h in hojas if {"anio", "mes"} <= set(map(str, h.columns))]
+    if len(con_periodo) > 1:
+        return pd.concat(con_periodo, ignore_index=True)
+    return hojas[0]
+
+def datos_ejemplo():
+    """Datos de ejemplo (con más de 100 filas) para cuando no hay archivo de datos."""
+    # Datos de ejemplo base
+    data = {
+        "anio": [2024, 2024, 2024, 2024, 2024, 2024, 2024, 2024, 2024, 2024],
+        "mes": [10, 10, 10, 10, 10, 10, 10, 10, 11, 11],
+        "nombre_establecimiento": ["IPRESS A", "IPRESS B", "IPRESS A", "IPRESS C", "IPRESS B", "IPRESS A", "IPRESS B", "IPRESS C", "IPRESS A", "IPRESS B"],
+        "profesional": ["Cardiología", "Medicina General", "Cardiología", "Ginecología", "Pediatría", "Medicina Interna", "Oftalmología", "Cirugía", "Cardiología", "Medicina General"],
+        "nombres_profesional": ["Dr. Perez", "Lic. García", "Dr. Perez", "Dra. Lopez", "Dr. Soto", "Dra. Rojas", "Lic. Vidal", "Dr. Castro", "Dr. Perez", "Lic. García"],
+        "total.1": [150, 220, 180, 90, 300, 110, 250, 140, 160, 230], # Usando total.1 como columna de atenciones
+        "atendidos_servicios_total": [120, 180, 140, 70, 250, 90, 200, 100, 130, 190],
+    }
+
+    # Inicializar columnas de días (1.1 a 31.1)
+    for i in range(1, 32):
+        data[f"{i}.1"] = [max(1, (10 + j * 2) - abs(i - 15)) for j in range(10)] # Valores base ficticios
+
+    # Crear filas adicionales para simular más de 100 profesionales
+    num_initial_rows = len(data["anio"])
+    rows_to_add = 110 - num_initial_rows if 110 > num_initial_rows else 0
+
+    for i in range(rows_to_add):
+        idx = i + num_initial_rows
+
+        data["anio"].append(2024)
+        data["mes"].append(11)
+        data["nombre_establecimiento"].append(f"IPRESS {chr(65 + (idx % 3))}")
+        data["profesional"].append(f"Especialidad {idx % 5}")
+        data["nombres_profesional"].append(f"Dr(a). Ficticio {idx}")
+        data["total.1"].append(100 + idx * 5) # Usando total.1
+        data["atendidos_servicios_total"].append(90 + idx * 4)
+
+        for j in range(1, 32):
+            data[f"{j}.1"].append(max(0, 5 + (idx % 10) + (j % 5)))
+
+    # Se usa dict comprehension para combinar listas.
+    combined_data = {key: data[key] for key in data}
+
+    return consolidar_duplicados(asegurar_ids(pd.DataFrame(combined_data)))
+
+def detectar_dias_columnas(columns):
+    """Detecta columnas de días en formato '1.1', '2.1', ..., '31.1'"""
+    # Patrón para detectar números del 1 al 31 seguidos de .1
+    return sorted([str(c) for c in columns if re.fullmatch(r"(0?[1-9]|[12][0-9]|3[01])\.1", str(c))],
+                  key=lambda x: int(x.split('.')[0]))
+
+def columnas_exportables(columns):
+    """Columnas de la lista blanca presentes, seguidas de los días y el total de cada medida diaria."""
+    presentes = set(map(str, columns))
+    medidas = [
+        col
+        for cfg in MEDIDAS_DIARIAS.values()
+        for col in [*(cfg["dia"].format(d=d) for d in range(1, 32)), cfg["total"]]
+    ]
+    return [c for c in [*COLUMNAS_EXPORTABLES, *medidas] if c in presentes]
+
+def asegurar_ids(df):
+    """Si faltan columnas de id (p. ej. en los datos de ejemplo), las genera codificando el nombre."""
+    for col_id, col_nombre in DIMENSIONES_ID.items():
+        if col_id not in df.columns and col_nombre in df.columns:
+            df[col_id] = pd.factorize(df[col_nombre])[0] + 1
+    return df
+
+def tabla_dimensiones(df):
+    """Pares (dimensión, id, nombre) presentes en los datos; ante un id repetido vale el primer nombre."""
+    partes = []
+    for col_id, col_nombre in DIMENSIONES_ID.items():
+        if col_id not in df.columns or col_nombre not in df.columns:
+            continue
+        pares = df[[col_id, col_nombre]].dropna().drop_duplicates(col_id)
+        partes.append(pd.DataFrame({"dimension": col_id, "id": pares[col_id].to_numpy(), "nombre": pares[col_nombre].to_numpy()}))
+    if not partes:
+        return pd.DataFrame(columns=["dimension", "id", "nombre"])
+    return pd.concat(partes, ignore_index=True)
+
+def consolidar_duplicados(df):
+    """
+    Fusiona las filas repetidas por CLAVES_REGISTRO sumando sus conteos diarios y totales
+    (el resto de columnas conserva el primer valor). Los duplicados se detectan con un hash
+    de la clave, así que el agrupamiento solo se hace sobre las filas repetidas.
+    Agrega la columna 'filas_origen' con cuántas filas del archivo se fusionaron en cada fila.
+    """
+    df = df.reset_index(drop=True)
+    if not set(CLAVES_REGISTRO).issubset(df.columns):
+        df["filas_origen"] = 1
+        return df
+
+    hash_clave = pd.util.hash_pandas_object(df[CLAVES_REGISTRO], index=False)
+    repetidas = hash_clave.duplicated(keep=False).to_numpy()
+    if not repetidas.any():
+        df["filas_origen"] = 1
+        return df
+
+    columnas_conteo = [
+        c for cfg in MEDIDAS_DIARIAS.values()
+        for c in [cfg["dia"].format(d=d) for d in range(1, 32)] + [cfg["total"]]
+        if c in df.columns
+    ]
+    agregacion = {c: ("sum" if c in columnas_conteo else "first") for c in df.columns if c not in CLAVES_REGISTRO}
+
+    duplicadas = df[repetidas].copy()
+    duplicadas["_orden"] = duplicadas.index
+    agregacion["_orden"] = "first"
+    fusionadas = duplicadas.groupby(CLAVES_REGISTRO, sort=False, as_index=False, dropna=False).agg(agregacion)
+    fusionadas["filas_origen"] = duplicadas.groupby(CLAVES_REGISTRO, sort=False, dropna=False).size().to_numpy()
+
+    unicas = df[~repetidas].copy()
+    unicas["_orden"] = unicas.index
+    unicas["filas_origen"] = 1
+
+    # Cada fila fusionada ocupa la posición de su primera aparición en el archivo
+    return (
+        pd.concat([unicas, fusionadas[unicas.columns]], ignore_index=True)
+        .sort_values("_orden", kind="stable")
+        .drop(columns="_orden")
+        .reset_index(drop=True)
+    )
+
+def proyectar_rollup(df):
+    """
+    Resumen mensual por (anio, mes, establecimiento, profesión, profesional) con las dimensiones
+    como ids enteros. Como los datos ya tienen una fila por profesional, mes y establecimiento,
+    basta con proyectar columnas.
+    """
+    dims = [c for c in ["anio", "mes", *DIMENSIONES_ID] if c in df.columns]
+    if "anio" not in dims or "mes" not in dims:
+        return pd.DataFrame()
+
+    valores = df[dims].copy()
+    valores["Atenciones"] = df["total.1"] if "total.1" in df.columns else 0
+    valores["Atendidos"] = df["atendidos_servicios_total"] if "atendidos_servicios_total" in df.columns else 0
+    dias = detectar_dias_columnas(df.columns)
+    valores["TOTAL"] = df[dias].sum(axis=1) if dias else 0
+    return valores
+
+# ============================================================
+#  VALIDACIÓN DE CALIDAD DE DATOS
+# ============================================================
+
+def bloque_dias(df, plantilla):
+    """Matriz (filas × 31) de un bloque diario; los días que no existen en el archivo quedan en cero."""
+    matriz = np.zeros((len(df), 31), dtype=np.float64)
+    for d in range(1, 32):
+        col = plantilla.format(d=d)
+        if col in df.columns:
+            matriz[:, d - 1] = pd.to_numeric(df[col], errors="coerce").fillna(0).to_numpy()
+    return matriz
+
+def validar_calidad(df):
+    """
+    Valida en forma vectorizada la consistencia del archivo consolidado:
+    totales = suma de días por bloque, conteos no negativos, días fuera del mes en cero
+    e id_establecimiento_x = id_establecimiento_y.
+    Devuelve (resumen por regla, DataFrame booleano filas × reglas con las filas observadas).
+    """
+    errores = {}
+
+    if {"anio", "mes"}.issubset(df.columns):
+        inicio_mes = pd.to_datetime(
+            pd.DataFrame({"year": df["anio"], "month": df["mes"], "day": 1}), errors="coerce"
+        )
+        dias_mes = inicio_mes.dt.days_in_month.fillna(31).to_numpy()
+    else:
+        dias_mes = np.full(len(df), 31)
+    fuera_mes = np.arange(1, 32)[None, :] > dias_mes[:, None]
+
+    negativos = np.zeros(len(df), dtype=bool)
+    for nombre, cfg in MEDIDAS_DIARIAS.items():
+        if cfg["dia"].format(d=1) not in df.columns:
+            continue
+        matriz = bloque_dias(df, cfg["dia"])
+        if cfg["total"] in df.columns:
+            total = pd.to_numeric(df[cfg["total"]], errors="coerce").fillna(0).to_numpy()
+            errores[f"{cfg['total']} ≠ suma de días ({nombre})"] = matriz.sum(axis=1) != total
+            negativos |= total < 0
+        negativos |= (matriz < 0).any(axis=1)
+        errores[f"Producción en días fuera del mes ({nombre})"] = ((matriz != 0) & fuera_mes).any(axis=1)
+
+    errores["Conteos negativos"] = negativos
+
+    if {"id_establecimiento_x", "id_establecimiento_y"}.issubset(df.columns):
+        errores["id_establecimiento_x ≠ id_establecimiento_y"] = (
+            df["id_establecimiento_x"].to_numpy() != df["id_establecimiento_y"].to_numpy()
+        )
+
+    detalle = pd.DataFrame(errores, index=df.index)
+    conteo = detalle.sum(axis=0)
+    resumen = pd.DataFrame({
+        "Regla": conteo.index,
+        "Filas Observadas": conteo.to_numpy(),
+        "% Filas": np.round(100 * conteo.to_numpy() / max(len(df), 1), 2),
+    })
+    return resumen, detalle
+
+def validar_estructura(df):
+    """
+    Errores de estructura que impiden ingerir un extracto: columnas de período e ids,
+    al menos una medida diaria y un único (anio, mes). Devuelve una lista de mensajes.
+    """
+    requeridas = ["anio", "mes", *DIMENSIONES_ID, *DIMENSIONES_ID.values()]
+    faltantes = [c for c in requeridas if c not in df.columns]
+    if faltantes:
+        return [f"Faltan columnas: {', '.join(faltantes)}"]
+
+    errores = []
+    if not any(cfg["total"] in df.columns or cfg["dia"].format(d=1) in df.columns for cfg in MEDIDAS_DIARIAS.values()):
+        errores.append("No hay columnas de producción diaria ni totales (p. ej. '1.1'...'31.1', 'total.1').")
+    nulos = df[["anio", "mes", *DIMENSIONES_ID]].isna().any()
+    if nulos.any():
+        errores.append(f"Hay valores vacíos en: {', '.join(nulos[nulos].index)}")
+    periodos = df[["anio", "mes"]].dropna().drop_duplicates()
+    if len(periodos) != 1:
+        errores.append(f"El extracto debe contener un solo período (anio, mes); contiene {len(periodos)}.")
+    return errores
+
+# ============================================================
+#  ALMACENAMIENTO PARTICIONADO POR AÑO Y MES
+# ============================================================
+# particiones/anio=2025/mes=10/datos.parquet  -> filas consolidadas del período
+# particiones/anio=2025/mes=10/rollup.parquet -> resumen mensual del período (proyectar_rollup)
+# particiones/dimensiones.parquet             -> índice id -> nombre de establecimientos, profesiones y personal
+# particiones/_manifiesto.json                -> períodos, su origen y la generación de la ingesta
+
+DIR_PARTICIONES = "particiones"
+ARCHIVO_MANIFIESTO = "_manifiesto.json"
+ARCHIVO_DIMENSIONES = "dimensiones.parquet"
+ORIGEN_CONSOLIDADO = "consolidado"
+
+def raiz_particiones(path="CONSOLIDADO.xlsx"):
+    """Carpeta del almacenamiento particionado que corresponde a un archivo de datos."""
+    return Path(path).parent / DIR_PARTICIONES
+
+def carpeta_periodo(raiz, anio, mes):
+    return Path(raiz) / f"anio={int(anio)}" / f"mes={int(mes)}"
+
+def clave_periodo(anio, mes):
+    return f"{int(anio)}-{int(mes):02d}"
+
+def escribir_parquet(frame, destino):
+    """
+    Escribe un Parquet a un temporal y luego lo renombra, para no dejar archivos a medio escribir.
+    El temporal lleva el pid: dos procesos que sincronizan a la vez no escriben el mismo archivo.
+    """
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+
+    destino = Path(destino)
+    destino.parent.mkdir(parents=True, exist_ok=True)
+    temporal = destino.with_name(f"{destino.name}.{os.getpid()}.tmp")
+    pq.write_table(pa.Table.from_pandas(frame.reset_index(drop=True), preserve_index=False), temporal)
+    os.replace(temporal, destino)
+
+def escribir_particion(raiz, anio, mes, frame):
+    """Escribe (o reemplaza) las filas de un período y su resumen mensual."""
+    carpeta = carpeta_periodo(raiz, anio, mes)
+    escribir_parquet(frame, carpeta / "datos.parquet")
+    escribir_parquet(proyectar_rollup(frame), carpeta / "rollup.parquet")
+
+def listar_particiones(raiz, anios=None, meses=None, archivo="datos.parquet"):
+    """
+    Archivos de las particiones que corresponden a los años y meses pedidos (vacío o None = todos),
+    en orden cronológico. La poda se hace con los nombres de carpeta, sin abrir ningún archivo.
+    """
+    encontrados = []
+    for ruta in Path(raiz).glob(f"anio=*/mes=*/{archivo}"):
+        anio = int(ruta.parent.parent.name.split("=", 1)[1])
+        mes = int(ruta.parent.name.split("=", 1)[1])
+        if (not anios or anio in anios) and (not meses or mes in meses):
+            encontrados.append((anio, mes, ruta))
+    return [ruta for _, _, ruta in sorted(encontrados)]
+
+def leer_manifiesto(raiz):
+    """Manifiesto del almacenamiento, o None si todavía no existe."""
+    ruta = Path(raiz) / ARCHIVO_MANIFIESTO
+    if not ruta.exists():
+        return None
+    return json.loads(ruta.read_text(encoding="utf-8"))
+
+def guardar_manifiesto(raiz, manifiesto):
+    ruta = Path(raiz) / ARCHIVO_MANIFIESTO
+    ruta.parent.mkdir(parents=True, exist_ok=True)
+    temporal = ruta.with_name(f"{ruta.name}.{os.getpid()}.tmp")
+    temporal.write_text(json.dumps(manifiesto, indent=2, ensure_ascii=False), encoding="utf-8")
+    os.replace(temporal, ruta)
+
+def manifiesto_vacio():
+    return {"version_origen": None, "generacion": 0, "ultima_ingesta": None, "periodos": {}}
+
+def actualizar_dimensiones(raiz, df):
+    """Agrega al índice de dimensiones solo los ids nuevos del período ingerido."""
+    ruta = Path(raiz) / ARCHIVO_DIMENSIONES
+    nuevas = tabla_dimensiones(df)
+    if ruta.exists():
+        actuales = pd.read_parquet(ruta)
+        conocidas = pd.MultiIndex.from_frame(actuales[["dimension", "id"]])
+        es_nueva = ~pd.MultiIndex.from_frame(nuevas[["dimension", "id"]]).isin(conocidas)
+        if not es_nueva.any():
+            return
+        nuevas = pd.concat([actuales, nuevas[es_nueva]], ignore_index=True)
+    escribir_parquet(nuevas, ruta)
+
+def leer_dimensiones(raiz):
+    ruta = Path(raiz) / ARCHIVO_DIMENSIONES
+    return pd.read_parquet(ruta) if ruta.exists() else tabla_dimensiones(pd.DataFrame())
+
+def version_archivo(path):
+    """Fecha de modificación (ns) y tamaño del archivo, o None si no existe."""
+    try:
+        info = os.stat(path)
+        return f"{info.st_mtime_ns}-{info.st_size}"
+    except FileNotFoundError:
+        return None
+
+def sincronizar_origen(path="CONSOLIDADO.xlsx"):
+    """
+    Vuelca el consolidado completo al almacenamiento cuando cambia (fecha y tamaño del archivo):
+    reescribe sus períodos, elimina los que ya no trae y conserva los ingeridos por separado.
+    Si el archivo no cambió no se vuelve a leer. Devuelve la carpeta raíz.
+    """
+    raiz = raiz_particiones(path)
+    version = version_archivo(path)
+    manifiesto = leer_manifiesto(raiz) or manifiesto_vacio()
+    if version is None or manifiesto["version_origen"] == version:
+        return raiz
+
+    df = consolidar_duplicados(asegurar_ids(leer_archivo_his(path)))
+    periodos = {}
+    for (anio, mes), grupo in df.groupby(["anio", "mes"], sort=True):
+        escribir_particion(raiz, anio, mes, grupo)
+        periodos[clave_periodo(anio, mes)] = {"filas": len(grupo), "origen": ORIGEN_CONSOLIDADO}
+
+    for clave, info in list(manifiesto["periodos"].items()):
+        if clave in periodos:
+            continue
+        if info["origen"] == ORIGEN_CONSOLIDADO:
+            anio, mes = map(int, clave.split("-"))
+            for archivo in carpeta_periodo(raiz, anio, mes).glob("*.parquet"):
+                archivo.unlink()
+            del manifiesto["periodos"][clave]
+
+    manifiesto["periodos"].update(periodos)
+    manifiesto["version_origen"] = version
+    escribir_parquet(tabla_dimensiones(cargar_almacen(raiz)), raiz / ARCHIVO_DIMENSIONES)
+    guardar_manifiesto(raiz, manifiesto)
+    return raiz
+
+def cargar_almacen(raiz, anios=None, meses=None, columnas=None):
+    """Carga las filas de las particiones pedidas (todas por defecto) en orden cronológico."""
+    partes = [pd.read_parquet(archivo, columns=columnas) for archivo in listar_particiones(raiz, anios, meses)]
+    if not partes:
+        return pd.DataFrame(columns=columnas)
+    return pd.concat(partes, ignore_index=True)
+
+def cargar_rollups(raiz):
+    """Resumen mensual de todo el almacenamiento, leído de los rollups de cada partición."""
+    partes = [pd.read_parquet(archivo) for archivo in listar_particiones(raiz, archivo="rollup.parquet")]
+    return pd.concat(partes, ignore_index=True) if partes else pd.DataFrame()
+
+def cargar_consolidado(path="CONSOLIDADO.xlsx", anios=()):
+    """
+    Datos consolidados del tablero: el archivo de origen (si cambió, se vuelca antes al
+    almacenamiento) más los períodos ingeridos, solo de los años pedidos (vacío = todos).
+    Lanza FileNotFoundError si no hay datos.
+    """
+    raiz = sincronizar_origen(path)
+    if leer_manifiesto(raiz) is None:
+        raise FileNotFoundError(path)
+    return cargar_almacen(raiz, anios)
+
+def calcular_version_datos(path="CONSOLIDADO.xlsx"):
+    """
+    Versión de los datos del tablero: la del archivo de origen más la generación de la ingesta,
+    que solo cambia al ingerir un período. None si no hay archivo ni almacenamiento. Sin manifiesto
+    (antes del primer volcado al almacenamiento) la generación es 0, la misma que deja ese volcado:
+    así armar el almacenamiento no cambia la versión ni invalida las cachés.
+    """
+    version = version_archivo(path)
+    manifiesto = leer_manifiesto(raiz_particiones(path))
+    if manifiesto is None:
+        return f"{version}-g0" if version else None
+    return f"{version or 'almacen'}-g{manifiesto['generacion']}"
+
+def fecha_ultima_ingesta(path="CONSOLIDADO.xlsx"):
+    """Momento (timestamp) de la última ingesta mensual, o None si nunca se ingirió un período."""
+    manifiesto = leer_manifiesto(raiz_particiones(path))
+    if not manifiesto or not manifiesto.get("ultima_ingesta"):
+        return None
+    return datetime.fromisoformat(manifiesto["ultima_ingesta"]).timestamp()
+
+def ingerir_periodo(df, path="CONSOLIDADO.xlsx", origen="extracto", reemplazar=False):
+    """
+    Agrega un extracto mensual ya validado como una partición nueva y actualiza solo lo que
+    depende de ese período: su rollup, los ids nuevos del índice de dimensiones y el manifiesto.
+    Devuelve (anio, mes, filas).
+    """
+    raiz = sincronizar_origen(path)
+    manifiesto = leer_manifiesto(raiz) or manifiesto_vacio()
+    anio, mes = (int(v) for v in df[["anio", "mes"]].iloc[0])
+    clave = clave_periodo(anio, mes)
+    if clave in manifiesto["periodos"] and not reemplazar:
+        raise ValueError(f"El período {clave} ya existe en el almacenamiento (use --reemplazar).")
+
+    df = consolidar_duplicados(df)
+    escribir_particion(raiz, anio, mes, df)
+    actualizar_dimensiones(raiz, df)
+
+    manifiesto["periodos"][clave] = {"filas": len(df), "origen": origen}
+    manifiesto["generacion"] += 1
+    manifiesto["ultima_ingesta"] = datetime.now(timezone.utc).isoformat()
+    guardar_manifiesto(raiz, manifiesto)
+    return anio, mes, len(df)
+
+# ============================================================
+#  DATOS COMPARTIDOS ENTRE PROCESOS (ARROW IPC MAPEADO EN MEMORIA)
+# ============================================================
+# Con varios procesos de Streamlit detrás de un proxy, cada uno tendría su propia copia de los
+# datos. En cambio, el primero que necesita una versión la publica como un archivo Arrow IPC sin
+# compresión y todos lo abren con mmap: las columnas numéricas y de texto del DataFrame apuntan a
+# las páginas del archivo, que el sistema operativo comparte entre procesos (una sola copia en RAM).
+
+DIR_COMPARTIDO = "compartido"
+
+def ruta_compartido(path, version, anios=()):
+    """Archivo Arrow de una versión y un alcance de años (vacío = todos): datos-<versión>[.anio-2024-2025].arrow"""
+    alcance = "".join(f"-{int(a)}" for a in sorted(anios))
+    return raiz_particiones(path) / DIR_COMPARTIDO / (f"datos-{version}.anio{alcance}.arrow" if alcance else f"datos-{version}.arrow")
+
+def publicar_compartido(df, destino):
+    """
+    Escribe df como Arrow IPC (formato de archivo, sin compresión, para poder mapearlo) a un temporal
+    propio del proceso y lo renombra; luego borra los de versiones anteriores (los de otros años de la
+    misma versión se conservan). Los procesos que aún los tengan mapeados siguen leyéndolos hasta soltarlos.
+    """
+    import pyarrow as pa
+
+    destino = Path(destino)
+    destino.parent.mkdir(parents=True, exist_ok=True)
+    temporal = destino.with_name(f"{destino.name}.{os.getpid()}.tmp")
+    # Un solo lote por columna: con varios, pandas tendría que concatenarlos (y copiarlos) al abrir
+    tabla = pa.Table.from_pandas(df.reset_index(drop=True), preserve_index=False).combine_chunks()
+    with pa.OSFile(str(temporal), "wb") as archivo, pa.ipc.new_file(archivo, tabla.schema) as escritor:
+        escritor.write_table(tabla)
+    os.replace(temporal, destino)
+    version = destino.name.split(".")[0]
+    for anterior in destino.parent.glob("datos-*.arrow"):
+        if anterior.name.split(".")[0] != version:
+            try:
+                anterior.unlink()
+            except OSError:
+                pass  # En Windows un archivo mapeado no se puede borrar: queda para la próxima publicación
+
+def abrir_compartido(ruta):
+    """DataFrame sobre el archivo Arrow mapeado, sin copiar los buffers (split_blocks evita consolidarlos)."""
+    import pyarrow as pa
+
+    tabla = pa.ipc.open_file(pa.memory_map(str(ruta), "r")).read_all()
+    return tabla.to_pandas(split_blocks=True)
+
+def cargar_compartido(path="CONSOLIDADO.xlsx", version=None, anios=()):
+    """
+    Datos consolidados de una versión y unos años (vacío = todos), compartidos entre procesos: si otro
+    proceso ya los publicó se adjunta a ellos; si no, los carga (cargar_consolidado), los publica y se adjunta.
+    """
+    ruta = ruta_compartido(path, version or calcular_version_datos(path), anios)
+    if not ruta.exists():
+        publicar_compartido(cargar_consolidado(path, anios), ruta)
+    return abrir_compartido(ruta)
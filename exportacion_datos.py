@@ -0,0 +1,64 @@
+# ============================================================
+#  EXPORTACIÓN DE LAS FILAS FILTRADAS (CSV Y PARQUET)
+# ============================================================
+# Las filas se serializan por bloques a un archivo temporal en disco, sin armar el archivo completo
+# como un único texto de Python. st.download_button no transmite por partes: al pedirse la descarga
+# lee el archivo entero a su almacenamiento en memoria, así que esa es la única copia completa.
+# Solo se exportan las columnas no personales (ver columnas_exportables en datos_his.py).
+
+import io
+import tempfile
+
+# Formato -> (extensión, tipo MIME)
+FORMATOS_EXPORTACION = {
+    "CSV": ("csv", "text/csv"),
+    "Parquet": ("parquet", "application/vnd.apache.parquet"),
+}
+FILAS_POR_BLOQUE = 20_000
+
+def bloques_filas(df, posiciones, columnas, filas_por_bloque=FILAS_POR_BLOQUE):
+    """Recorre las filas elegidas (posiciones) en bloques, solo con las columnas indicadas; al menos un bloque."""
+    seleccion = df[columnas]
+    for inicio in range(0, max(len(posiciones), 1), filas_por_bloque):
+        yield seleccion.iloc[posiciones[inicio:inicio + filas_por_bloque]]
+
+def escribir_csv(df, posiciones, columnas, destino, filas_por_bloque=FILAS_POR_BLOQUE):
+    """CSV en UTF-8 con BOM (para que Excel muestre bien las tildes), escrito bloque a bloque en 'destino' (binario)."""
+    texto = io.TextIOWrapper(destino, encoding="utf-8-sig", newline="")
+    for i, bloque in enumerate(bloques_filas(df, posiciones, columnas, filas_por_bloque)):
+        bloque.to_csv(texto, header=(i == 0), index=False)
+    texto.flush()
+    texto.detach()  # 'destino' sigue abierto para quien llama
+
+def escribir_parquet(df, posiciones, columnas, destino, filas_por_bloque=FILAS_POR_BLOQUE):
+    """Parquet con un grupo de filas por bloque; el esquema del primer bloque se aplica a todos."""
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+
+    escritor = esquema = None
+    for bloque in bloques_filas(df, posiciones, columnas, filas_por_bloque):
+        tabla = pa.Table.from_pandas(bloque, schema=esquema, preserve_index=False)
+        if escritor is None:
+            esquema = tabla.schema
+            escritor = pq.ParquetWriter(destino, esquema)
+        escritor.write_table(tabla)
+    escritor.close()
+
+ESCRITORES = {"CSV": escribir_csv, "Parquet": escribir_parquet}
+
+def exportar_filas(df, posiciones, columnas, formato="CSV"):
+    """
+    Archivo exportado, escrito por bloques en un temporal en disco y devuelto abierto desde el
+    inicio (sin leerlo aquí). Es un archivo sin búfer (io.RawIOBase), que download_button acepta.
+    """
+    archivo = tempfile.TemporaryFile(buffering=0)
+    escritura = io.BufferedWriter(archivo)
+    try:
+        ESCRITORES[formato](df, posiciones, columnas, escritura)
+        escritura.flush()
+    except Exception:
+        archivo.close()
+        raise
+    escritura.detach()  # sin cerrar 'archivo', que lee Streamlit
+    archivo.seek(0)
+    return archivo
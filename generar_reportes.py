@@ -0,0 +1,190 @@
+# ============================================================
+#  GENERACIÓN DE REPORTES PDF POR LOTES (SIN INTERFAZ)
+# ============================================================
+# Uso:
+#   python generar_reportes.py [--salida reportes] [--datos CONSOLIDADO.xlsx] [--anio 2025] [--mes 10 ...]
+#                              [--ipress CALLANCAS ...] [--medida Atenciones] [--motor pandas]
+#                              [--matriz] [--procesos N]
+#
+# Sin --matriz genera un solo reporte con los filtros indicados, igual al del botón del tablero.
+# Con --matriz genera uno por cada combinación IPRESS × mes (× año) que tiene datos dentro de los
+# filtros; sus archivos llevan el id del establecimiento, porque dos IPRESS pueden tener el mismo
+# nombre. Los reportes se reparten entre procesos y al terminar se escribe manifiesto.json en la
+# carpeta de salida con los filtros, el archivo y los tiempos de cada reporte.
+# Reutiliza la carga (cargar_datos), el resumen y el PDF del tablero, sin importar Streamlit.
+
+import argparse
+import json
+import os
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime, timezone
+from pathlib import Path
+
+from consultas_his import (
+    ETIQUETAS_RESUMEN, MOTORES_CONSULTA, agregar_nombres, alcance_anios, calcular_resumen, cargar_datos,
+    columnas_dias_resumen, construir_cubo_medidas, construir_dimensiones, construir_indices_filtros,
+    rankear_resumen, resolver_filtros
+)
+from datos_his import MEDIDAS_DIARIAS, MESES_ESPANOL, calcular_version_datos
+from reporte_pdf import crear_pdf_profesional, etiqueta_seleccion, leer_logo, nombre_archivo_pdf, preparar_tabla_pdf
+
+ARCHIVO_MANIFIESTO = "manifiesto.json"
+LOGO = Path(__file__).parent / "logo_sanpablo.png"
+
+
+def resolver_ipress(valores, ids_por_nombre):
+    """Ids de establecimiento a partir de ids o nombres. Lanza ValueError si un nombre no existe."""
+    ids = []
+    for valor in valores:
+        if valor.isdigit():
+            ids.append(int(valor))
+        elif valor in ids_por_nombre:
+            ids.extend(ids_por_nombre[valor])
+        else:
+            raise ValueError(f"Establecimiento desconocido: {valor}")
+    return sorted(set(ids))
+
+def armar_trabajos(args, df, nombres_ipress):
+    """
+    Lista de reportes a generar: (selecciones, filtros para el título, nombre del archivo).
+    En modo matriz, uno por cada (año, mes, IPRESS) con datos; si no, uno con todos los filtros.
+    """
+    if not args.matriz:
+        selecciones = {"anio": args.anio, "mes": args.mes, "id_establecimiento_x": args.ipress}
+        filtros = etiquetas_filtros(selecciones, nombres_ipress)
+        return [(selecciones, filtros, nombre_archivo_pdf(filtros))]
+
+    combinaciones = df[["anio", "mes", "id_establecimiento_x"]].drop_duplicates()
+    for col, valores in (("anio", args.anio), ("mes", args.mes), ("id_establecimiento_x", args.ipress)):
+        if valores:
+            combinaciones = combinaciones[combinaciones[col].isin(valores)]
+    trabajos = []
+    for anio, mes, ipress in sorted(combinaciones.itertuples(index=False, name=None)):
+        selecciones = {"anio": [int(anio)], "mes": [int(mes)], "id_establecimiento_x": [int(ipress)]}
+        filtros = etiquetas_filtros(selecciones, nombres_ipress)
+        # El id distingue a establecimientos con el mismo nombre (si no, un reporte pisaría al otro)
+        trabajos.append((selecciones, filtros, nombre_archivo_pdf(filtros, prefijo=f"Reporte_Produccion_{int(ipress)}")))
+    return trabajos
+
+def etiquetas_filtros(selecciones, nombres_ipress):
+    """Filtros como los muestra el tablero: Mes, Establecimiento y Año."""
+    return {
+        "Mes": etiqueta_seleccion([MESES_ESPANOL[m] for m in selecciones["mes"]]),
+        "Establecimiento": etiqueta_seleccion([nombres_ipress.get(i, i) for i in selecciones["id_establecimiento_x"]]),
+        "Año": etiqueta_seleccion(selecciones["anio"]),
+    }
+
+def generar_reporte(trabajo):
+    """Genera un reporte (en un proceso del pool) y devuelve su entrada del manifiesto."""
+    selecciones, filtros, archivo, datos, version, medida, motor, salida = trabajo
+    entrada = {"filtros": filtros, "selecciones": selecciones, "archivo": None, "profesionales": 0, "estado": "ok"}
+    inicio = time.perf_counter()
+    try:
+        # Un período o IPRESS sin filas se omite (no es un error) antes de calcular el resumen y el PDF
+        anios = alcance_anios(selecciones)
+        n_filas = len(cargar_datos(datos, version, anios))
+        if resolver_filtros(construir_indices_filtros(datos, version, anios), selecciones, n_filas).size == 0:
+            entrada["estado"] = "sin datos"
+            entrada["segundos"] = {"total": round(time.perf_counter() - inicio, 3)}
+            return entrada
+
+        _, _, dias_presentes = construir_cubo_medidas(datos, version, anios)
+        day_cols = columnas_dias_resumen(medida, dias_presentes)
+        ranking = rankear_resumen(calcular_resumen(selecciones, medida, motor, datos, version), medida, day_cols)
+        t_resumen = time.perf_counter()
+        if ranking.empty:
+            entrada["estado"] = "sin datos"
+            entrada["segundos"] = {"resumen": round(t_resumen - inicio, 3), "total": round(t_resumen - inicio, 3)}
+            return entrada
+
+        nombres = construir_dimensiones(datos, version)[0]
+        tabla = preparar_tabla_pdf(agregar_nombres(ranking, nombres).rename(columns=ETIQUETAS_RESUMEN), day_cols)
+        buffer = crear_pdf_profesional(tabla, filtros, leer_logo(LOGO))
+        t_pdf = time.perf_counter()
+
+        destino = Path(salida) / archivo
+        destino.write_bytes(buffer.getvalue())
+        fin = time.perf_counter()
+        entrada.update(archivo=destino.name, profesionales=len(tabla), bytes=destino.stat().st_size)
+        entrada["segundos"] = {
+            "resumen": round(t_resumen - inicio, 3),
+            "pdf": round(t_pdf - t_resumen, 3),
+            "escritura": round(fin - t_pdf, 3),
+            "total": round(fin - inicio, 3),
+        }
+    except Exception as e:
+        entrada.update(estado="error", error=f"{type(e).__name__}: {e}")
+        entrada["segundos"] = {"total": round(time.perf_counter() - inicio, 3)}
+    return entrada
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Genera reportes PDF de producción HIS por lotes.")
+    parser.add_argument("--salida", default="reportes", help="Carpeta de salida (por defecto: reportes)")
+    parser.add_argument("--datos", default="CONSOLIDADO.xlsx", help="Archivo de datos (por defecto: CONSOLIDADO.xlsx)")
+    parser.add_argument("--anio", type=int, nargs="*", default=[], help="Año(s); sin valor = todos")
+    parser.add_argument("--mes", type=int, nargs="*", default=[], choices=range(1, 13), metavar="MES",
+                        help="Mes(es) de 1 a 12; sin valor = todos")
+    parser.add_argument("--ipress", nargs="*", default=[], help="Establecimiento(s) por id o nombre; sin valor = todos")
+    parser.add_argument("--medida", choices=list(MEDIDAS_DIARIAS), default="Atenciones",
+                        help="Medida diaria de las columnas de días (por defecto: Atenciones)")
+    parser.add_argument("--motor", choices=MOTORES_CONSULTA, default="pandas", help="Motor del resumen (por defecto: pandas)")
+    parser.add_argument("--matriz", action="store_true", help="Un reporte por cada IPRESS × mes con datos")
+    parser.add_argument("--procesos", type=int, default=os.cpu_count() or 1,
+                        help="Procesos para generar los reportes (por defecto: núcleos disponibles)")
+    args = parser.parse_args(argv)
+
+    inicio = time.perf_counter()
+    version = calcular_version_datos(args.datos)
+    if version is None:
+        parser.error(f"No se encontró el archivo de datos: {args.datos}")
+    # Solo las particiones de los años pedidos (sin --anio, todas)
+    df = cargar_datos(args.datos, version, tuple(sorted(args.anio)))
+    nombres, ids_por_nombre = construir_dimensiones(args.datos, version)
+    nombres_ipress = nombres.get("id_establecimiento_x", {})
+    try:
+        args.ipress = resolver_ipress(args.ipress, ids_por_nombre.get("id_establecimiento_x", {}))
+    except ValueError as e:
+        parser.error(str(e))
+
+    salida = Path(args.salida)
+    salida.mkdir(parents=True, exist_ok=True)
+    trabajos = [
+        (selecciones, filtros, archivo, args.datos, version, args.medida, args.motor, str(salida))
+        for selecciones, filtros, archivo in armar_trabajos(args, df, nombres_ipress)
+    ]
+    procesos = max(1, min(args.procesos, len(trabajos)))
+    print(f"Generando {len(trabajos)} reporte(s) con {procesos} proceso(s) en {salida}/")
+
+    if procesos == 1:
+        reportes = [generar_reporte(t) for t in trabajos]
+    else:
+        # Los procesos adjuntan los datos publicados por cargar_datos (Arrow mapeado) sin volver a leerlos
+        with ProcessPoolExecutor(procesos) as pool:
+            reportes = list(pool.map(generar_reporte, trabajos))
+
+    manifiesto = {
+        "generado": datetime.now(timezone.utc).isoformat(),
+        "datos": args.datos,
+        "version": version,
+        "medida": args.medida,
+        "motor": args.motor,
+        "procesos": procesos,
+        "segundos_total": round(time.perf_counter() - inicio, 3),
+        "reportes": reportes,
+    }
+    (salida / ARCHIVO_MANIFIESTO).write_text(json.dumps(manifiesto, ensure_ascii=False, indent=2), encoding="utf-8")
+
+    errores = [r for r in reportes if r["estado"] == "error"]
+    for r in errores:
+        print(f"ERROR: {r['filtros']}: {r['error']}", file=sys.stderr)
+    generados = sum(r["estado"] == "ok" for r in reportes)
+    omitidos = sum(r["estado"] == "sin datos" for r in reportes)
+    print(f"{generados} reporte(s) generado(s), {omitidos} omitido(s) sin datos, {len(errores)} con error, "
+          f"en {manifiesto['segundos_total']:.1f} s.")
+    return 1 if errores else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,59 @@
+# ============================================================
+#  INGESTA INCREMENTAL DE UN EXTRACTO MENSUAL HIS
+# ============================================================
+# Uso:
+#   python ingesta.py EXTRACTO_2026_01.xlsx [--datos CONSOLIDADO.xlsx] [--reemplazar] [--estricto]
+#
+# Valida el extracto (un solo período, en el mismo formato ancho que CONSOLIDADO.xlsx), lo agrega
+# como una partición nueva del almacenamiento y actualiza solo su rollup, el índice de dimensiones
+# y el manifiesto. El tablero lo toma en la siguiente recarga sin releer el histórico.
+
+import argparse
+import sys
+import time
+
+from datos_his import ingerir_periodo, leer_archivo_his, validar_calidad, validar_estructura
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Ingesta incremental de un extracto mensual HIS.")
+    parser.add_argument("extracto", help="Archivo del extracto mensual (.xlsx, .csv o .parquet)")
+    parser.add_argument("--datos", default="CONSOLIDADO.xlsx",
+                        help="Archivo de datos del tablero; el almacenamiento queda en su carpeta (por defecto: CONSOLIDADO.xlsx)")
+    parser.add_argument("--reemplazar", action="store_true", help="Reemplaza el período si ya existe")
+    parser.add_argument("--estricto", action="store_true",
+                        help="Rechaza el extracto si alguna regla de calidad tiene observaciones")
+    args = parser.parse_args(argv)
+
+    inicio = time.perf_counter()
+    try:
+        df = leer_archivo_his(args.extracto)
+    except FileNotFoundError:
+        parser.error(f"No se encontró el extracto: {args.extracto}")
+
+    errores = validar_estructura(df)
+    if errores:
+        for error in errores:
+            print(f"ERROR: {error}", file=sys.stderr)
+        return 1
+
+    resumen_calidad, _ = validar_calidad(df)
+    observadas = resumen_calidad[resumen_calidad["Filas Observadas"] > 0]
+    for regla, filas, porcentaje in observadas.itertuples(index=False, name=None):
+        print(f"Calidad: {regla}: {filas} fila(s) ({porcentaje}%)")
+    if args.estricto and not observadas.empty:
+        print("ERROR: el extracto tiene observaciones de calidad (--estricto).", file=sys.stderr)
+        return 1
+
+    try:
+        anio, mes, filas = ingerir_periodo(df, args.datos, origen=args.extracto, reemplazar=args.reemplazar)
+    except ValueError as e:
+        print(f"ERROR: {e}", file=sys.stderr)
+        return 1
+
+    print(f"Período {anio}-{mes:02d} ingerido: {filas} filas en {time.perf_counter() - inicio:.1f} s.")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,168 @@
+# ============================================================
+#  PERFIL DE IMPORTACIÓN Y PRESUPUESTO DE ARRANQUE DEL TABLERO
+# ============================================================
+# Uso:
+#   python perfil_arranque.py [--app app.py] [--datos CONSOLIDADO.xlsx] [--presupuesto-frio 8]
+#                             [--presupuesto 4] [--top 15] [--json perfil.json]
+#
+# Ejecuta la primera pasada de la página en un intérprete nuevo (como un worker recién levantado,
+# con las cachés en memoria vacías) usando el AppTest de Streamlit con `python -X importtime`, dos veces:
+#   - en frío: en una copia de la página y del archivo de datos en una carpeta temporal, sin
+#     almacenamiento particionado, base SQL ni archivo Arrow compartido (como una copia recién
+#     desplegada); la primera ejecución incluye volcar el Excel al almacenamiento;
+#   - con el almacenamiento armado: en la carpeta de la página, después de sincronizarlo (como lo
+#     deja la ingesta en producción).
+# Reporta los paquetes que más tardan en importarse (tiempo acumulado), el tiempo de Streamlit y el
+# de cada primera ejecución, y si se cargó alguna biblioteca que debe importarse solo al pedir una
+# descarga o un motor. Termina con código 1 si alguna ejecución supera su presupuesto (segundos), si
+# se importó un módulo diferido o si la página lanzó una excepción. tests/test_arranque.py corre la
+# misma verificación con pytest.
+
+import argparse
+import json
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+from collections import defaultdict
+from pathlib import Path
+
+from datos_his import sincronizar_origen
+
+# Presupuestos por defecto de la primera ejecución de un worker (segundos), medidos en 1 núcleo:
+# en frío ~4 s (~2 s de volcar el Excel al almacenamiento más la pasada) y con el almacenamiento
+# armado ~1.9 s (~3.2 s cuando el PDF se generaba en cada recarga). El margen cubre máquinas más lentas.
+PRESUPUESTO_ARRANQUE_FRIO = 8.0
+PRESUPUESTO_ARRANQUE_ALMACEN = 4.0
+
+# Bibliotecas que la primera pantalla no debe importar: PDF (ReportLab), Excel (openpyxl) y los
+# motores opcionales del resumen (DuckDB, Polars), que solo se cargan si se eligen con TABLERO_MOTOR
+MODULOS_DIFERIDOS = ["reportlab", "openpyxl", "duckdb", "polars"]
+
+# Código del proceso hijo: importa Streamlit, ejecuta la página una vez y devuelve tiempos y módulos
+CODIGO_HIJO = """
+import json, sys, time
+inicio = time.perf_counter()
+from streamlit.testing.v1 import AppTest
+t_streamlit = time.perf_counter()
+at = AppTest.from_file(sys.argv[1], default_timeout=float(sys.argv[2])).run()
+fin = time.perf_counter()
+print(json.dumps({
+    "segundos_streamlit": round(t_streamlit - inicio, 3),
+    "segundos_primera_ejecucion": round(fin - t_streamlit, 3),
+    "excepciones": [str(e.value) for e in at.exception],
+    "modulos": sorted({nombre.split(".")[0] for nombre in sys.modules}),
+}))
+"""
+
+
+def leer_importtime(texto):
+    """
+    Tiempo acumulado (segundos) por paquete de primer nivel a partir de la salida de -X importtime.
+    Solo se suman las importaciones de nivel superior, que ya incluyen a sus dependencias.
+    """
+    acumulado = defaultdict(int)
+    for linea in texto.splitlines():
+        if not linea.startswith("import time:") or "self [us]" in linea:
+            continue
+        _, acumulado_us, nombre = linea.split("|", 2)
+        if not nombre.startswith("  "):  # nivel superior: sin sangría después del separador
+            acumulado[nombre.strip().split(".")[0]] += int(acumulado_us)
+    return {paquete: us / 1e6 for paquete, us in acumulado.items()}
+
+def perfilar(app, tiempo_espera):
+    """Resultado del proceso hijo más el perfil de importación por paquete."""
+    proceso = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", CODIGO_HIJO, str(app), str(tiempo_espera)],
+        capture_output=True, text=True, cwd=Path(app).resolve().parent,
+    )
+    if proceso.returncode != 0:
+        raise RuntimeError(proceso.stderr.strip().splitlines()[-1] if proceso.stderr.strip() else "el proceso falló")
+    resultado = json.loads(proceso.stdout.strip().splitlines()[-1])
+    resultado["importacion_por_paquete"] = leer_importtime(proceso.stderr)
+    return resultado
+
+def copia_en_frio(app, datos, carpeta):
+    """
+    Copia la página (los módulos .py y el logo de su carpeta) y el archivo de datos a 'carpeta',
+    sin almacenamiento ni bases derivadas. Devuelve la ruta de la página copiada.
+    """
+    origen = Path(app).resolve().parent
+    for archivo in [*origen.glob("*.py"), *origen.glob("*.png"), origen / datos]:
+        if archivo.is_file():
+            shutil.copy2(archivo, Path(carpeta) / archivo.name)
+    return Path(carpeta) / Path(app).name
+
+def problemas_ejecucion(resultado, presupuesto, etapa):
+    """Problemas de una primera ejecución: presupuesto superado, módulos diferidos y excepciones."""
+    problemas = []
+    if resultado["segundos_primera_ejecucion"] > presupuesto:
+        problemas.append(f"{etapa}: la primera ejecución supera el presupuesto de {presupuesto:.1f} s")
+    cargados = [m for m in MODULOS_DIFERIDOS if m in resultado["modulos"]]
+    if cargados:
+        problemas.append(f"{etapa}: se importaron módulos diferidos: {', '.join(cargados)}")
+    return problemas + [f"{etapa}: excepción en la página: {e}" for e in resultado["excepciones"]]
+
+def medir_arranque(app="app.py", datos="CONSOLIDADO.xlsx", presupuesto_frio=PRESUPUESTO_ARRANQUE_FRIO,
+                   presupuesto=PRESUPUESTO_ARRANQUE_ALMACEN):
+    """
+    Primera ejecución en frío (copia temporal) y con el almacenamiento armado (carpeta de la página).
+    Devuelve {"frio": resultado, "almacen": resultado, "problemas": [...]}; lanza RuntimeError si el
+    proceso hijo no pudo ejecutar la página.
+    """
+    with tempfile.TemporaryDirectory(prefix="arranque-") as carpeta:
+        frio = perfilar(copia_en_frio(app, datos, carpeta), max(presupuesto_frio * 4, 60))
+
+    inicio = time.perf_counter()
+    sincronizar_origen(Path(app).resolve().parent / datos)
+    segundos_almacen = time.perf_counter() - inicio
+    almacen = perfilar(app, max(presupuesto * 4, 60))
+    almacen["segundos_almacen"] = round(segundos_almacen, 3)
+
+    problemas = problemas_ejecucion(frio, presupuesto_frio, "en frío")
+    problemas += problemas_ejecucion(almacen, presupuesto, "con almacenamiento")
+    return {"frio": frio, "almacen": almacen, "problemas": problemas}
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Perfil de importación y presupuesto de arranque del tablero HIS.")
+    parser.add_argument("--app", default="app.py", help="Script de la página (por defecto: app.py)")
+    parser.add_argument("--datos", default="CONSOLIDADO.xlsx",
+                        help="Archivo de datos, relativo a la carpeta de la página (por defecto: CONSOLIDADO.xlsx)")
+    parser.add_argument("--presupuesto-frio", type=float, default=PRESUPUESTO_ARRANQUE_FRIO,
+                        help=f"Segundos máximos de la primera ejecución en frío (por defecto: {PRESUPUESTO_ARRANQUE_FRIO})")
+    parser.add_argument("--presupuesto", type=float, default=PRESUPUESTO_ARRANQUE_ALMACEN,
+                        help=f"Segundos máximos de la primera ejecución con el almacenamiento armado "
+                             f"(por defecto: {PRESUPUESTO_ARRANQUE_ALMACEN})")
+    parser.add_argument("--top", type=int, default=15, help="Paquetes a listar en el perfil (por defecto: 15)")
+    parser.add_argument("--json", help="Archivo donde guardar el perfil completo")
+    args = parser.parse_args(argv)
+
+    try:
+        medicion = medir_arranque(args.app, args.datos, args.presupuesto_frio, args.presupuesto)
+    except RuntimeError as e:
+        print(f"ERROR: no se pudo ejecutar {args.app}: {e}", file=sys.stderr)
+        return 1
+    frio, almacen, problemas = medicion["frio"], medicion["almacen"], medicion["problemas"]
+
+    print(f"Perfil de importación de la primera ejecución ({args.app}), tiempo acumulado por paquete:")
+    for paquete, segundos in sorted(almacen["importacion_por_paquete"].items(), key=lambda x: -x[1])[:args.top]:
+        print(f"  {paquete:<28} {segundos:7.3f} s")
+    print(f"Importación de Streamlit:              {almacen['segundos_streamlit']:7.3f} s")
+    print(f"Primera ejecución en frío:             {frio['segundos_primera_ejecucion']:7.3f} s "
+          f"(presupuesto {args.presupuesto_frio:.1f} s)")
+    print(f"Sincronizar el almacenamiento:         {almacen['segundos_almacen']:7.3f} s")
+    print(f"Primera ejecución con almacenamiento:  {almacen['segundos_primera_ejecucion']:7.3f} s "
+          f"(presupuesto {args.presupuesto:.1f} s)")
+
+    if args.json:
+        Path(args.json).write_text(json.dumps(medicion, ensure_ascii=False, indent=2), encoding="utf-8")
+    for problema in problemas:
+        print(f"ERROR: {problema}", file=sys.stderr)
+    if not problemas:
+        print("Arranque dentro del presupuesto.")
+    return 1 if problemas else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,88 @@
+# ============================================================
+#  EXPORTACIÓN DEL RESUMEN A EXCEL
+# ============================================================
+# Libro .xlsx con el resumen completo, escrito en streaming con openpyxl en modo write_only:
+# cada fila se serializa al recorrerla, así que la memoria no crece con el número de filas.
+# Mismas columnas que la tabla y el PDF (ver preparar_tabla_pdf) más ITEM al inicio.
+
+from datetime import datetime
+from io import BytesIO
+from zoneinfo import ZoneInfo
+
+# openpyxl se importa dentro de crear_excel_resumen: solo hace falta al pedir la descarga
+
+MIME_EXCEL = "application/vnd.openxmlformats-officedocument.spreadsheetml.sheet"
+
+# Columnas de texto (el resto son conteos enteros)
+COLUMNAS_TEXTO = ["Profesional", "Profesión", "Establecimiento"]
+FORMATO_ENTERO = "#,##0"
+ANCHOS = {"ITEM": 6, "Profesional": 38, "Profesión": 22, "Establecimiento": 24, "Atendidos": 11, "Atenciones": 11, "TOTAL": 10}
+ANCHO_DIA = 5
+
+def crear_excel_resumen(df_tabla, filtros):
+    """
+    Devuelve el .xlsx (bytes) con la hoja 'Resumen' (encabezado fijo, filtros automáticos y formato
+    de miles en los conteos) y la hoja 'Filtros' con los filtros aplicados.
+    """
+    from openpyxl import Workbook
+    from openpyxl.cell import WriteOnlyCell
+    from openpyxl.styles import Alignment, Font, PatternFill
+    from openpyxl.utils import get_column_letter
+
+    libro = Workbook(write_only=True)
+    hoja = libro.create_sheet("Resumen")
+    columnas = ["ITEM", *df_tabla.columns]
+
+    # En modo write_only el formato de hoja se define antes de escribir filas
+    for i, col in enumerate(columnas, start=1):
+        hoja.column_dimensions[get_column_letter(i)].width = ANCHOS.get(col, ANCHO_DIA)
+    hoja.freeze_panes = "C2"  # Encabezado, ITEM y Profesional siempre visibles
+    hoja.auto_filter.ref = f"A1:{get_column_letter(len(columnas))}{len(df_tabla) + 1}"
+
+    fuente_encabezado = Font(bold=True, color="FFFFFF")
+    relleno_encabezado = PatternFill("solid", fgColor="003C8F")
+    relleno_total = PatternFill("solid", fgColor="FFC107")
+    centrado = Alignment(horizontal="center", vertical="center", wrap_text=True)
+    encabezado = []
+    for col in columnas:
+        celda = WriteOnlyCell(hoja, value=col)
+        celda.font = fuente_encabezado if col != "TOTAL" else Font(bold=True, color="856404")
+        celda.fill = relleno_encabezado if col != "TOTAL" else relleno_total
+        celda.alignment = centrado
+        encabezado.append(celda)
+    hoja.append(encabezado)
+
+    # Los conteos van con formato de miles. En modo write_only cada fila se serializa al agregarla,
+    # así que basta una celda con formato por columna numérica a la que solo se le cambia el valor
+    plantillas = []
+    for col in columnas:
+        if col in COLUMNAS_TEXTO:
+            plantillas.append(None)
+        else:
+            celda = WriteOnlyCell(hoja)
+            celda.number_format = FORMATO_ENTERO
+            plantillas.append(celda)
+    for item, fila in enumerate(df_tabla.itertuples(index=False, name=None), start=1):
+        valores = []
+        for celda, valor in zip(plantillas, (item, *fila)):
+            if valor is None or valor != valor:  # None o NaN
+                valores.append(None)
+            elif celda is None:
+                valores.append(str(valor))
+            else:
+                celda.value = int(valor)
+                valores.append(celda)
+        hoja.append(valores)
+
+    hoja_filtros = libro.create_sheet("Filtros")
+    hoja_filtros.column_dimensions["A"].width = 18
+    hoja_filtros.column_dimensions["B"].width = 40
+    for clave in ("Año", "Mes", "Establecimiento"):
+        hoja_filtros.append([clave, str(filtros.get(clave, "Todos"))])
+    hoja_filtros.append(["Profesionales", len(df_tabla)])
+    hoja_filtros.append(["Generado", datetime.now(ZoneInfo("America/Lima")).strftime("%d/%m/%Y %H:%M:%S") + " (Perú)"])
+    hoja_filtros.append(["Fuente", "HISMINSA"])
+
+    buffer = BytesIO()
+    libro.save(buffer)
+    return buffer.getvalue()
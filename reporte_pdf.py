@@ -0,0 +1,321 @@
+# ============================================================
+#  REPORTE PDF DE PRODUCCIÓN
+# ============================================================
+# Generación del PDF con ReportLab sin dependencias de Streamlit: la usan el botón de descarga del
+# tablero (app.py) y la generación nocturna por lotes (generar_reportes.py).
+
+import re
+from datetime import datetime
+from io import BytesIO
+from zoneinfo import ZoneInfo
+
+import pandas as pd
+
+# ReportLab (~0.1 s de importación) se importa dentro de crear_pdf_profesional: el tablero solo lo
+# necesita cuando se pide la descarga del PDF, no para dibujar la página.
+
+
+def leer_logo(ruta):
+    """Logo del reporte como BytesIO, o None si no se puede leer."""
+    try:
+        with open(ruta, "rb") as f:
+            return BytesIO(f.read())
+    except OSError:
+        return None
+
+def etiqueta_seleccion(valores):
+    """Texto para títulos y nombres de archivo: 'Todos', el valor único o los valores separados por coma."""
+    if not valores:
+        return "Todos"
+    return ", ".join(str(v) for v in valores)
+
+def nombre_archivo_pdf(filtros, extension="pdf", prefijo="Reporte_Produccion"):
+    """Nombre del archivo según los filtros aplicados (Mes, Establecimiento y Año)."""
+    mes_pdf = str(filtros["Mes"]).replace(" ", "_")
+    ipress_pdf = str(filtros["Establecimiento"]).replace(" ", "_")
+    anio_pdf = str(filtros["Año"])
+    return f"{prefijo}_{ipress_pdf}_{mes_pdf}_{anio_pdf}.{extension}"
+
+def preparar_tabla_pdf(df_ranking, day_cols):
+    """
+    Columnas del PDF a partir del ranking con nombres y etiquetas (ver rankear_resumen):
+    Profesional, Profesión, Establecimiento, Atendidos, Atenciones, días (de '1.1' a '1') y TOTAL.
+    """
+    # Renombrar columnas de días en el DataFrame para el PDF (de 1.1 a 1, etc.)
+    df_for_pdf_pdf = df_ranking.copy()
+    for col in df_for_pdf_pdf.columns:
+        if re.fullmatch(r"(0?[1-9]|[12][0-9]|3[01])\.1", str(col)):
+            nuevo_nombre = col.split('.')[0]
+            df_for_pdf_pdf = df_for_pdf_pdf.rename(columns={col: nuevo_nombre})
+
+    # Columnas a incluir en el PDF: principales, días
+    pdf_cols_base = ["Profesional", "Profesión", "Establecimiento", "Atendidos", "Atenciones"]
+    # Usar el nombre interno correcto para "Atenciones" si fue re-etiquetada
+    if "Suma_Dias" in df_for_pdf_pdf.columns and "Atenciones" not in df_for_pdf_pdf.columns:
+         pdf_cols_base[-1] = "Suma_Dias"
+
+    # Obtener columnas de días renombradas (sin .1)
+    dias_renombrados_pdf = []
+    for col in day_cols:
+        if col in df_for_pdf_pdf.columns:
+            dias_renombrados_pdf.append(col.split('.')[0])
+        elif col.split('.')[0] in df_for_pdf_pdf.columns:
+            dias_renombrados_pdf.append(col.split('.')[0])
+
+    pdf_cols = [c for c in pdf_cols_base if c in df_for_pdf_pdf.columns] + [c for c in dias_renombrados_pdf if c in df_for_pdf_pdf.columns]
+    # Agregar la columna TOTAL al final
+    if 'TOTAL' in df_for_pdf_pdf.columns:
+        pdf_cols.append('TOTAL')
+
+    df_pdf_final = df_for_pdf_pdf[pdf_cols]
+
+    # Renombrar 'Suma_Dias' de vuelta a 'Atenciones' si fue usado
+    if 'Suma_Dias' in df_pdf_final.columns:
+        df_pdf_final = df_pdf_final.rename(columns={'Suma_Dias': 'Atenciones'})
+    return df_pdf_final
+
+def crear_pdf_profesional(df_tabla, filtros, logo_data):
+    """
+    Genera un reporte PDF profesional de la tabla de producción usando ReportLab.
+    
+    CORRECCIÓN: Se ajustan los anchos de columna dinámicamente, forzando un ancho 
+    mínimo para las columnas de días para que la tabla no se descuadre en A4 horizontal.
+    """
+    from reportlab.lib import colors
+    from reportlab.lib.pagesizes import A4, landscape
+    from reportlab.lib.styles import getSampleStyleSheet
+    from reportlab.lib.units import inch
+    from reportlab.platypus import Image, Paragraph, SimpleDocTemplate, Spacer, Table, TableStyle
+
+    buffer = BytesIO()
+    # Usar A4 en orientación horizontal para tablas grandes
+    doc = SimpleDocTemplate(buffer, pagesize=landscape(A4),
+                            leftMargin=0.5*inch, rightMargin=0.5*inch,
+                            topMargin=0.5*inch, bottomMargin=0.5*inch)
+    
+    styles = getSampleStyleSheet()
+    story = []
+
+    # --- TÍTULO PRINCIPAL Y LOGO ---
+    
+    # 1. Logo (si está disponible)
+    img = None
+    if logo_data:
+        # Reposicionar el puntero del BytesIO si se va a usar
+        logo_data.seek(0)
+        try:
+            # Crear Image desde BytesIO
+            img = Image(logo_data, width=0.75*inch, height=0.75*inch)
+        except Exception:
+            img = None
+    
+    # 2. Título basado en filtros
+    filtro_mes = filtros.get("Mes", "Todos")
+    filtro_ipress = filtros.get("Establecimiento", "Todas las IPRESS")
+    
+    titulo_texto = f"REPORTE GENERAL DE PRODUCCIÓN HIS"
+    subtitulo_texto = f"PERÍODO: {filtro_mes} | ESTABLECIMIENTO: {filtro_ipress} | AÑO: {filtros.get('Año', 'Todos')}"
+    
+    
+    # Estilos de títulos
+    style_h1 = styles['h1']
+    style_h1.alignment = 1 # Centro
+    style_h1.textColor = colors.HexColor('#003c8f') # Azul oscuro
+    style_h1.fontName = 'Helvetica-Bold'
+    style_h1.fontSize = 18
+    
+    style_sub = styles['h3']
+    style_sub.alignment = 1 # Centro
+    style_sub.textColor = colors.HexColor('#555555') 
+    style_sub.fontName = 'Helvetica'
+    style_sub.fontSize = 12
+
+    # Construir el encabezado con logo y texto (usando una tabla de 2 columnas)
+    titulo_main = Paragraph(titulo_texto, style_h1)
+    titulo_sub = Paragraph(subtitulo_texto, style_sub)
+    
+    # Crea una tabla para alinear el logo y el texto
+    ancho_pagina = landscape(A4)[0]
+    ancho_disponible = ancho_pagina - 1.0 * inch # Márgenes de 0.5" a cada lado
+
+    if img:
+        # Usamos una estructura de 2x2 para alinear el logo y el texto en el centro
+        header_data = [[img, titulo_main], ['', titulo_sub]]
+        # Ancho total: ~10.0 pulgadas. Logo: 1 pulgada, Texto: 9.0 pulgadas.
+        col_widths_header = [1.0 * inch, ancho_disponible - 1.0 * inch] 
+    else:
+        header_data = [[titulo_main], [titulo_sub]]
+        col_widths_header = [ancho_disponible]
+
+    header_table = Table(header_data, colWidths=col_widths_header)
+    
+    header_table.setStyle(TableStyle([
+        ('ALIGN', (0, 0), (-1, -1), 'CENTER'),
+        ('VALIGN', (0, 0), (-1, -1), 'MIDDLE'),
+        ('LEFTPADDING', (0, 0), (-1, -1), 0),
+        ('RIGHTPADDING', (0, 0), (-1, -1), 0),
+        ('TOPPADDING', (0, 0), (-1, -1), 0),
+        ('BOTTOMPADDING', (0, 0), (-1, -1), 0),
+    ]))
+    
+    story.append(header_table)
+    story.append(Spacer(1, 0.25*inch))
+    
+    # --- TABLA DE DATOS ---
+    
+    # Preparar datos para ReportLab
+    # df_tabla debe tener las columnas que se quieren mostrar
+    
+    # 1. Renombrar columnas de días en el DataFrame para el PDF
+    df_temp = df_tabla.copy()
+    
+    # Renombrar columnas de días de formato '1.1' a '1' para el PDF
+    for col in df_temp.columns:
+        if re.fullmatch(r"(0?[1-9]|[12][0-9]|3[01])\.1", str(col)):
+            nuevo_nombre = col.split('.')[0]
+            df_temp = df_temp.rename(columns={col: nuevo_nombre})
+    
+    # 2. Añadir columna ITEM (Index + 1)
+    df_temp = df_temp.reset_index().rename(columns={'index': 'ITEM'}).copy()
+    df_temp['ITEM'] = df_temp.index + 1
+    
+    # Reordenar para que ITEM sea la primera columna
+    cols_order = ['ITEM'] + [col for col in df_temp.columns if col != 'ITEM']
+    df_temp = df_temp[cols_order]
+
+    # Convertir a lista de listas para ReportLab
+    data = [df_temp.columns.tolist()] + df_temp.values.tolist()
+    
+    # 3. Convertir números a strings con formato de miles
+    for i in range(1, len(data)):
+        for j in range(len(data[i])):
+            val = data[i][j]
+            try:
+                # Asumiendo que las columnas numéricas relevantes son enteros (días, atendidos, atenciones)
+                if isinstance(val, (int, float)) and not pd.isna(val): 
+                    data[i][j] = f"{int(val):,}"
+                elif pd.isna(val):
+                    data[i][j] = ""
+            except:
+                pass
+
+    # Crear objeto Table
+    # Ancho total disponible (usando el mismo que para el encabezado)
+    table_width = ancho_disponible 
+
+    # Número total de columnas
+    num_cols = len(data[0]) 
+    
+    # Crear lista de anchos de columna dinámicamente
+    col_widths = []
+    
+    # Definir el número de columnas fijas de identificación (ITEM, Prof, Profesion, Estab, Atendidos, Atenciones)
+    NUM_FIXED_COLS = 6
+    
+    if num_cols >= NUM_FIXED_COLS:
+        # Anchos fijos optimizados para A4 paisaje (suman 5.7 pulgadas)
+        col_widths_fixed = [
+            0.3 * inch,  # ITEM
+            1.7 * inch,  # Profesional (REDUCIDO)
+            1.2 * inch,  # Profesión 
+            1.2 * inch,  # Establecimiento
+            0.7 * inch,  # Atendidos
+            0.6 * inch   # Atenciones
+        ]
+        col_widths.extend(col_widths_fixed)
+        
+        # Calcular ancho restante
+        remaining_width = table_width - sum(col_widths)
+        num_day_cols = num_cols - NUM_FIXED_COLS - 1  # Restar 1 para la columna TOTAL
+        
+        if num_day_cols > 0:
+            # Ancho mínimo para columnas de días (0.15 pulgadas = 10.8 puntos)
+            day_width_min = 0.15 * inch 
+            
+            # Usar el ancho mínimo si el espacio lo permite, sino dividir el espacio restante.
+            if num_day_cols * day_width_min > remaining_width:
+                 # Caso extremo: dividir el espacio restante entre las columnas de días
+                 day_width_final = remaining_width / num_day_cols
+            else:
+                 # Caso normal: usar el ancho mínimo para que las columnas de día sean estrechas
+                 day_width_final = day_width_min
+
+            # Asegurar que el ancho de la columna de día no sea negativo (si remaining_width fuera negativo)
+            if day_width_final < 0:
+                 day_width_final = 0.1 * inch
+
+            col_widths.extend([day_width_final] * num_day_cols)
+            
+        # Agregar ancho para la columna TOTAL (más ancha que las columnas de días)
+        col_widths.append(0.5 * inch)  # Columna TOTAL más ancha
+
+    # Crear la tabla
+    if not col_widths: 
+        return None
+        
+    # El ancho de la tabla será la suma de los anchos de columna calculados
+    pdf_table = Table(data, colWidths=col_widths)
+
+    # Definir estilos de tabla
+    style = TableStyle([
+        # Headers
+        ('BACKGROUND', (0, 0), (-2, 0), colors.HexColor('#003c8f')), # Azul oscuro para todas excepto TOTAL
+        ('TEXTCOLOR', (0, 0), (-2, 0), colors.white),
+        ('ALIGN', (0, 0), (-1, 0), 'CENTER'),
+        ('VALIGN', (0, 0), (-1, 0), 'MIDDLE'),
+        ('FONTNAME', (0, 0), (-1, 0), 'Helvetica-Bold'),
+        ('FONTSIZE', (0, 0), (-2, 0), 6), # Reducir tamaño de fuente en headers
+        ('FONTSIZE', (-1, 0), (-1, 0), 7), # Tamaño de fuente más grande para TOTAL header
+        ('BOTTOMPADDING', (0, 0), (-1, 0), 4),
+        ('GRID', (0, 0), (-1, -1), 0.5, colors.HexColor('#CCCCCC')),
+        ('LEFTPADDING', (0, 0), (-1, -1), 1),
+        ('RIGHTPADDING', (0, 0), (-1, -1), 1),
+        
+        # Body
+        ('FONTNAME', (0, 1), (-1, -1), 'Helvetica'),
+        ('FONTSIZE', (0, 1), (-2, -1), 5), # AÚN MÁS REDUCIDO: 5 puntos para las filas de datos
+        ('FONTSIZE', (-1, 1), (-1, -1), 6), # Tamaño de fuente más grande para datos de TOTAL
+        ('ALIGN', (0, 1), (0, -1), 'CENTER'), # ITEM (Index)
+        ('ALIGN', (1, 1), (1, -1), 'LEFT'), # PROFESIONAL
+        ('ALIGN', (2, 1), (-1, -1), 'CENTER'), # El resto
+        ('VALIGN', (0, 1), (-1, -1), 'MIDDLE'),
+        
+        # Columna de totales (ATENDIDOS y ATENCIONES) - Índices 4 y 5
+        ('BACKGROUND', (4, 1), (5, -1), colors.HexColor('#d4edda')), # Verde claro
+        ('TEXTCOLOR', (4, 1), (5, -1), colors.HexColor('#155724')), # Verde oscuro
+        ('FONTNAME', (4, 1), (5, -1), 'Helvetica-Bold'),
+        
+        # Columna TOTAL - aplicar un estilo especial
+        ('BACKGROUND', (-1, 0), (-1, 0), colors.HexColor('#ffc107')), # Amarillo para header de TOTAL
+        ('TEXTCOLOR', (-1, 0), (-1, 0), colors.HexColor('#856404')), # Marrón oscuro para texto
+        ('FONTNAME', (-1, 0), (-1, 0), 'Helvetica-Bold'),
+        ('BACKGROUND', (-1, 1), (-1, -1), colors.HexColor('#fff3cd')), # Amarillo claro para datos de TOTAL
+        ('TEXTCOLOR', (-1, 1), (-1, -1), colors.HexColor('#856404')), # Marrón oscuro para texto
+        ('FONTNAME', (-1, 1), (-1, -1), 'Helvetica-Bold'),
+    ])
+    
+    # --- FILAS RAYADAS ---
+    for i in range(1, len(data)):
+        if i % 2 == 0:
+            style.add('BACKGROUND', (0, i), (-2, i), colors.HexColor('#eef6ff')) # Excluir columna TOTAL
+
+    pdf_table.setStyle(style)
+    story.append(pdf_table)
+    
+    # --- FOOTER ---
+    story.append(Spacer(1, 0.25*inch))
+    fecha_reporte = datetime.now(ZoneInfo("America/Lima")).strftime("%d/%m/%Y %H:%M:%S")
+    footer_text = f"Generado el: {fecha_reporte} (Perú). | Fuente de Datos: HISMINSA. | Este reporte incluye {len(df_tabla)} profesionales."
+    
+    style_footer = styles['Normal']
+    style_footer.alignment = 1 # Centro
+    style_footer.textColor = colors.HexColor('#6c757d')
+    style_footer.fontSize = 8
+    
+    story.append(Paragraph(footer_text, style_footer))
+    
+    # --- CONSTRUIR DOCUMENTO ---
+    # Los errores de ReportLab se propagan: el tablero los muestra y la generación por lotes los anota
+    doc.build(story)
+    buffer.seek(0)
+    return buffer
@@ -0,0 +1,196 @@
+# ============================================================
+#  SERVICIO HTTP DE AGREGACIÓN DEL TABLERO
+# ============================================================
+# Uso:
+#   python servicio_api.py [--datos CONSOLIDADO.xlsx] [--host 127.0.0.1] [--puerto 8502] [--motor pandas]
+#
+# Expone el filtrado, el ranking por profesional y la tendencia diaria (consultas_his.py) como un
+# servicio HTTP local, para reutilizarlos desde otros consumidores. El tablero lo usa como motor
+# remoto opcional del resumen y la tendencia si se define TABLERO_API_URL (por ejemplo
+# http://127.0.0.1:8502); sin esa variable, o si el servicio no responde, los calcula en su propio
+# proceso. El resto de la página (filtros, alertas, comparación, indicadores, calidad y descargas)
+# se arma siempre con las filas cargadas en el tablero.
+#
+# Recursos (GET):
+#   /version     versión de los datos que se sirven
+#   /resumen     ranking: ids, totales de las medidas, días de la medida elegida y TOTAL
+#   /tendencia   serie diaria de la medida elegida
+# Parámetros: anio, mes, id_establecimiento_x, id_profesion, id_personal (se pueden repetir; sin
+# valores = todos), medida (por defecto Atenciones), motor, top y nombres=1 (solo /resumen), y
+# formato=json|arrow (por defecto json; Arrow IPC en formato stream si se pide o si Accept lo indica).
+
+import argparse
+import json
+import sys
+from functools import lru_cache
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from io import BytesIO
+from urllib.parse import parse_qs, urlencode, urlsplit
+from urllib.request import urlopen
+
+from consultas_his import (
+    MOTORES_CONSULTA, agregar_nombres, alcance_anios, calcular_resumen, calcular_tendencia, columnas_dias_resumen,
+    construir_cubo_medidas, construir_dimensiones, construir_indices_filtros, rankear_resumen
+)
+from datos_his import MEDIDAS_DIARIAS, calcular_version_datos
+
+TIPO_ARROW = "application/vnd.apache.arrow.stream"
+TIPO_JSON = "application/json"
+
+# Dimensiones que se pueden filtrar por parámetro (mismas claves que las selecciones del tablero)
+PARAMETROS_FILTRO = ["anio", "mes", "id_establecimiento_x", "id_profesion", "id_personal"]
+
+# ============================================================
+#  CODIFICACIÓN DE CONSULTAS Y RESPUESTAS
+# ============================================================
+
+def parametros_consulta(selecciones, filtro_medida, motor=None):
+    """Lista de pares (nombre, valor) para la URL; cada valor elegido de una dimensión es un parámetro."""
+    parametros = [(col, int(v)) for col in PARAMETROS_FILTRO for v in selecciones.get(col, [])]
+    parametros.append(("medida", filtro_medida))
+    if motor:
+        parametros.append(("motor", motor))
+    return parametros
+
+def leer_consulta(consulta):
+    """Selecciones, medida, motor, top y nombres a partir de la query string. Lanza ValueError si no es válida."""
+    valores = parse_qs(consulta)
+    selecciones = {col: sorted({int(v) for v in valores.get(col, [])}) for col in PARAMETROS_FILTRO}
+    medida = valores.get("medida", ["Atenciones"])[0]
+    if medida not in MEDIDAS_DIARIAS:
+        raise ValueError(f"Medida desconocida: {medida}")
+    motor = valores.get("motor", [None])[0]
+    if motor is not None and motor not in MOTORES_CONSULTA:
+        raise ValueError(f"Motor desconocido: {motor}")
+    top = int(valores["top"][0]) if "top" in valores else None
+    nombres = valores.get("nombres", ["0"])[0] in ("1", "true", "si")
+    formato = valores.get("formato", [None])[0]
+    return selecciones, medida, motor, top, nombres, formato
+
+def serializar(frame, formato):
+    """(cuerpo, tipo de contenido): Arrow IPC stream, o JSON compacto por columnas ('split')."""
+    if formato == "arrow":
+        import pyarrow as pa
+
+        tabla = pa.Table.from_pandas(frame, preserve_index=False)
+        salida = BytesIO()
+        with pa.ipc.new_stream(salida, tabla.schema) as escritor:
+            escritor.write_table(tabla)
+        return salida.getvalue(), TIPO_ARROW
+    return frame.to_json(orient="split", index=False).encode("utf-8"), TIPO_JSON
+
+# ============================================================
+#  CÓMPUTO (CACHEADO EN EL SERVIDOR)
+# ============================================================
+
+@lru_cache(maxsize=256)
+def responder(recurso, path, version, clave, medida, motor, top, nombres, formato):
+    """
+    Respuesta serializada de un recurso. La versión de datos es parte de la clave, así que una
+    ingesta o un archivo nuevo invalidan las respuestas cacheadas sin tener que vaciar la caché.
+    """
+    selecciones = {col: list(valores) for col, valores in clave}
+    if recurso == "tendencia":
+        return serializar(calcular_tendencia(selecciones, medida, path, version), formato)
+
+    _, _, dias_presentes = construir_cubo_medidas(path, version, alcance_anios(selecciones))
+    resumen = rankear_resumen(
+        calcular_resumen(selecciones, medida, motor, path, version), medida,
+        columnas_dias_resumen(medida, dias_presentes)
+    )
+    if top is not None:
+        resumen = resumen.head(top)
+    if nombres:
+        resumen = agregar_nombres(resumen, construir_dimensiones(path, version)[0])
+    return serializar(resumen, formato)
+
+class ManejadorConsultas(BaseHTTPRequestHandler):
+    """Atiende GET /version, /resumen y /tendencia; el servidor guarda la ruta de datos y el motor."""
+
+    def do_GET(self):
+        partes = urlsplit(self.path)
+        recurso = partes.path.strip("/")
+        version = calcular_version_datos(self.server.datos) or "ejemplo"
+        if recurso == "version":
+            return self.enviar(200, json.dumps({"version": version}).encode("utf-8"), TIPO_JSON)
+        if recurso not in ("resumen", "tendencia"):
+            return self.enviar_error(404, f"Recurso desconocido: /{recurso}")
+
+        try:
+            selecciones, medida, motor, top, nombres, formato = leer_consulta(partes.query)
+        except ValueError as e:
+            return self.enviar_error(400, str(e))
+        if formato is None:
+            formato = "arrow" if TIPO_ARROW in self.headers.get("Accept", "") else "json"
+
+        clave = tuple((col, tuple(valores)) for col, valores in selecciones.items())
+        try:
+            cuerpo, tipo = responder(
+                recurso, self.server.datos, version, clave, medida, motor or self.server.motor, top, nombres, formato
+            )
+        except Exception as e:
+            # Un error de cómputo se responde como 500: sin esto el hilo muere sin enviar respuesta
+            self.log_error("Error al calcular /%s: %s: %s", recurso, type(e).__name__, e)
+            return self.enviar_error(500, f"{type(e).__name__}: {e}")
+        self.enviar(200, cuerpo, tipo)
+
+    def enviar(self, estado, cuerpo, tipo):
+        self.send_response(estado)
+        self.send_header("Content-Type", tipo)
+        self.send_header("Content-Length", str(len(cuerpo)))
+        self.end_headers()
+        self.wfile.write(cuerpo)
+
+    def enviar_error(self, estado, mensaje):
+        self.enviar(estado, json.dumps({"error": mensaje}).encode("utf-8"), TIPO_JSON)
+
+def crear_servidor(datos="CONSOLIDADO.xlsx", host="127.0.0.1", puerto=8502, motor="pandas"):
+    """Servidor multihilo listo para serve_forever(); los recursos por versión se comparten entre hilos."""
+    servidor = ThreadingHTTPServer((host, puerto), ManejadorConsultas)
+    servidor.datos = datos
+    servidor.motor = motor
+    return servidor
+
+# ============================================================
+#  CLIENTE (USADO POR EL TABLERO)
+# ============================================================
+
+def consultar_servicio(url_base, recurso, selecciones, filtro_medida, motor=None, tiempo_espera=30):
+    """
+    DataFrame de un recurso del servicio, pedido en Arrow. Lanza OSError (URLError, HTTPError,
+    conexión rechazada o tiempo agotado) si el servicio no responde, para que quien llama calcule localmente.
+    """
+    import pyarrow as pa
+
+    parametros = parametros_consulta(selecciones, filtro_medida, motor) + [("formato", "arrow")]
+    url = f"{url_base.rstrip('/')}/{recurso}?{urlencode(parametros)}"
+    with urlopen(url, timeout=tiempo_espera) as respuesta:
+        return pa.ipc.open_stream(respuesta.read()).read_all().to_pandas()
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Servicio HTTP de agregación del tablero HIS.")
+    parser.add_argument("--datos", default="CONSOLIDADO.xlsx", help="Archivo de datos (por defecto: CONSOLIDADO.xlsx)")
+    parser.add_argument("--host", default="127.0.0.1", help="Dirección de escucha (por defecto: 127.0.0.1)")
+    parser.add_argument("--puerto", type=int, default=8502, help="Puerto (por defecto: 8502)")
+    parser.add_argument("--motor", choices=MOTORES_CONSULTA, default="pandas",
+                        help="Motor del resumen cuando la consulta no indica uno (por defecto: pandas)")
+    args = parser.parse_args(argv)
+
+    # Se arman los recursos de la versión actual (todos los años) antes de aceptar consultas
+    version = calcular_version_datos(args.datos) or "ejemplo"
+    construir_cubo_medidas(args.datos, version)
+    construir_indices_filtros(args.datos, version)
+
+    servidor = crear_servidor(args.datos, args.host, args.puerto, args.motor)
+    print(f"Servicio de agregación en http://{args.host}:{args.puerto} (datos: {args.datos}, versión {version})")
+    try:
+        servidor.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        servidor.server_close()
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
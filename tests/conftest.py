@@ -0,0 +1,14 @@
+import pytest
+
+from datos_his import datos_ejemplo
+
+
+@pytest.fixture
+def datos_tmp(tmp_path):
+    """
+    Archivo de datos en una carpeta temporal (los datos de ejemplo, en Parquet): el almacenamiento
+    particionado y la base SQL se arman junto a él, sin tocar los del repositorio.
+    """
+    path = tmp_path / "CONSOLIDADO.parquet"
+    datos_ejemplo().drop(columns="filas_origen").to_parquet(path)
+    return path
@@ -0,0 +1,51 @@
+import numpy as np
+
+from alertas_his import ALERTA_CERO, ALERTA_FUERA_MES, ALERTA_PICO, marcar_anomalias
+
+# Enero de 2024 empieza en lunes: los días 6-7, 13-14, 20-21 y 27-28 son fin de semana
+N_DIAS = 31
+
+
+def serie(valor, **dias):
+    """Serie de 31 días con 'valor' en todos, salvo los días indicados como d<n>=valor."""
+    x = np.full(N_DIAS, valor, dtype=np.uint16)
+    for dia, v in dias.items():
+        x[int(dia[1:]) - 1] = v
+    return x
+
+
+def cubo_sintetico():
+    filas = [
+        serie(5, d8=20),                                  # 0: pico claro
+        serie(5, d8=12),                                  # 1: subida menor al piso relativo del desvío
+        serie(6, d8=0),                                   # 2: cero un lunes entre días activos
+        serie(6, d13=0),                                  # 3: cero un sábado
+        np.array([10 if d % 2 == 0 else 0 for d in range(N_DIAS)], dtype=np.uint16),  # 4: día por medio
+        serie(0, d30=3),                                  # 5: febrero con producción el día 30
+    ]
+    filas[4][14] = 40  # pico en una serie sin línea base suficiente
+    cubo = np.zeros((len(filas), 2, N_DIAS), dtype=np.uint16)
+    cubo[:, 0, :] = np.stack(filas)
+    return cubo
+
+
+def test_marca_solo_las_anomalias_esperadas():
+    alertas, lista = marcar_anomalias(cubo_sintetico(), anios=[2024] * 6, meses=[1, 1, 1, 1, 1, 2])
+
+    marcadas = {(int(f), int(m), int(d) + 1, int(alertas[f, m, d])) for f, m, d in zip(*np.nonzero(alertas))}
+    assert marcadas == {
+        (0, 0, 8, ALERTA_PICO),
+        (2, 0, 8, ALERTA_CERO),
+        (5, 0, 30, ALERTA_FUERA_MES),
+    }
+    assert sorted(zip(lista["fila"], lista["Día"], lista["Tipo"])) == [
+        (0, 8, "Pico inusual"), (2, 8, "Cero súbito"), (5, 30, "Día fuera del mes"),
+    ]
+    assert lista.set_index("fila").loc[0, "Línea Base"] == 5.0
+
+
+def test_sin_periodo_asume_meses_de_31_dias():
+    alertas, lista = marcar_anomalias(cubo_sintetico())
+    # Sin año y mes no hay días fuera del mes, y el día 30 de la fila 5 no es una alerta
+    assert not (alertas & ALERTA_FUERA_MES).any()
+    assert set(lista["fila"]) == {0, 2}
@@ -0,0 +1,12 @@
+from pathlib import Path
+
+from perfil_arranque import medir_arranque
+
+RAIZ = Path(__file__).resolve().parent.parent
+
+
+def test_primera_ejecucion_dentro_del_presupuesto():
+    # En frío (copia sin almacenamiento) y con el almacenamiento armado, cada una con su presupuesto
+    medicion = medir_arranque(str(RAIZ / "app.py"))
+    assert medicion["problemas"] == []
+    assert medicion["frio"]["segundos_primera_ejecucion"] > 0
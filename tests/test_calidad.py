@@ -0,0 +1,62 @@
+import pandas as pd
+
+from datos_his import validar_calidad
+
+REGLA_TOTAL = "total.1 ≠ suma de días (Atenciones)"
+REGLA_FUERA_MES = "Producción en días fuera del mes (Atenciones)"
+REGLA_NEGATIVOS = "Conteos negativos"
+REGLA_ESTABLECIMIENTO = "id_establecimiento_x ≠ id_establecimiento_y"
+
+
+def extracto():
+    """Seis filas de febrero: la 0 y la 5 (año bisiesto, día 29) son correctas, las demás rompen una regla cada una."""
+    df = pd.DataFrame({
+        "anio": [2025, 2025, 2025, 2025, 2025, 2024],
+        "mes": [2] * 6,
+        "id_establecimiento_x": [10] * 6,
+        "id_establecimiento_y": [10, 10, 10, 10, 11, 10],
+    })
+    for d in range(1, 32):
+        df[f"{d}.1"] = 0
+    df["1.1"] = [2, 2, -1, 2, 2, 2]
+    df["2.1"] = 3
+    df.loc[3, "30.1"] = 4
+    df.loc[5, "29.1"] = 1
+    df["total.1"] = [5, 9, 2, 9, 5, 6]
+    return df
+
+
+def test_cada_regla_marca_su_fila():
+    resumen, detalle = validar_calidad(extracto())
+
+    assert detalle.index.equals(extracto().index)
+    esperado = {
+        REGLA_TOTAL: [1],
+        REGLA_NEGATIVOS: [2],
+        REGLA_FUERA_MES: [3],
+        REGLA_ESTABLECIMIENTO: [4],
+    }
+    for regla, filas in esperado.items():
+        assert detalle.index[detalle[regla]].tolist() == filas, regla
+    assert not detalle.loc[[0, 5]].any(axis=None)
+
+    conteo = resumen.set_index("Regla")["Filas Observadas"]
+    assert conteo[REGLA_TOTAL] == 1
+    assert resumen.set_index("Regla").loc[REGLA_TOTAL, "% Filas"] == round(100 / 6, 2)
+
+
+def test_total_negativo_cuenta_como_conteo_negativo():
+    df = extracto().iloc[[0]].copy()
+    df["1.1"] = -8
+    df["total.1"] = -5
+    _, detalle = validar_calidad(df)
+    assert detalle[REGLA_NEGATIVOS].tolist() == [True]
+    assert detalle[REGLA_TOTAL].tolist() == [False]
+
+
+def test_reglas_segun_columnas_presentes():
+    df = extracto().drop(columns=["id_establecimiento_y", "total.1"])
+    resumen, detalle = validar_calidad(df)
+    assert REGLA_ESTABLECIMIENTO not in detalle.columns
+    assert REGLA_TOTAL not in detalle.columns
+    assert resumen["Regla"].tolist() == [REGLA_FUERA_MES, REGLA_NEGATIVOS]
@@ -0,0 +1,53 @@
+import pandas as pd
+
+from datos_his import CLAVES_REGISTRO, consolidar_duplicados
+
+
+def extracto():
+    return pd.DataFrame({
+        "id_personal": [1, 2, 1, 3, 2, 1],
+        "anio": [2025] * 6,
+        "mes": [3] * 6,
+        "id_establecimiento_x": [10, 10, 10, 10, 10, 11],
+        "nombres_profesional": ["A", "B", "A (repetido)", "C", "B (repetido)", "A"],
+        "1.1": [1, 2, 3, 4, 5, 6],
+        "2.1": [0, 1, 1, 0, 2, 0],
+        "total.1": [1, 3, 4, 4, 7, 6],
+    })
+
+
+def test_fusiona_repetidas_sumando_conteos():
+    df = consolidar_duplicados(extracto())
+
+    assert not df.duplicated(CLAVES_REGISTRO).any()
+    # Orden de primera aparición: (1,10), (2,10), (3,10), (1,11)
+    assert df["id_personal"].tolist() == [1, 2, 3, 1]
+    assert df["id_establecimiento_x"].tolist() == [10, 10, 10, 11]
+    assert df["1.1"].tolist() == [4, 7, 4, 6]
+    assert df["2.1"].tolist() == [1, 3, 0, 0]
+    assert df["total.1"].tolist() == [5, 10, 4, 6]
+    # Las columnas que no son conteos conservan el primer valor
+    assert df["nombres_profesional"].tolist() == ["A", "B", "C", "A"]
+    assert df["filas_origen"].tolist() == [2, 2, 1, 1]
+
+
+def test_conserva_el_total_del_archivo():
+    origen = extracto()
+    df = consolidar_duplicados(origen)
+    for col in ["1.1", "2.1", "total.1"]:
+        assert df[col].sum() == origen[col].sum()
+    assert df["filas_origen"].sum() == len(origen)
+
+
+def test_sin_repetidas_no_cambia_las_filas():
+    origen = extracto().drop_duplicates(CLAVES_REGISTRO).reset_index(drop=True)
+    df = consolidar_duplicados(origen)
+    pd.testing.assert_frame_equal(df.drop(columns="filas_origen"), origen)
+    assert (df["filas_origen"] == 1).all()
+
+
+def test_sin_columnas_clave_no_fusiona():
+    origen = extracto().drop(columns="id_personal")
+    df = consolidar_duplicados(origen)
+    assert len(df) == len(origen)
+    assert (df["filas_origen"] == 1).all()
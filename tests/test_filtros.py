@@ -0,0 +1,54 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from consultas_his import resolver_filtros
+
+DF = pd.DataFrame({
+    "anio": [2024, 2024, 2024, 2025, 2025, 2025, 2025, 2024],
+    "mes": [9, 10, 10, 1, 1, 2, 10, 9],
+    "id_establecimiento_x": [1, 1, 2, 2, 3, 1, 2, 3],
+    "id_personal": [10, 11, 10, 12, 11, 10, 12, 13],
+})
+
+
+def indices_de(df):
+    """Índices valor -> posiciones, como los arma construir_indices_filtros."""
+    return {
+        col: {valor: np.asarray(pos, dtype=np.int64) for valor, pos in df.groupby(col, sort=False).indices.items()}
+        for col in df.columns
+    }
+
+
+def por_mascara(df, selecciones):
+    mascara = np.ones(len(df), dtype=bool)
+    for col, valores in selecciones.items():
+        if valores:
+            mascara &= df[col].isin(valores).to_numpy()
+    return np.flatnonzero(mascara)
+
+
+@pytest.mark.parametrize("selecciones", [
+    {},
+    {"anio": [], "mes": []},
+    {"anio": [2024]},
+    {"anio": [2024], "mes": [10]},
+    {"mes": [9, 10], "id_establecimiento_x": [1, 3]},
+    {"anio": [2024, 2025], "id_personal": [10]},
+    {"anio": [2025], "mes": [9]},
+    {"id_personal": [99]},
+    {"id_personal": [10, 99]},
+])
+def test_igual_a_filtrar_con_mascaras(selecciones):
+    posiciones = resolver_filtros(indices_de(DF), selecciones, len(DF))
+    np.testing.assert_array_equal(posiciones, por_mascara(DF, selecciones))
+
+
+def test_sin_filtros_devuelve_todas_las_filas_en_orden():
+    np.testing.assert_array_equal(resolver_filtros(indices_de(DF), {}, len(DF)), np.arange(len(DF)))
+
+
+def test_ignora_dimensiones_sin_indice():
+    indices = indices_de(DF[["anio", "mes"]])
+    posiciones = resolver_filtros(indices, {"anio": [2025], "id_profesion": [7]}, len(DF))
+    np.testing.assert_array_equal(posiciones, [3, 4, 5, 6])
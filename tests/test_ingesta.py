@@ -0,0 +1,105 @@
+import pandas as pd
+import pytest
+
+from datos_his import (
+    calcular_version_datos, cargar_consolidado, datos_ejemplo, leer_manifiesto, listar_particiones,
+    raiz_particiones, validar_estructura,
+)
+from ingesta import main
+
+
+@pytest.fixture
+def extracto(tmp_path):
+    """Extracto mensual de 2025-01 armado con las filas de noviembre de los datos de ejemplo."""
+    df = datos_ejemplo().drop(columns="filas_origen")
+    df = df[df["mes"] == 11].assign(anio=2025, mes=1).reset_index(drop=True)
+    path = tmp_path / "EXTRACTO_2025_01.parquet"
+    df.to_parquet(path)
+    return path, df
+
+
+def test_ingesta_agrega_una_particion(datos_tmp, extracto, capsys):
+    path, df = extracto
+    version = calcular_version_datos(datos_tmp)
+
+    assert main([str(path), "--datos", str(datos_tmp)]) == 0
+    assert "Período 2025-01 ingerido" in capsys.readouterr().out
+
+    raiz = raiz_particiones(datos_tmp)
+    manifiesto = leer_manifiesto(raiz)
+    assert manifiesto["generacion"] == 1
+    assert manifiesto["periodos"]["2025-01"] == {"filas": len(df), "origen": str(path)}
+    assert manifiesto["ultima_ingesta"] is not None
+    assert len(listar_particiones(raiz, anios=[2025])) == 1
+    assert calcular_version_datos(datos_tmp) != version
+
+    ingerido = cargar_consolidado(datos_tmp, anios=[2025])
+    assert len(ingerido) == len(df)
+    assert ingerido["total.1"].sum() == df["total.1"].sum()
+    # Los períodos del archivo de origen siguen ahí
+    assert len(cargar_consolidado(datos_tmp, anios=[2024])) == len(datos_ejemplo())
+
+
+def test_periodo_existente_requiere_reemplazar(datos_tmp, extracto, capsys):
+    path, df = extracto
+    assert main([str(path), "--datos", str(datos_tmp)]) == 0
+
+    assert main([str(path), "--datos", str(datos_tmp)]) == 1
+    assert "2025-01 ya existe" in capsys.readouterr().err
+    assert leer_manifiesto(raiz_particiones(datos_tmp))["generacion"] == 1
+
+    assert main([str(path), "--datos", str(datos_tmp), "--reemplazar"]) == 0
+    assert leer_manifiesto(raiz_particiones(datos_tmp))["generacion"] == 2
+    assert len(cargar_consolidado(datos_tmp, anios=[2025])) == len(df)
+
+
+def test_resincronizar_el_origen_conserva_lo_ingerido(datos_tmp, extracto):
+    path, df = extracto
+    assert main([str(path), "--datos", str(datos_tmp)]) == 0
+
+    # El consolidado de origen cambia (ahora solo trae octubre): se quita noviembre, no lo ingerido
+    origen = pd.read_parquet(datos_tmp)
+    origen[origen["mes"] == 10].to_parquet(datos_tmp)
+    periodos = set(leer_manifiesto(raiz_particiones(datos_tmp))["periodos"])
+    cargar_consolidado(datos_tmp)
+    manifiesto = leer_manifiesto(raiz_particiones(datos_tmp))
+    assert periodos == {"2024-10", "2024-11", "2025-01"}
+    assert set(manifiesto["periodos"]) == {"2024-10", "2025-01"}
+    assert len(cargar_consolidado(datos_tmp, anios=[2025])) == len(df)
+
+
+def test_estricto_rechaza_observaciones_de_calidad(datos_tmp, extracto, capsys):
+    path, _ = extracto
+    assert main([str(path), "--datos", str(datos_tmp), "--estricto"]) == 1
+    assert "--estricto" in capsys.readouterr().err
+    assert "2025-01" not in (leer_manifiesto(raiz_particiones(datos_tmp)) or {"periodos": {}})["periodos"]
+
+
+def test_validar_estructura(extracto):
+    _, df = extracto
+    assert validar_estructura(df) == []
+
+    errores = validar_estructura(df.drop(columns=["id_profesion", "profesional"]))
+    assert errores == ["Faltan columnas: id_profesion, profesional"]
+
+    sin_medidas = df.drop(columns=[c for c in df.columns if c.endswith(".1") or c.startswith("atendidos_")])
+    assert any("producción diaria" in e for e in validar_estructura(sin_medidas))
+
+    dos_periodos = df.copy()
+    dos_periodos.loc[0, "mes"] = 2
+    assert validar_estructura(dos_periodos) == [
+        "El extracto debe contener un solo período (anio, mes); contiene 2."
+    ]
+
+    con_nulos = df.astype({"id_personal": "float"})
+    con_nulos.loc[0, "id_personal"] = None
+    assert validar_estructura(con_nulos) == ["Hay valores vacíos en: id_personal"]
+
+
+def test_estructura_invalida_no_se_ingiere(datos_tmp, extracto, tmp_path, capsys):
+    _, df = extracto
+    path = tmp_path / "EXTRACTO_MAL.parquet"
+    df.drop(columns="id_profesion").to_parquet(path)
+    assert main([str(path), "--datos", str(datos_tmp)]) == 1
+    assert "ERROR: Faltan columnas: id_profesion" in capsys.readouterr().err
+    assert leer_manifiesto(raiz_particiones(datos_tmp)) is None
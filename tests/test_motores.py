@@ -0,0 +1,47 @@
+import pandas as pd
+import pytest
+
+from consultas_his import MOTORES_CONSULTA, cargar_datos, calcular_resumen
+from datos_his import calcular_version_datos, datos_ejemplo, ingerir_periodo
+from verificar_motores import casos_verificacion, normalizar
+
+
+def comparar_motores(path, version, medida="Atenciones"):
+    for nombre, selecciones in casos_verificacion(cargar_datos(path, version)):
+        referencia = normalizar(calcular_resumen(selecciones, medida, "pandas", path, version))
+        for motor in MOTORES_CONSULTA[1:]:
+            resumen = normalizar(calcular_resumen(selecciones, medida, motor, path, version))
+            pd.testing.assert_frame_equal(resumen, referencia, check_dtype=False, obj=f"{nombre} / {motor}")
+
+
+def test_motores_coinciden_con_datos_de_ejemplo(tmp_path):
+    comparar_motores(tmp_path / "no_existe.xlsx", "ejemplo")
+
+
+def test_motores_coinciden_sobre_el_almacenamiento(datos_tmp):
+    # Un período ingerido sin el día 31: las particiones no tienen todas las mismas columnas
+    extracto = datos_ejemplo().drop(columns=["filas_origen", "31.1"])
+    extracto = extracto[extracto["mes"] == 11].assign(anio=2025, mes=2)
+    ingerir_periodo(extracto, datos_tmp)
+
+    version = calcular_version_datos(datos_tmp)
+    comparar_motores(datos_tmp, version)
+    for selecciones in [{"anio": [2025]}, {"anio": [2024, 2025], "mes": [2, 10]}]:
+        referencia = normalizar(calcular_resumen(selecciones, "Atenciones", "pandas", datos_tmp, version))
+        assert len(referencia) > 0
+        for motor in MOTORES_CONSULTA[1:]:
+            resumen = normalizar(calcular_resumen(selecciones, "Atenciones", motor, datos_tmp, version))
+            pd.testing.assert_frame_equal(resumen, referencia, check_dtype=False)
+
+
+def test_base_sql_bloqueada_usa_el_motor_pandas(datos_tmp):
+    duckdb = pytest.importorskip("duckdb")
+    version = calcular_version_datos(datos_tmp)
+    # Otro proceso (o una versión anterior del tablero) con la base abierta para escritura
+    bloqueo = duckdb.connect(str(datos_tmp.with_suffix(".duckdb")))
+    try:
+        resumen = calcular_resumen({}, "Atenciones", "sql", datos_tmp, version)
+    finally:
+        bloqueo.close()
+    referencia = calcular_resumen({}, "Atenciones", "pandas", datos_tmp, version)
+    pd.testing.assert_frame_equal(normalizar(resumen), normalizar(referencia), check_dtype=False)
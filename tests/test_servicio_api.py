@@ -0,0 +1,87 @@
+import json
+import threading
+from urllib.error import HTTPError
+from urllib.request import urlopen
+
+import pandas as pd
+import pytest
+
+import servicio_api
+from consultas_his import ETIQUETAS_RESUMEN, calcular_resumen
+from datos_his import calcular_version_datos
+from servicio_api import consultar_servicio, crear_servidor
+from verificar_motores import normalizar
+
+
+@pytest.fixture
+def servicio(datos_tmp):
+    """Servicio en un puerto libre, sirviendo los datos de la carpeta temporal; devuelve su URL base."""
+    servidor = crear_servidor(str(datos_tmp), puerto=0)
+    hilo = threading.Thread(target=servidor.serve_forever, daemon=True)
+    hilo.start()
+    yield f"http://127.0.0.1:{servidor.server_address[1]}"
+    servidor.shutdown()
+    servidor.server_close()
+    hilo.join()
+
+
+def pedir(url):
+    """(estado, cuerpo JSON) de un GET, también para las respuestas de error."""
+    try:
+        with urlopen(url, timeout=30) as respuesta:
+            return respuesta.status, json.loads(respuesta.read())
+    except HTTPError as e:
+        with e:
+            return e.code, json.loads(e.read())
+
+
+def test_version(servicio, datos_tmp):
+    assert pedir(f"{servicio}/version") == (200, {"version": calcular_version_datos(datos_tmp)})
+
+
+def test_resumen_coincide_con_el_calculo_local(servicio, datos_tmp):
+    selecciones = {"mes": [10]}
+    remoto = consultar_servicio(servicio, "resumen", selecciones, "Atenciones")
+    local = calcular_resumen(selecciones, "Atenciones", "pandas", datos_tmp, calcular_version_datos(datos_tmp))
+    local = local.rename(columns=ETIQUETAS_RESUMEN)
+    columnas = ["id_establecimiento_x", "id_profesion", "id_personal", ETIQUETAS_RESUMEN["total.1"]]
+    pd.testing.assert_frame_equal(
+        normalizar(remoto[columnas]), normalizar(local[columnas]), check_dtype=False
+    )
+
+    estado, cuerpo = pedir(f"{servicio}/resumen?mes=10&top=3&nombres=1")
+    assert estado == 200
+    assert len(cuerpo["data"]) == 3
+    assert "nombres_profesional" in cuerpo["columns"]
+
+
+def test_recurso_desconocido_es_404(servicio):
+    estado, cuerpo = pedir(f"{servicio}/ranking")
+    assert estado == 404
+    assert cuerpo == {"error": "Recurso desconocido: /ranking"}
+
+
+@pytest.mark.parametrize("consulta, mensaje", [
+    ("motor=spark", "Motor desconocido: spark"),
+    ("medida=Consultas", "Medida desconocida: Consultas"),
+    ("anio=dos-mil", "invalid literal"),
+    ("top=diez", "invalid literal"),
+])
+def test_parametros_invalidos_son_400(servicio, consulta, mensaje):
+    estado, cuerpo = pedir(f"{servicio}/resumen?{consulta}")
+    assert estado == 400
+    assert mensaje in cuerpo["error"]
+
+
+def test_error_de_calculo_es_500(servicio, monkeypatch):
+    def fallar(*args, **kwargs):
+        raise RuntimeError("motor sin memoria")
+
+    monkeypatch.setattr(servicio_api, "calcular_resumen", fallar)
+    # Una consulta que no esté en la caché de respuestas del servidor
+    estado, cuerpo = pedir(f"{servicio}/resumen?mes=11&top=7")
+    assert estado == 500
+    assert cuerpo == {"error": "RuntimeError: motor sin memoria"}
+
+    # El servidor sigue atendiendo después del error
+    assert pedir(f"{servicio}/version")[0] == 200
@@ -0,0 +1,70 @@
+import re
+import zipfile
+
+import pandas as pd
+import pytest
+
+from datos_his import leer_excel_his
+from xlsx_paralelo import leer_libro_paralelo
+
+HOJA = "xl/worksheets/sheet1.xml"
+
+
+@pytest.fixture
+def libro(tmp_path):
+    df = pd.DataFrame({
+        "anio": [2025, 2025, 2025],
+        "mes": [1, 1, 1],
+        "nombre_establecimiento": ["IPRESS A", "IPRESS B", "IPRESS A"],
+        "1.1": [3, 0, 7],
+        "total.1": [3.5, 0.0, 7.25],
+    })
+    path = tmp_path / "libro.xlsx"
+    df.to_excel(path, index=False)
+    return path, df
+
+
+def reescribir_hoja(origen, destino, cambio):
+    """Copia el libro aplicando `cambio` al XML de la primera hoja."""
+    with zipfile.ZipFile(origen) as zin, zipfile.ZipFile(destino, "w", zipfile.ZIP_DEFLATED) as zout:
+        for item in zin.infolist():
+            contenido = zin.read(item.filename)
+            if item.filename == HOJA:
+                contenido = cambio(contenido.decode("utf-8")).encode("utf-8")
+            zout.writestr(item, contenido)
+    return destino
+
+
+def con_prefijo(xml):
+    """Mismo contenido con el espacio de nombres principal como prefijo: <x:worksheet>, <x:row>..."""
+    xml = re.sub(r"<(/?)(?!\?)([a-zA-Z]+)", r"<\1x:\2", xml)
+    return xml.replace('xmlns="', 'xmlns:x="', 1)
+
+
+def test_lector_paralelo_coincide_con_openpyxl(libro):
+    path, df = libro
+    hoja = leer_libro_paralelo(path, procesos=1)["Sheet1"]
+    pd.testing.assert_frame_equal(hoja, df, check_dtype=False)
+    pd.testing.assert_frame_equal(leer_excel_his(path), pd.read_excel(path, engine="openpyxl"), check_dtype=False)
+
+
+def test_hoja_con_prefijo_usa_openpyxl(libro, tmp_path):
+    path, df = libro
+    prefijado = reescribir_hoja(path, tmp_path / "prefijo.xlsx", con_prefijo)
+
+    with pytest.raises(ValueError):
+        leer_libro_paralelo(prefijado, procesos=1)
+    pd.testing.assert_frame_equal(leer_excel_his(prefijado), df, check_dtype=False)
+
+
+def test_hoja_en_otro_espacio_de_nombres_no_devuelve_tabla_vacia(libro, tmp_path):
+    path, _ = libro
+    estricto = reescribir_hoja(
+        path, tmp_path / "estricto.xlsx",
+        lambda xml: xml.replace(
+            "http://schemas.openxmlformats.org/spreadsheetml/2006/main",
+            "http://purl.oclc.org/ooxml/spreadsheetml/main",
+        ),
+    )
+    with pytest.raises(ValueError):
+        leer_libro_paralelo(estricto, procesos=1)
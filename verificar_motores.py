@@ -0,0 +1,84 @@
+# ============================================================
+#  VERIFICACIÓN DE PARIDAD ENTRE MOTORES DEL RESUMEN
+# ============================================================
+# Uso:
+#   python verificar_motores.py [--datos CONSOLIDADO.xlsx] [--medida Atenciones]
+#
+# Calcula el resumen con cada motor (pandas, sql, polars) para un conjunto de selecciones
+# (sin filtros, un año y mes, un establecimiento, varios meses y una selección sin filas) y lo
+# compara con el de pandas: mismas columnas, mismas filas y mismos valores. Termina con código 1
+# si algún motor falla o difiere; sirve como verificación después de cambiar un motor.
+
+import argparse
+import sys
+
+import pandas as pd
+
+from consultas_his import (
+    MOTORES_CONSULTA, alcance_anios, calcular_resumen, cargar_datos, columnas_dias_resumen, construir_cubo_medidas,
+    rankear_resumen
+)
+from datos_his import DIMENSIONES_ID, MEDIDAS_DIARIAS, calcular_version_datos
+
+
+def casos_verificacion(df):
+    """(nombre, selecciones) a comparar, armados a partir de los valores presentes en los datos."""
+    anio, mes, ipress = df[["anio", "mes", "id_establecimiento_x"]].iloc[0].astype(int)
+    meses = sorted(int(m) for m in df["mes"].unique())[:2]
+    return [
+        ("sin filtros", {}),
+        ("año y mes", {"anio": [anio], "mes": [mes]}),
+        ("establecimiento", {"id_establecimiento_x": [ipress]}),
+        ("varios meses", {"mes": meses}),
+        # Ningún establecimiento tiene id negativo: el resultado debe ser un resumen vacío
+        ("sin filas", {"id_establecimiento_x": [-1]}),
+    ]
+
+def normalizar(resumen):
+    """Resumen ordenado por ids y con índice 0..n-1, para comparar sin depender del orden del motor."""
+    claves = [c for c in DIMENSIONES_ID if c in resumen.columns]
+    return resumen.sort_values(claves).reset_index(drop=True) if claves else resumen.reset_index(drop=True)
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Compara el resumen de los motores de consulta del tablero HIS.")
+    parser.add_argument("--datos", default="CONSOLIDADO.xlsx", help="Archivo de datos (por defecto: CONSOLIDADO.xlsx)")
+    parser.add_argument("--medida", choices=list(MEDIDAS_DIARIAS), default="Atenciones",
+                        help="Medida diaria de las columnas de días (por defecto: Atenciones)")
+    args = parser.parse_args(argv)
+
+    version = calcular_version_datos(args.datos) or "ejemplo"
+
+    problemas = []
+    for nombre, selecciones in casos_verificacion(cargar_datos(args.datos, version)):
+        # Los días presentes dependen de los años cargados para la selección
+        _, _, dias_presentes = construir_cubo_medidas(args.datos, version, alcance_anios(selecciones))
+        day_cols = columnas_dias_resumen(args.medida, dias_presentes)
+        referencia = None
+        for motor in MOTORES_CONSULTA:
+            try:
+                resumen = calcular_resumen(selecciones, args.medida, motor, args.datos, version)
+                rankear_resumen(resumen, args.medida, day_cols)  # El tablero siempre rankea el resultado
+            except Exception as e:
+                problemas.append(f"{nombre} / {motor}: {type(e).__name__}: {e}")
+                continue
+            resumen = normalizar(resumen)
+            if referencia is None:
+                referencia = resumen
+                print(f"{nombre:<16} {motor:<7} {len(resumen):>6} filas")
+                continue
+            try:
+                pd.testing.assert_frame_equal(resumen, referencia, check_dtype=False)
+            except AssertionError as e:
+                problemas.append(f"{nombre} / {motor}: difiere de {MOTORES_CONSULTA[0]}: {e}")
+            else:
+                print(f"{nombre:<16} {motor:<7} {len(resumen):>6} filas (igual)")
+
+    for problema in problemas:
+        print(f"ERROR: {problema}", file=sys.stderr)
+    if not problemas:
+        print("Todos los motores coinciden.")
+    return 1 if problemas else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,298 @@
+# ============================================================
+#  LECTURA PARALELA DE LIBROS XLSX
+# ============================================================
+# Un .xlsx es un zip con una hoja XML por pestaña. Para libros grandes, el XML de la hoja se corta
+# en trozos de filas completas (en los límites de '<row') que se analizan en procesos separados;
+# cada proceso devuelve columnas ya tipadas (arreglos NumPy) y el proceso principal solo las une.
+# Un libro con varias hojas se reparte una hoja por proceso. Las hojas que este lector no sabe
+# cortar (elementos con prefijo, como '<x:row>', u otro espacio de nombres) lanzan ValueError en
+# lugar de devolver una tabla vacía; leer_excel_his (datos_his.py) las lee entonces con openpyxl.
+
+import os
+import re
+import zipfile
+import posixpath
+import xml.etree.ElementTree as ET
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime, timedelta
+from multiprocessing import get_context
+
+import numpy as np
+
+NS_MAIN = "http://schemas.openxmlformats.org/spreadsheetml/2006/main"
+NS_REL = "http://schemas.openxmlformats.org/officeDocument/2006/relationships"
+NS_PKG_REL = "http://schemas.openxmlformats.org/package/2006/relationships"
+
+# Por debajo de este tamaño de XML no conviene levantar procesos: se analiza en el proceso actual
+MIN_BYTES_PARALELO = 4 * 1024 * 1024
+
+# Formatos de número integrados de Excel que son fechas u horas
+FORMATOS_FECHA_INTEGRADOS = set(range(14, 23)) | set(range(27, 37)) | {45, 46, 47} | set(range(50, 59))
+EPOCA_EXCEL = datetime(1899, 12, 30)
+
+# Estado de cada proceso de trabajo (textos compartidos y estilos de fecha del libro)
+_LIBRO = {}
+
+def _es_formato_fecha(codigo):
+    """True si un formato personalizado muestra fecha u hora (se ignoran textos entre comillas y corchetes)."""
+    limpio = re.sub(r'"[^"]*"|\[[^\]]*\]|\\.', "", codigo)
+    return re.search(r"[dmyhsDMYHS]", limpio) is not None
+
+def _leer_metadatos(zf):
+    """Textos compartidos y conjunto de índices de estilo (atributo 's' de las celdas) que son fechas."""
+    textos = []
+    if "xl/sharedStrings.xml" in zf.namelist():
+        raiz = ET.fromstring(zf.read("xl/sharedStrings.xml"))
+        textos = ["".join(t.text or "" for t in si.iter(f"{{{NS_MAIN}}}t")) for si in raiz.iter(f"{{{NS_MAIN}}}si")]
+
+    estilos_fecha = set()
+    if "xl/styles.xml" in zf.namelist():
+        raiz = ET.fromstring(zf.read("xl/styles.xml"))
+        personalizados = {
+            int(f.get("numFmtId")): f.get("formatCode", "")
+            for f in raiz.iter(f"{{{NS_MAIN}}}numFmt")
+        }
+        cell_xfs = raiz.find(f"{{{NS_MAIN}}}cellXfs")
+        for i, xf in enumerate(cell_xfs if cell_xfs is not None else []):
+            fmt = int(xf.get("numFmtId", 0))
+            if fmt in FORMATOS_FECHA_INTEGRADOS or (fmt in personalizados and _es_formato_fecha(personalizados[fmt])):
+                estilos_fecha.add(i)
+    return textos, estilos_fecha
+
+def hojas_libro(zf):
+    """Lista (nombre, ruta del XML) de las hojas del libro, en el orden de sus pestañas."""
+    libro = ET.fromstring(zf.read("xl/workbook.xml"))
+    relaciones = ET.fromstring(zf.read("xl/_rels/workbook.xml.rels"))
+    destinos = {r.get("Id"): r.get("Target") for r in relaciones.iter(f"{{{NS_PKG_REL}}}Relationship")}
+    hojas = []
+    for hoja in libro.iter(f"{{{NS_MAIN}}}sheet"):
+        destino = destinos[hoja.get(f"{{{NS_REL}}}id")]
+        ruta = destino.lstrip("/") if destino.startswith("/") else posixpath.normpath(posixpath.join("xl", destino))
+        hojas.append((hoja.get("name"), ruta))
+    return hojas
+
+def _dimension_con_datos(xml):
+    """True si la hoja declara un rango de celdas (<dimension ref="A1:K90">) más allá de A1."""
+    dimension = re.search(rb'<dimension\s+ref="([^"]*)"', xml)
+    return dimension is not None and b":" in dimension.group(1)
+
+def dividir_filas(xml, n_trozos):
+    """
+    Corta el XML de una hoja en la fila de encabezado más hasta n_trozos rangos de filas completas.
+    Devuelve (apertura, trozos, cierre): la apertura declara los espacios de nombres de la hoja,
+    así cada trozo se puede analizar por separado como '<apertura><sheetData>trozo</sheetData>cierre'.
+    Lanza ValueError si la hoja no usa los nombres de elemento sin prefijo que se buscan aquí.
+    """
+    inicio_hoja = xml.find(b"<worksheet")
+    if inicio_hoja < 0:
+        raise ValueError("la hoja no tiene un elemento <worksheet> sin prefijo")
+    apertura = xml[:xml.find(b">", inicio_hoja) + 1]
+    inicio_datos = xml.find(b"<sheetData")
+    fin_datos = xml.rfind(b"</sheetData>")
+    if inicio_datos < 0 or fin_datos < 0:
+        if _dimension_con_datos(xml):
+            raise ValueError("la hoja declara celdas pero no tiene un elemento <sheetData> sin prefijo")
+        return apertura, [], b"</worksheet>"
+    desde = xml.find(b">", inicio_datos) + 1
+
+    # La primera fila (encabezado) va sola, para que no mezcle texto en columnas numéricas
+    primera = xml.find(b"<row", desde, fin_datos)
+    if primera < 0 and _dimension_con_datos(xml):
+        raise ValueError("la hoja declara celdas pero no tiene elementos <row> sin prefijo")
+    segunda = xml.find(b"<row", primera + 1, fin_datos) if primera >= 0 else -1
+    if segunda < 0:
+        return apertura, [xml[desde:fin_datos]], b"</worksheet>"
+
+    tamano = max(1, (fin_datos - segunda) // max(1, n_trozos))
+    cortes = [desde, segunda]
+    while True:
+        siguiente = xml.find(b"<row", cortes[-1] + tamano, fin_datos)
+        if siguiente < 0:
+            break
+        cortes.append(siguiente)
+    cortes.append(fin_datos)
+    trozos = [xml[a:b] for a, b in zip(cortes[:-1], cortes[1:]) if b > a]
+    return apertura, trozos, b"</worksheet>"
+
+def _indice_columna(ref):
+    """'DK12' -> 114 (base 0)."""
+    indice = 0
+    for caracter in ref:
+        if caracter.isdigit():
+            break
+        indice = indice * 26 + (ord(caracter.upper()) - 64)
+    return indice - 1
+
+def _fecha_excel(valor):
+    """Número de serie de Excel -> datetime (misma regla que openpyxl, redondeando a milisegundos)."""
+    dia, fraccion = divmod(valor, 1)
+    diferencia = timedelta(milliseconds=round(fraccion * 86_400_000))
+    if 0 < valor < 60:
+        dia += 1
+    return EPOCA_EXCEL + timedelta(days=dia) + diferencia
+
+def _valor_celda(celda, textos, estilos_fecha):
+    tipo = celda.get("t", "n")
+    if tipo == "inlineStr":
+        partes = [t.text or "" for t in celda.iter(f"{{{NS_MAIN}}}t")]
+        return "".join(partes) if partes else None
+    v = celda.find(f"{{{NS_MAIN}}}v")
+    if v is None or v.text is None:
+        return None
+    texto = v.text
+    if tipo == "s":
+        return textos[int(texto)]
+    if tipo == "str":
+        return texto
+    if tipo == "b":
+        return texto == "1"
+    if tipo == "e":
+        return None
+    if tipo == "d":
+        return datetime.fromisoformat(texto)
+    numero = float(texto) if ("." in texto or "E" in texto or "e" in texto) else int(texto)
+    if int(celda.get("s", 0)) in estilos_fecha:
+        return _fecha_excel(numero)
+    return numero
+
+def _tipar_columna(valores):
+    """Lista de valores de una columna -> arreglo NumPy tipado (int64, float64, datetime64 u object)."""
+    presentes = [v for v in valores if v is not None]
+    if not presentes:
+        return np.full(len(valores), np.nan)
+    if all(type(v) is int for v in presentes) and len(presentes) == len(valores):
+        return np.array(valores, dtype=np.int64)
+    if all(type(v) in (int, float) for v in presentes):
+        return np.array([np.nan if v is None else v for v in valores], dtype=np.float64)
+    if all(isinstance(v, datetime) for v in presentes):
+        return np.array([np.datetime64("NaT") if v is None else np.datetime64(v, "us") for v in valores], dtype="datetime64[us]")
+    return np.array(valores, dtype=object)
+
+def _analizar_filas(apertura, trozo, cierre, textos, estilos_fecha):
+    """Analiza un rango de filas y devuelve (n_filas, {índice de columna: arreglo tipado})."""
+    raiz = ET.fromstring(apertura + b"<sheetData>" + trozo + b"</sheetData>" + cierre)
+    filas = list(raiz.iter(f"{{{NS_MAIN}}}row"))
+    if not filas and b"<row" in trozo:
+        # Filas en otro espacio de nombres (por ejemplo, OOXML estricto): no se leerían sus celdas
+        raise ValueError("las filas de la hoja no usan el espacio de nombres de SpreadsheetML")
+    columnas = {}
+    for i, fila in enumerate(filas):
+        for posicion, celda in enumerate(fila.iter(f"{{{NS_MAIN}}}c")):
+            ref = celda.get("r")
+            col = _indice_columna(ref) if ref else posicion
+            valor = _valor_celda(celda, textos, estilos_fecha)
+            if valor is None:
+                continue
+            if col not in columnas:
+                columnas[col] = [None] * len(filas)
+            columnas[col][i] = valor
+    return len(filas), {col: _tipar_columna(valores) for col, valores in columnas.items()}
+
+def _inicializar_proceso(path):
+    with zipfile.ZipFile(path) as zf:
+        _LIBRO["textos"], _LIBRO["estilos_fecha"] = _leer_metadatos(zf)
+
+def _tarea_trozo(apertura, trozo, cierre):
+    return _analizar_filas(apertura, trozo, cierre, _LIBRO["textos"], _LIBRO["estilos_fecha"])
+
+def _tarea_hoja(path, ruta_hoja):
+    with zipfile.ZipFile(path) as zf:
+        apertura, trozos, cierre = dividir_filas(zf.read(ruta_hoja), 1)
+    return [_tarea_trozo(apertura, trozo, cierre) for trozo in trozos]
+
+def _unir_columnas(partes):
+    """Une los trozos de una hoja (en orden) en un diccionario {índice de columna: arreglo}."""
+    total = sum(n for n, _ in partes)
+    indices = sorted({col for _, columnas in partes for col in columnas})
+    unidas = {}
+    for col in indices:
+        arreglos = []
+        for n, columnas in partes:
+            arreglos.append(columnas[col] if col in columnas else np.full(n, None, dtype=object))
+        tipos = {a.dtype.kind for a in arreglos}
+        if tipos == {"i"}:
+            unidas[col] = np.concatenate(arreglos)
+        elif tipos <= {"i", "f"}:
+            unidas[col] = np.concatenate([a.astype(np.float64) for a in arreglos])
+        elif tipos == {"M"}:
+            unidas[col] = np.concatenate(arreglos)
+        else:
+            # Mezcla de tipos (o trozos sin valores): se resuelve como en un solo trozo
+            valores = [None if (isinstance(v, float) and np.isnan(v)) or (isinstance(v, np.datetime64) and np.isnat(v)) else v
+                       for a in arreglos for v in (a.tolist() if a.dtype.kind != "M" else list(a.astype(object)))]
+            unidas[col] = _tipar_columna(valores)
+    return total, unidas
+
+def _a_dataframe(partes):
+    """Primera fila como encabezado (con los mismos nombres que pandas.read_excel) y el resto como datos."""
+    import pandas as pd
+
+    if not partes:
+        return pd.DataFrame()
+    _, encabezado = partes[0]
+    total, columnas = _unir_columnas(partes[1:])
+    n_columnas = max([*columnas, *encabezado], default=-1) + 1
+    nombres, vistos = [], {}
+    for col in range(n_columnas):
+        valor = encabezado[col][0] if col in encabezado else None
+        if valor is None or (isinstance(valor, float) and np.isnan(valor)):
+            nombre = f"Unnamed: {col}"
+        else:
+            nombre = str(valor) if not isinstance(valor, (int, np.integer)) else int(valor)
+        # Encabezados repetidos: 'x', 'x.1', 'x.2'... como pandas
+        if nombre in vistos:
+            vistos[nombre] += 1
+            nombre = f"{nombre}.{vistos[nombre]}"
+        vistos.setdefault(nombre, 0)
+        nombres.append(nombre)
+
+    datos = {}
+    for col, nombre in enumerate(nombres):
+        arreglo = columnas[col] if col in columnas else np.full(total, np.nan)
+        if arreglo.dtype == object:
+            arreglo = _tipar_columna(arreglo.tolist())
+        if arreglo.dtype == object:
+            # Como pandas.read_excel: celdas vacías como NaN y tipo de texto inferido por pandas
+            arreglo = [np.nan if v is None else v for v in arreglo.tolist()]
+        datos[nombre] = pd.Series(arreglo)
+    return pd.DataFrame(datos)
+
+def procesos_disponibles(procesos=None):
+    return max(1, procesos or os.cpu_count() or 1)
+
+def leer_libro_paralelo(path, hojas=None, procesos=None):
+    """
+    Lee las hojas de un .xlsx (todas, o las indicadas por nombre o posición) y devuelve
+    {nombre de hoja: DataFrame}. Una sola hoja se corta en rangos de filas que se analizan en
+    paralelo; varias hojas se reparten una por proceso. Con un solo núcleo, o con hojas pequeñas,
+    todo se analiza en el proceso actual.
+    """
+    procesos = procesos_disponibles(procesos)
+    with zipfile.ZipFile(path) as zf:
+        todas = hojas_libro(zf)
+        if hojas is not None:
+            todas = [h for i, h in enumerate(todas) if i in hojas or h[0] in hojas]
+        tamanos = {ruta: zf.getinfo(ruta).file_size for _, ruta in todas}
+        textos, estilos_fecha = _leer_metadatos(zf)
+
+        if len(todas) == 1:
+            nombre, ruta = todas[0]
+            if procesos == 1 or tamanos[ruta] < MIN_BYTES_PARALELO:
+                apertura, trozos, cierre = dividir_filas(zf.read(ruta), 1)
+                partes = [_analizar_filas(apertura, t, cierre, textos, estilos_fecha) for t in trozos]
+                return {nombre: _a_dataframe(partes)}
+            apertura, trozos, cierre = dividir_filas(zf.read(ruta), procesos)
+
+    if len(todas) == 1:
+        with ProcessPoolExecutor(procesos, mp_context=get_context("spawn"),
+                                 initializer=_inicializar_proceso, initargs=(str(path),)) as pool:
+            partes = list(pool.map(_tarea_trozo, [apertura] * len(trozos), trozos, [cierre] * len(trozos)))
+        return {nombre: _a_dataframe(partes)}
+
+    if procesos == 1 or sum(tamanos.values()) < MIN_BYTES_PARALELO:
+        _inicializar_proceso(str(path))
+        return {nombre: _a_dataframe(_tarea_hoja(str(path), ruta)) for nombre, ruta in todas}
+    with ProcessPoolExecutor(min(procesos, len(todas)), mp_context=get_context("spawn"),
+                             initializer=_inicializar_proceso, initargs=(str(path),)) as pool:
+        resultados = pool.map(_tarea_hoja, [str(path)] * len(todas), [ruta for _, ruta in todas])
+        return {nombre: _a_dataframe(partes) for (nombre, _), partes in zip(todas, resultados)}